@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Ganesh AI - Telegram Bot Storage Benchmark
+Messages/second through TelegramBotFinal.handle_message with the original
+connect-per-operation storage versus the BotStore layer
+
+Each thread plays one chat user sending messages back to back, mimicking
+the bot's concurrent update handlers.
+
+Usage: python benchmark_bot_store.py [--threads 8] [--seconds 5]
+"""
+
+import os
+import time
+import logging
+import sqlite3
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+
+from telegram_bot_final import TelegramBotFinal
+
+
+class LegacyStorageBot(TelegramBotFinal):
+    """The bot's storage methods as they were: a fresh connection and commit per call"""
+
+    def __init__(self, db_file):
+        self.legacy_db_file = db_file
+        super().__init__(db_file)
+
+    def init_database(self):
+        # Default rollback journal, as the original bot ran
+        conn = sqlite3.connect(self.legacy_db_file)
+        conn.execute('''
+            CREATE TABLE bot_users (
+                user_id TEXT PRIMARY KEY, username TEXT, first_name TEXT, last_name TEXT,
+                wallet REAL DEFAULT 0.0, total_earned REAL DEFAULT 0.0,
+                messages_count INTEGER DEFAULT 0, referrals_count INTEGER DEFAULT 0,
+                is_premium BOOLEAN DEFAULT FALSE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_active TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE chat_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, message TEXT, response TEXT,
+                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def get_or_create_user(self, user_data):
+        user_id = str(user_data.id)
+        conn = sqlite3.connect(self.legacy_db_file, timeout=30)
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM bot_users WHERE user_id = ?', (user_id,))
+        user = cursor.fetchone()
+        if not user:
+            cursor.execute('''
+                INSERT INTO bot_users (user_id, username, first_name, last_name, wallet, total_earned)
+                VALUES (?, ?, ?, ?, 10.0, 10.0)
+            ''', (user_id, user_data.username, user_data.first_name, user_data.last_name))
+            conn.commit()
+            user = (user_id, user_data.username, '', '', 10.0, 10.0, 0, 0, False, datetime.now(), datetime.now())
+        else:
+            cursor.execute('UPDATE bot_users SET last_active = ? WHERE user_id = ?', (datetime.now(), user_id))
+            conn.commit()
+        conn.close()
+        return user
+
+    def add_earnings(self, user_id, amount, description=""):
+        conn = sqlite3.connect(self.legacy_db_file, timeout=30)
+        conn.execute('''
+            UPDATE bot_users
+            SET wallet = wallet + ?, total_earned = total_earned + ?, messages_count = messages_count + 1
+            WHERE user_id = ?
+        ''', (amount, amount, user_id))
+        conn.commit()
+        conn.close()
+        return True
+
+    def get_user_stats(self, user_id):
+        conn = sqlite3.connect(self.legacy_db_file, timeout=30)
+        user = conn.execute('SELECT * FROM bot_users WHERE user_id = ?', (user_id,)).fetchone()
+        conn.close()
+        return {'wallet': user[4]} if user else None
+
+    def save_chat(self, user_id, message, response):
+        conn = sqlite3.connect(self.legacy_db_file, timeout=30)
+        conn.execute('INSERT INTO chat_history (user_id, message, response) VALUES (?, ?, ?)',
+                     (user_id, message, response))
+        conn.commit()
+        conn.close()
+
+
+class ChatUser:
+    def __init__(self, index):
+        self.id = 100000 + index
+        self.username = f"bench{index}"
+        self.first_name = "Bench"
+        self.last_name = str(index)
+
+
+def chat(bot, user, stop, counts, index):
+    bot.handle_message(user, "hello")  # create the account outside the timed loop
+    while not stop.is_set():
+        bot.handle_message(user, "tell me about python programming")
+        counts[index] += 1
+
+
+def run(bot_class, threads: int, seconds: float):
+    with tempfile.TemporaryDirectory() as directory:
+        bot = bot_class(os.path.join(directory, 'bench.db'))
+        stop = threading.Event()
+        counts = [0] * threads
+        workers = [threading.Thread(target=chat, args=(bot, ChatUser(i), stop, counts, i)) for i in range(threads)]
+
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        time.sleep(seconds)
+        stop.set()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        bot.store.close()
+
+        stats = bot.store.get_stats()
+    return {
+        'storage': 'connect per op' if bot_class is LegacyStorageBot else 'BotStore',
+        'messages_per_sec': sum(counts) / elapsed,
+        'writes_per_commit': stats['writes_per_commit'] if bot_class is not LegacyStorageBot else 1.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Telegram bot storage throughput: before vs after")
+    parser.add_argument('--threads', type=int, default=8, help="Concurrent chat users")
+    parser.add_argument('--seconds', type=float, default=5.0, help="Duration of each run")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    print(f"{args.threads} chat threads, {args.seconds:.0f}s per storage layer")
+    print(f"{'storage':<16}{'messages/s':>12}{'writes/commit':>16}")
+    for bot_class in (LegacyStorageBot, TelegramBotFinal):
+        result = run(bot_class, args.threads, args.seconds)
+        print(f"{result['storage']:<16}{result['messages_per_sec']:>12.1f}{result['writes_per_commit']:>16.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Ganesh AI - Hot Lookup Benchmark
+Per-call overhead of the single-row lookups: the Query API as the code
+used to call it versus the cached statements in main.py's HOT LOOKUPS
+
+Runs against a throwaway SQLite database. Results are not kept, so the
+session's weakly referenced identity map never answers a call and each one
+pays for the SQL round trip; the difference is statement construction and
+compilation.
+
+Usage: python benchmark_lookups.py [--calls 5000] [--users 1000]
+"""
+
+import os
+import time
+import logging
+import argparse
+import tempfile
+import warnings
+
+from sqlalchemy.exc import LegacyAPIWarning
+
+
+def seed(main, users: int):
+    db = main.db
+    db.session.add(main.User(username='admin', email='admin@example.com', password_hash='-', role='admin'))
+    for i in range(users):
+        db.session.add(main.User(
+            username=f"user{i}", email=f"user{i}@example.com", password_hash='-',
+            telegram_id=str(500000 + i), referral_code=f"REF{i:05d}"
+        ))
+    db.session.flush()
+    for i in range(users):
+        db.session.add(main.PaymentOrder(
+            user_id=i + 2, order_id=f"ORDER{i:05d}", amount=100, purpose='wallet_topup'
+        ))
+    db.session.commit()
+
+
+def lookups(main, users: int):
+    """(name, legacy call, cached call), each taking the row index"""
+    User, PaymentOrder = main.User, main.PaymentOrder
+    return [
+        ('user by id',
+         lambda i: User.query.get(i % users + 2),
+         lambda i: main.user_by_id(i % users + 2)),
+        ('admin user',
+         lambda i: User.query.filter_by(role='admin').first(),
+         lambda i: main.get_admin_user()),
+        ('user by telegram_id',
+         lambda i: User.query.filter_by(telegram_id=str(500000 + i % users)).first(),
+         lambda i: main.user_by_telegram_id(str(500000 + i % users))),
+        ('user by referral_code',
+         lambda i: User.query.filter_by(referral_code=f"REF{i % users:05d}").first(),
+         lambda i: main.user_by_referral_code(f"REF{i % users:05d}")),
+        ('order by order_id',
+         lambda i: PaymentOrder.query.filter_by(order_id=f"ORDER{i % users:05d}").first(),
+         lambda i: main.payment_order_by_order_id(f"ORDER{i % users:05d}")),
+    ]
+
+
+def time_calls(call, calls: int) -> float:
+    """Microseconds per call"""
+    for i in range(100):
+        call(i)  # warm the statement caches
+    started = time.perf_counter()
+    for i in range(calls):
+        call(i)
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hot lookup overhead: Query API vs cached statements")
+    parser.add_argument('--calls', type=int, default=5000, help="Calls per lookup and variant")
+    parser.add_argument('--users', type=int, default=1000, help="Seeded users and payment orders")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['DB_URL'] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        logging.disable(logging.WARNING)
+        warnings.simplefilter('ignore', LegacyAPIWarning)
+        import main as app_main
+
+        with app_main.app.app_context():
+            app_main.db.create_all()
+            seed(app_main, args.users)
+
+            print(f"{args.calls} calls per lookup, {args.users} users")
+            print(f"{'lookup':<24}{'query API us':>14}{'cached us':>12}{'speedup':>10}")
+            for name, legacy, cached in lookups(app_main, args.users):
+                before = time_calls(legacy, args.calls)
+                after = time_calls(cached, args.calls)
+                print(f"{name:<24}{before:>14.1f}{after:>12.1f}{before / after:>9.2f}x")
+            app_main.db.session.remove()
+            app_main.db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
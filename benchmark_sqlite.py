@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Ganesh AI - SQLite Concurrency Benchmark
+Compares write throughput of the default SQLite settings against the
+production profile from db_profiles.py
+
+Each writer thread repeats the track_visit write pattern (insert a visit,
+credit the user, insert a transaction, commit) while reader threads run
+the dashboard queries, mimicking gunicorn's threaded workers.
+
+Usage: python benchmark_sqlite.py [--threads 8] [--readers 2] [--seconds 5]
+"""
+
+import os
+import time
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+
+from db_profiles import set_sqlite_pragmas, sqlite_engine_options
+
+SCHEMA = [
+    "CREATE TABLE users (id INTEGER PRIMARY KEY, wallet FLOAT, total_earned FLOAT, visits_count INTEGER)",
+    "CREATE TABLE visits (id INTEGER PRIMARY KEY, user_id INTEGER, page VARCHAR(200), "
+    "earnings_generated FLOAT, created_at DATETIME)",
+    "CREATE TABLE transactions (id INTEGER PRIMARY KEY, user_id INTEGER, amount FLOAT, "
+    "transaction_type VARCHAR(20), created_at DATETIME)",
+    "CREATE INDEX ix_transactions_user_created ON transactions (user_id, created_at)",
+]
+USERS = 100
+
+
+def make_engine(path: str, tuned: bool):
+    url = f"sqlite:///{path}"
+    if tuned:
+        engine = create_engine(url, **sqlite_engine_options())
+        event.listen(engine, 'connect', set_sqlite_pragmas)
+    else:
+        # sqlite3's own 5s lock timeout, rollback journal, default pool
+        engine = create_engine(url, connect_args={'check_same_thread': False})
+    with engine.begin() as connection:
+        for statement in SCHEMA:
+            connection.execute(text(statement))
+        connection.execute(
+            text("INSERT INTO users (id, wallet, total_earned, visits_count) VALUES (:id, 0, 0, 0)"),
+            [{'id': i} for i in range(1, USERS + 1)]
+        )
+    return engine
+
+
+def writer(engine, stop, stats, index):
+    user_id = index % USERS + 1
+    while not stop.is_set():
+        try:
+            with engine.begin() as connection:
+                now = datetime.utcnow()
+                connection.execute(text(
+                    "INSERT INTO visits (user_id, page, earnings_generated, created_at) "
+                    "VALUES (:u, '/', 0.01, :now)"), {'u': user_id, 'now': now})
+                connection.execute(text(
+                    "UPDATE users SET wallet = wallet + 0.01, total_earned = total_earned + 0.01, "
+                    "visits_count = visits_count + 1 WHERE id = :u"), {'u': user_id})
+                connection.execute(text(
+                    "INSERT INTO transactions (user_id, amount, transaction_type, created_at) "
+                    "VALUES (:u, 0.01, 'credit', :now)"), {'u': user_id, 'now': now})
+            stats['writes'][index] += 1
+        except OperationalError:
+            stats['errors'][index] += 1
+
+
+def reader(engine, stop, stats, index):
+    while not stop.is_set():
+        try:
+            with engine.connect() as connection:
+                connection.execute(text(
+                    "SELECT * FROM transactions WHERE user_id = :u ORDER BY created_at DESC LIMIT 5"),
+                    {'u': index % USERS + 1}).fetchall()
+                connection.execute(text(
+                    "SELECT SUM(amount) FROM transactions WHERE transaction_type = 'credit'")).scalar()
+            stats['reads'][index] += 1
+        except OperationalError:
+            stats['read_errors'][index] += 1
+
+
+def run(tuned: bool, threads: int, readers: int, seconds: float):
+    with tempfile.TemporaryDirectory() as directory:
+        engine = make_engine(os.path.join(directory, 'bench.db'), tuned)
+        stop = threading.Event()
+        stats = {
+            'writes': [0] * threads, 'errors': [0] * threads,
+            'reads': [0] * readers, 'read_errors': [0] * readers
+        }
+        workers = [threading.Thread(target=writer, args=(engine, stop, stats, i)) for i in range(threads)]
+        workers += [threading.Thread(target=reader, args=(engine, stop, stats, i)) for i in range(readers)]
+
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        time.sleep(seconds)
+        stop.set()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        engine.dispose()
+
+    return {
+        'profile': 'tuned (WAL)' if tuned else 'default',
+        'writes_per_sec': sum(stats['writes']) / elapsed,
+        'reads_per_sec': sum(stats['reads']) / elapsed,
+        'lock_errors': sum(stats['errors']) + sum(stats['read_errors'])
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite write throughput: default vs production profile")
+    parser.add_argument('--threads', type=int, default=8, help="Concurrent writer threads")
+    parser.add_argument('--readers', type=int, default=2, help="Concurrent reader threads")
+    parser.add_argument('--seconds', type=float, default=5.0, help="Duration of each run")
+    args = parser.parse_args()
+
+    print(f"{args.threads} writers, {args.readers} readers, {args.seconds:.0f}s per profile")
+    print(f"{'profile':<14}{'writes/s':>12}{'reads/s':>12}{'lock errors':>14}")
+    for tuned in (False, True):
+        result = run(tuned, args.threads, args.readers, args.seconds)
+        print(f"{result['profile']:<14}{result['writes_per_sec']:>12.1f}"
+              f"{result['reads_per_sec']:>12.1f}{result['lock_errors']:>14}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""
+Ganesh AI - Bot Storage Layer
+Long-lived SQLite connections for the Telegram bot: one writer thread that
+group-commits queued writes, and a small pool of reader connections
+"""
+
+import queue
+import atexit
+import sqlite3
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence
+
+from db_profiles import set_sqlite_pragmas
+
+# Per-connection prepared statement cache; the bot issues a handful of
+# fixed statements, so every execute after the first reuses a compiled one
+STATEMENT_CACHE_SIZE = 256
+
+_STOP = object()
+
+
+class _Write:
+    __slots__ = ('sql', 'params', 'future')
+
+    def __init__(self, sql: str, params: Sequence, future: Optional[Future]):
+        self.sql = sql
+        self.params = params
+        self.future = future
+
+
+class BotStore:
+    """SQLite access with a single writer and pooled readers.
+
+    ``execute`` queues a write for the writer thread. Everything queued
+    while the previous commit was in progress goes into the next
+    transaction, so concurrent chats share one commit instead of paying
+    one each. ``wait=True`` blocks until the write is committed (use it
+    before reading the row back); ``wait=False`` returns immediately.
+
+    Reads run on pooled connections in WAL mode, so they never wait for
+    the writer.
+    """
+
+    def __init__(self, db_file: str, read_pool_size: int = 4, batch_size: int = 256):
+        self.db_file = db_file
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._readers = queue.LifoQueue()
+        self._read_slots = threading.BoundedSemaphore(read_pool_size)
+        self._writer = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+        self.commits = 0
+        self.writes = 0
+        self.failed_writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(
+            self.db_file,
+            timeout=30,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+            # Transactions are managed explicitly by the writer loop
+            isolation_level=None
+        )
+        set_sqlite_pragmas(connection)
+        return connection
+
+    # ---- writes -----------------------------------------------------
+
+    def _start(self):
+        with self._start_lock:
+            if self._writer is not None:
+                return
+            self._writer = threading.Thread(target=self._write_loop, name="bot-store-writer", daemon=True)
+            self._writer.start()
+            atexit.register(self.close)
+
+    def execute(self, sql: str, params: Sequence = (), wait: bool = True):
+        """Queue a write; with ``wait`` returns its rowcount once committed"""
+        if self._closed:
+            raise RuntimeError("BotStore is closed")
+        if self._writer is None:
+            self._start()
+        future = Future() if wait else None
+        self._queue.put(_Write(sql, params, future))
+        return future.result() if wait else None
+
+    def flush(self):
+        """Block until every write queued so far is committed"""
+        if self._writer is not None and not self._closed:
+            self.execute("SELECT 1", wait=True)
+
+    def _write_loop(self):
+        connection = self._connect()
+        try:
+            while True:
+                first = self._queue.get()
+                if first is _STOP:
+                    return
+                batch = [first]
+                stop = False
+                while len(batch) < self.batch_size:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stop = True
+                        break
+                    batch.append(item)
+                self._commit(connection, batch)
+                if stop:
+                    return
+        finally:
+            connection.close()
+
+    def _commit(self, connection: sqlite3.Connection, batch: List[_Write]):
+        results = []
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            for write in batch:
+                try:
+                    results.append(connection.execute(write.sql, write.params).rowcount)
+                except sqlite3.Error as e:
+                    # A failed statement is rolled back on its own; the rest commit
+                    results.append(e)
+            connection.execute("COMMIT")
+        except sqlite3.Error as e:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            results = [e] * len(batch)
+
+        self.commits += 1
+        for write, result in zip(batch, results):
+            if isinstance(result, Exception):
+                self.failed_writes += 1
+                if write.future is not None:
+                    write.future.set_exception(result)
+            else:
+                self.writes += 1
+                if write.future is not None:
+                    write.future.set_result(result)
+
+    # ---- reads ------------------------------------------------------
+
+    @contextmanager
+    def reader(self):
+        """Borrow a pooled read connection"""
+        self._read_slots.acquire()
+        try:
+            connection = self._readers.get_nowait()
+        except queue.Empty:
+            connection = self._connect()
+        try:
+            yield connection
+        finally:
+            self._readers.put(connection)
+            self._read_slots.release()
+
+    def query_one(self, sql: str, params: Sequence = ()) -> Optional[tuple]:
+        with self.reader() as connection:
+            return connection.execute(sql, params).fetchone()
+
+    def query_all(self, sql: str, params: Sequence = ()) -> List[tuple]:
+        with self.reader() as connection:
+            return connection.execute(sql, params).fetchall()
+
+    # ---- lifecycle --------------------------------------------------
+
+    def close(self):
+        """Commit queued writes, stop the writer and close every connection"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._writer is not None:
+            self._queue.put(_STOP)
+            self._writer.join()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def get_stats(self) -> Dict:
+        return {
+            'writes': self.writes,
+            'failed_writes': self.failed_writes,
+            'commits': self.commits,
+            'writes_per_commit': round(self.writes / self.commits, 2) if self.commits else 0,
+            'queued': self._queue.qsize()
+        }
@@ -22,7 +22,7 @@ except ImportError:
     CASHFREE_AVAILABLE = False
     print("⚠️ Cashfree SDK not available. Payment features will be limited.")
 
-from main import app, db, User, log
+from main import app, db, User, log, user_by_id, payment_order_by_order_id
 
 class CashfreePaymentSystem:
     """Complete Cashfree Payment Integration"""
@@ -62,7 +62,7 @@ class CashfreePaymentSystem:
         
         try:
             with app.app_context():
-                user = User.query.get(user_id)
+                user = user_by_id(user_id)
                 if not user:
                     return {'success': False, 'message': 'User not found'}
                 
@@ -169,8 +169,7 @@ class CashfreePaymentSystem:
                 
                 # Update order status in database
                 with app.app_context():
-                    from main import PaymentOrder
-                    payment_order = PaymentOrder.query.filter_by(order_id=order_id).first()
+                    payment_order = payment_order_by_order_id(order_id)
                     if payment_order:
                         payment_order.status = result.get('order_status', 'unknown').lower()
                         payment_order.gateway_response = json.dumps(result)
@@ -215,8 +214,7 @@ class CashfreePaymentSystem:
             log("payment", "INFO", f"Webhook received: {event_type} for order {order_id}")
             
             with app.app_context():
-                from main import PaymentOrder
-                payment_order = PaymentOrder.query.filter_by(order_id=order_id).first()
+                payment_order = payment_order_by_order_id(order_id)
                 
                 if not payment_order:
                     log("payment", "ERROR", f"Payment order not found: {order_id}")
@@ -242,7 +240,7 @@ class CashfreePaymentSystem:
     def process_successful_payment(self, payment_order, webhook_data: Dict):
         """Process successful payment and update user account"""
         try:
-            user = User.query.get(payment_order.user_id)
+            user = user_by_id(payment_order.user_id)
             if not user:
                 log("payment", "ERROR", f"User not found for payment: {payment_order.user_id}")
                 return
@@ -338,7 +336,7 @@ class CashfreePaymentSystem:
         
         try:
             with app.app_context():
-                user = User.query.get(user_id)
+                user = user_by_id(user_id)
                 if not user:
                     return {'success': False, 'message': 'User not found'}
                 
@@ -0,0 +1,177 @@
+"""
+Ganesh AI - Chat Analytics Pipeline
+Queues chat events in memory and writes them to the database in batches
+"""
+
+import os
+import time
+import atexit
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+# Compact integer codes for the chat models stored in chat_events.model_code
+MODEL_CODES = {
+    'other': 0,
+    'ganesh-free': 1,
+    'gpt-4-turbo': 2,
+    'claude-3-sonnet': 3,
+    'gemini-pro': 4,
+    'gpt-3.5-turbo': 5,
+}
+MODEL_NAMES = {code: name for name, code in MODEL_CODES.items()}
+
+
+def model_code(model: Optional[str]) -> int:
+    return MODEL_CODES.get(model or '', MODEL_CODES['other'])
+
+
+class EventBatcher:
+    """Background writer that drains an in-memory queue in batches.
+
+    ``record`` only appends to a deque, so callers never wait on I/O. A
+    daemon thread hands batches of up to ``batch_size`` events to
+    ``writer`` every ``flush_interval`` seconds, or sooner once a full
+    batch is waiting.
+    """
+
+    def __init__(self, name: str, writer: Callable[[List], None],
+                 batch_size: int = 500, flush_interval: float = 2.0,
+                 max_queue: int = 100000, on_error: Optional[Callable] = None):
+        self.name = name
+        self.writer = writer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.on_error = on_error
+        self._queue = deque()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.last_flush_ms = 0.0
+
+    def record(self, event):
+        if len(self._queue) >= self.max_queue:
+            self.dropped += 1
+            return
+        self._queue.append(event)
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+        if self._thread is None:
+            self._start()
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name=f"{self.name}-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """Write out everything queued so far"""
+        with self._flush_lock:
+            while self._queue:
+                batch = []
+                while self._queue and len(batch) < self.batch_size:
+                    batch.append(self._queue.popleft())
+                started = time.perf_counter()
+                try:
+                    self.writer(batch)
+                    self.written += len(batch)
+                    self.batches += 1
+                except Exception as e:
+                    self.dropped += len(batch)
+                    if self.on_error:
+                        self.on_error(e)
+                self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    def get_stats(self) -> Dict:
+        return {
+            'queued': len(self._queue),
+            'written': self.written,
+            'dropped': self.dropped,
+            'batches': self.batches,
+            'last_flush_ms': self.last_flush_ms
+        }
+
+
+class ChatAnalytics:
+    """Chat event sink with live per-model usage counters"""
+
+    def __init__(self):
+        self.batcher = None
+        self._counters = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def configure(self, writer: Callable[[List], None], on_error: Optional[Callable] = None):
+        """Attach the database writer used for batched inserts"""
+        self.batcher = EventBatcher(
+            'chat-analytics', writer,
+            batch_size=int(os.getenv("CHAT_ANALYTICS_BATCH_SIZE", "500")),
+            flush_interval=float(os.getenv("CHAT_ANALYTICS_FLUSH_SECONDS", "2")),
+            max_queue=int(os.getenv("CHAT_ANALYTICS_MAX_QUEUE", "100000")),
+            on_error=on_error
+        )
+
+    def track(self, user_id: Optional[int], model: str, prompt_length: int,
+              response_length: int, latency_ms: int, cost: float):
+        """Queue a chat event and update the live counters"""
+        code = model_code(model)
+        event = {
+            'user_id': user_id,
+            'model_code': code,
+            'prompt_length': prompt_length,
+            'response_length': response_length,
+            'latency_ms': latency_ms,
+            'cost': cost,
+            'created_at': datetime.utcnow()
+        }
+        with self._lock:
+            counters = self._counters.setdefault(code, [0, 0, 0, 0, 0.0])
+            counters[0] += 1
+            counters[1] += prompt_length
+            counters[2] += response_length
+            counters[3] += latency_ms
+            counters[4] += cost
+        if self.batcher is not None:
+            self.batcher.record(event)
+
+    def get_model_usage(self) -> List[Dict]:
+        """Live per-model counters since process start"""
+        with self._lock:
+            snapshot = {code: list(values) for code, values in self._counters.items()}
+        usage = []
+        for code, (chats, prompt_chars, response_chars, latency, cost) in sorted(snapshot.items()):
+            usage.append({
+                'model': MODEL_NAMES.get(code, 'other'),
+                'chats': chats,
+                'avg_prompt_length': round(prompt_chars / chats, 1),
+                'avg_response_length': round(response_chars / chats, 1),
+                'avg_latency_ms': round(latency / chats, 1),
+                'total_cost': round(cost, 2)
+            })
+        return usage
+
+    def get_stats(self) -> Dict:
+        return {
+            'since': self.started_at,
+            'models': self.get_model_usage(),
+            'pipeline': self.batcher.get_stats() if self.batcher else None
+        }
+
+
+# Global chat analytics instance
+chat_analytics = ChatAnalytics()
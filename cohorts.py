@@ -0,0 +1,184 @@
+"""
+Ganesh AI - Cohort Analytics
+Weekly signup cohorts, retention curves and the signup funnel, computed
+with NumPy over compact integer arrays
+
+The tables are only read for ``(user_id, day)`` pairs inside the report
+window, in chunks; matching events to cohorts and counting distinct users
+per cell, which would be correlated subqueries in SQL, is done with
+sorting, ``np.unique`` and ``np.bincount``. Reports are computed at most
+once per UTC day.
+"""
+
+import os
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from stats_cache import DailyValue
+
+EPOCH_DAY = date(1970, 1, 1)
+FUNNEL_STEPS = ('visitors', 'registered', 'first_chat', 'premium')
+
+
+def day_numbers(timestamps) -> np.ndarray:
+    """Days since the epoch of naive UTC datetimes"""
+    return np.array(list(timestamps), dtype='datetime64[D]').astype(np.int64)
+
+
+def week_of(days):
+    """Monday-based week number of a day number (1970-01-01 was a Thursday)"""
+    return (days + 3) // 7
+
+
+def week_start(week: int) -> date:
+    return EPOCH_DAY + timedelta(days=int(week) * 7 - 3)
+
+
+def extract_days(connection, statement, chunk_size: int = 50000) -> Tuple[np.ndarray, np.ndarray]:
+    """``(user_ids, days)`` arrays from a statement selecting ``(user_id, timestamp)``"""
+    ids, days = [], []
+    result = connection.execution_options(stream_results=True).execute(statement)
+    while True:
+        rows = result.fetchmany(chunk_size)
+        if not rows:
+            break
+        chunk_ids, chunk_times = zip(*rows)
+        ids.append(np.array(chunk_ids, dtype=np.int64))
+        days.append(day_numbers(chunk_times))
+    if not ids:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(ids), np.concatenate(days)
+
+
+def retention_counts(user_ids: np.ndarray, signup_days: np.ndarray, event_ids: np.ndarray,
+                     event_days: np.ndarray, first_week: int, weeks: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Cohort sizes and ``active[c, k]``, the users of cohort ``first_week + c`` active in their week ``k``.
+
+    A user counts once per week however many events they have; events of
+    users outside the cohorts are ignored.
+    """
+    cohorts = week_of(signup_days) - first_week
+    keep = (cohorts >= 0) & (cohorts < weeks)
+    user_ids, cohorts = user_ids[keep], cohorts[keep]
+    sizes = np.bincount(cohorts, minlength=weeks)
+    if not len(user_ids) or not len(event_ids):
+        return sizes, np.zeros((weeks, weeks), dtype=np.int64)
+
+    order = np.argsort(user_ids)
+    user_ids, cohorts = user_ids[order], cohorts[order]
+    positions = np.minimum(np.searchsorted(user_ids, event_ids), len(user_ids) - 1)
+    found = user_ids[positions] == event_ids
+    positions = positions[found]
+    offsets = week_of(event_days[found]) - first_week - cohorts[positions]
+    valid = (offsets >= 0) & (offsets < weeks)
+
+    # One key per (user, week since signup), deduplicated
+    keys = np.unique(positions[valid] * weeks + offsets[valid])
+    cells = cohorts[keys // weeks] * weeks + keys % weeks
+    return sizes, np.bincount(cells, minlength=weeks * weeks).reshape(weeks, weeks)
+
+
+def funnel_counts(visitors: int, signup_ids: np.ndarray, step_ids: Sequence[np.ndarray]) -> List[int]:
+    """Users reaching each funnel step; a user only counts at a step if they reached the previous ones"""
+    reached = np.unique(signup_ids)
+    counts = [int(visitors), len(reached)]
+    for ids in step_ids:
+        reached = reached[np.isin(reached, ids)]
+        counts.append(len(reached))
+    return counts
+
+
+class CohortAnalytics:
+    """Builds the cohort and funnel report and keeps one per UTC day.
+
+    ``report(extract)`` returns today's report, calling ``extract(analytics,
+    today)`` for the first request of the day (or on ``refresh``).
+    """
+
+    def __init__(self, weeks: int = 12, funnel_days: int = 30, log: Optional[Callable] = None):
+        self.weeks = weeks
+        self.funnel_days = funnel_days
+        self.log = log or (lambda section, level, message, extra=None: None)
+        self._daily = DailyValue('cohort report', log=lambda *args: self.log(*args))
+
+    def first_week(self, today: date) -> int:
+        return week_of((today - EPOCH_DAY).days) - self.weeks + 1
+
+    def window_start(self, today: date) -> datetime:
+        """Earliest timestamp the report reads"""
+        start = min(week_start(self.first_week(today)), today - timedelta(days=self.funnel_days - 1))
+        return datetime.combine(start, datetime.min.time())
+
+    def funnel_start(self, today: date) -> datetime:
+        return datetime.combine(today - timedelta(days=self.funnel_days - 1), datetime.min.time())
+
+    def build(self, today: date, users: Tuple[np.ndarray, np.ndarray],
+              activity: Sequence[Tuple[np.ndarray, np.ndarray]], visitors: int,
+              chat_ids: Sequence[np.ndarray], premium_ids: np.ndarray) -> Dict:
+        """The report from extracted arrays.
+
+        ``users`` are signups in the window, ``activity`` the
+        ``(user_ids, days)`` of anything counting as active (signing up
+        counts too), ``chat_ids`` the users who chatted (one array per
+        source), ``premium_ids`` the users who went premium, and
+        ``visitors`` the distinct visitors in the funnel window.
+        """
+        user_ids, signup_days = users
+        event_ids = np.concatenate([user_ids] + [ids for ids, _ in activity])
+        event_days = np.concatenate([signup_days] + [days for _, days in activity])
+        first_week = self.first_week(today)
+        current_week = first_week + self.weeks - 1
+        sizes, active = retention_counts(user_ids, signup_days, event_ids, event_days, first_week, self.weeks)
+
+        cohorts = []
+        for index in range(self.weeks):
+            size = int(sizes[index])
+            # Weeks that have not happened yet are left out rather than reported as zero
+            observed = current_week - (first_week + index) + 1
+            cohorts.append({
+                'week': week_start(first_week + index).isoformat(),
+                'size': size,
+                'active': active[index, :observed].tolist(),
+                'retention': [round(count / size, 4) if size else None for count in active[index, :observed].tolist()]
+            })
+
+        # Average curve, each week weighted by the cohorts that have reached it
+        curve = []
+        for offset in range(self.weeks):
+            reached = self.weeks - offset
+            total = int(sizes[:reached].sum())
+            curve.append(round(int(active[:reached, offset].sum()) / total, 4) if total else None)
+
+        funnel_from = (self.funnel_start(today).date() - EPOCH_DAY).days
+        in_funnel = user_ids[signup_days >= funnel_from]
+        counts = funnel_counts(visitors, in_funnel, [np.concatenate(list(chat_ids)), premium_ids])
+        funnel = [
+            {
+                'step': step,
+                'users': count,
+                'conversion': round(count / counts[index - 1], 4) if index and counts[index - 1] else None
+            }
+            for index, (step, count) in enumerate(zip(FUNNEL_STEPS, counts))
+        ]
+
+        return {
+            'day': today.isoformat(),
+            'cohort_weeks': self.weeks,
+            'cohorts': cohorts,
+            'retention_curve': curve,
+            'funnel_days': self.funnel_days,
+            'funnel': funnel
+        }
+
+    def report(self, extract: Callable[['CohortAnalytics', date], Dict], refresh: bool = False) -> Tuple[Dict, Dict]:
+        """``(report, info)`` for the current UTC day"""
+        return self._daily.get(lambda today: extract(self, today), refresh)
+
+
+# Global cohort analytics instance
+cohort_analytics = CohortAnalytics(
+    weeks=int(os.getenv("COHORT_WEEKS", "12")),
+    funnel_days=int(os.getenv("FUNNEL_DAYS", "30"))
+)
@@ -0,0 +1,107 @@
+"""
+Ganesh AI - Database Engine Profiles
+Connection pool options and per-connection tuning for each backend
+"""
+
+import os
+from typing import Dict
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# Applied to every new SQLite connection, in this order. journal_mode=WAL
+# lets readers run alongside the single writer; busy_timeout makes writers
+# wait for the lock instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+    'journal_mode': os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    'synchronous': os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    'busy_timeout': int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    'cache_size': -int(os.getenv("SQLITE_CACHE_SIZE_KB", "20000")),
+    'mmap_size': int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    'temp_store': os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+}
+
+# Sized for gunicorn's thread model: one connection per worker thread
+# (Procfile runs --threads 8) plus a little overflow for the background
+# Telegram and analytics threads.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "4"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# PostgreSQL: recycle before typical proxy/idle timeouts and cap runaway queries
+PG_POOL_RECYCLE = int(os.getenv("PG_POOL_RECYCLE", "1800"))
+PG_STATEMENT_TIMEOUT_MS = int(os.getenv("PG_STATEMENT_TIMEOUT_MS", "30000"))
+PG_APPLICATION_NAME = os.getenv("PG_APPLICATION_NAME", "ganesh-ai")
+
+
+def normalize_database_url(url: str) -> str:
+    """Accept Heroku/Render style ``postgres://`` URLs"""
+    if url.startswith("postgres://"):
+        return "postgresql+psycopg2://" + url[len("postgres://"):]
+    return url
+
+
+def is_file_sqlite(url: str) -> bool:
+    """True for on-disk SQLite URLs (in-memory databases are left alone)"""
+    parsed = make_url(url)
+    return parsed.get_backend_name() == 'sqlite' and parsed.database not in (None, '', ':memory:')
+
+
+def sqlite_engine_options() -> Dict:
+    """SQLAlchemy engine options for a file-backed SQLite database"""
+    return {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'connect_args': {
+            # The pool hands connections across gunicorn threads
+            'check_same_thread': False,
+            'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000
+        }
+    }
+
+
+def postgres_engine_options() -> Dict:
+    """SQLAlchemy engine options for PostgreSQL"""
+    return {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': PG_POOL_RECYCLE,
+        'pool_pre_ping': True,
+        'connect_args': {
+            'application_name': PG_APPLICATION_NAME,
+            'connect_timeout': 10,
+            # Sessions run in UTC so naive utcnow() values round-trip through TIMESTAMPTZ
+            'options': f"-c timezone=UTC -c statement_timeout={PG_STATEMENT_TIMEOUT_MS}"
+        }
+    }
+
+
+def engine_options(url: str) -> Dict:
+    """Engine options for ``url``'s backend, or ``{}`` for the defaults"""
+    if is_file_sqlite(url):
+        return sqlite_engine_options()
+    if make_url(url).get_backend_name() == 'postgresql':
+        return postgres_engine_options()
+    return {}
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record=None, pragmas: Dict = None):
+    """Apply the tuned pragmas to a raw sqlite3 connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in (pragmas or SQLITE_PRAGMAS).items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def apply_engine_profile(engine) -> str:
+    """Attach the backend's connect-time tuning to ``engine``; returns the profile name"""
+    if engine.dialect.name == 'sqlite' and is_file_sqlite(str(engine.url)):
+        event.listen(engine, 'connect', set_sqlite_pragmas)
+        return 'sqlite-wal'
+    if engine.dialect.name == 'postgresql':
+        return 'postgresql'
+    return 'default'
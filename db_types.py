@@ -0,0 +1,43 @@
+"""
+Ganesh AI - Portable Column Types
+Column types that map to native PostgreSQL types while keeping the
+Python values the app already works with
+"""
+
+from datetime import timezone
+
+from sqlalchemy import DateTime, Float, Numeric
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.types import TypeDecorator
+
+# Wallet and earnings amounts: exact NUMERIC on PostgreSQL, returned as
+# float so existing arithmetic like ``user.wallet += amount`` keeps working.
+Money = Float().with_variant(Numeric(14, 4, asdecimal=False), 'postgresql')
+
+
+class UTCDateTime(TypeDecorator):
+    """Naive-UTC datetimes stored as TIMESTAMPTZ on PostgreSQL.
+
+    The app compares against ``datetime.utcnow()`` throughout, so values
+    are always handed back as naive UTC regardless of the backend.
+    """
+
+    impl = DateTime
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(postgresql.TIMESTAMP(timezone=True))
+        return dialect.type_descriptor(DateTime())
+
+    def process_bind_param(self, value, dialect):
+        if value is None or dialect.name != 'postgresql':
+            return value
+        if value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc)
+
+    def process_result_value(self, value, dialect):
+        if value is not None and value.tzinfo is not None:
+            return value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
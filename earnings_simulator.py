@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Ganesh AI - Earnings Rate Simulator
+Replays historical visits, chats, referrals and payments under
+alternative pay-rate configurations using vectorized NumPy math
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import itertools
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import text
+
+# Rates that can be varied in a simulation
+RATE_FIELDS = ('visit_pay_rate', 'chat_pay_rate', 'referral_bonus', 'admin_share')
+
+# process_referral also credits the new user 10% of the bonus
+WELCOME_BONUS_RATIO = 0.1
+
+MAX_CONFIGS = 10000
+
+
+def to_day_index(timestamps, start_day: np.datetime64) -> np.ndarray:
+    """Convert DB timestamps (strings or datetimes) to day offsets from ``start_day``"""
+    if len(timestamps) == 0:
+        return np.zeros(0, dtype=np.int64)
+    values = [ts.replace(tzinfo=None) if getattr(ts, 'tzinfo', None) else ts for ts in timestamps]
+    days = np.array(values, dtype='datetime64[us]').astype('datetime64[D]')
+    return (days - start_day).astype(np.int64)
+
+
+class HistoricalEvents:
+    """Per-day event counts and amounts loaded from the database"""
+
+    def __init__(self, start_day: np.datetime64, days: int):
+        self.start_day = start_day
+        self.days = days
+        self.visits_user = np.zeros(days)   # credited visits by logged-in users
+        self.visits_all = np.zeros(days)    # all credited visits
+        self.chats = np.zeros(days)         # chat payouts
+        self.referrals = np.zeros(days)     # processed referrals
+        self.api_cost = np.zeros(days)      # paid model usage cost
+        self.payments = np.zeros(days)      # gateway payments received
+        self.loaded_at = time.time()
+
+    @classmethod
+    def from_database(cls, connection, start: datetime, end: datetime) -> 'HistoricalEvents':
+        """Load events in ``[start, end)`` into day-binned arrays"""
+        start_day = np.datetime64(start.date(), 'D')
+        days = (end.date() - start.date()).days + (1 if end.time() != datetime.min.time() else 0)
+        days = max(1, days)
+        events = cls(start_day, days)
+        params = {'start': start, 'end': end}
+
+        def binned(rows, weights=None):
+            index = to_day_index(rows, start_day)
+            keep = (index >= 0) & (index < days)
+            if weights is not None:
+                weights = np.asarray(weights, dtype=np.float64)[keep]
+            return np.bincount(index[keep], weights=weights, minlength=days)[:days]
+
+        rows = connection.execute(text(
+            "SELECT created_at, user_id FROM visits "
+            "WHERE earnings_generated > 0 AND created_at >= :start AND created_at < :end"
+        ), params).fetchall()
+        if rows:
+            created, user_ids = zip(*rows)
+            events.visits_all = binned(created)
+            logged_in = np.array([uid is not None for uid in user_ids])
+            events.visits_user = binned([c for c, keep in zip(created, logged_in) if keep])
+
+        rows = connection.execute(text(
+            "SELECT created_at, cost FROM api_usage "
+            "WHERE cost > 0 AND created_at >= :start AND created_at < :end"
+        ), params).fetchall()
+        if rows:
+            created, cost = zip(*rows)
+            events.api_cost = binned(created, cost)
+
+        rows = connection.execute(text(
+            "SELECT created_at FROM referrals WHERE created_at >= :start AND created_at < :end"
+        ), params).scalars().all()
+        events.referrals = binned(rows)
+
+        rows = connection.execute(text(
+            "SELECT created_at, amount, "
+            "CASE WHEN description LIKE 'Chat with %' THEN 1 ELSE 2 END AS kind "
+            "FROM transactions WHERE transaction_type = 'credit' "
+            "AND (description LIKE 'Chat with %' OR description LIKE 'Payment received:%') "
+            "AND created_at >= :start AND created_at < :end"
+        ), params).fetchall()
+        if rows:
+            created, amount, kind = zip(*rows)
+            kind = np.array(kind)
+            created = np.array(created, dtype=object)
+            events.chats = binned(created[kind == 1])
+            events.payments = binned(created[kind == 2], np.array(amount, dtype=np.float64)[kind == 2])
+
+        return events
+
+    def totals(self) -> Dict:
+        return {
+            'visits_user': int(self.visits_user.sum()),
+            'visits_all': int(self.visits_all.sum()),
+            'chats': int(self.chats.sum()),
+            'referrals': int(self.referrals.sum()),
+            'api_cost': float(self.api_cost.sum()),
+            'payments': float(self.payments.sum())
+        }
+
+
+def grid_size(grid: Dict[str, List[float]]) -> int:
+    """Number of configurations ``expand_grid`` would produce, without building them"""
+    return math.prod(len(grid[f]) for f in RATE_FIELDS if f in grid)
+
+
+def expand_grid(grid: Dict[str, List[float]], baseline: Dict[str, float]) -> List[Dict]:
+    """Cartesian product of rate values, unspecified rates taken from ``baseline``"""
+    if grid_size(grid) > MAX_CONFIGS:
+        raise ValueError(f"At most {MAX_CONFIGS} configurations per simulation")
+    fields = [f for f in RATE_FIELDS if f in grid]
+    configs = []
+    for values in itertools.product(*(grid[f] for f in fields)):
+        config = dict(baseline)
+        config.update(zip(fields, values))
+        configs.append(config)
+    return configs
+
+
+def simulate(events: HistoricalEvents, configs: List[Dict],
+             include_daily: bool = False) -> Dict:
+    """Replay ``events`` under every rate configuration at once.
+
+    Each rate becomes a ``(K, 1)`` column that is broadcast against the
+    ``(D,)`` daily series, so all K configs are evaluated in a handful of
+    array operations.
+    """
+    if not configs:
+        raise ValueError("At least one configuration is required")
+    if len(configs) > MAX_CONFIGS:
+        raise ValueError(f"At most {MAX_CONFIGS} configurations per simulation")
+
+    rates = {f: np.array([float(c[f]) for c in configs])[:, None] for f in RATE_FIELDS}
+
+    visit_payouts = rates['visit_pay_rate'] * events.visits_user
+    chat_payouts = rates['chat_pay_rate'] * events.chats
+    referral_payouts = rates['referral_bonus'] * (1 + WELCOME_BONUS_RATIO) * events.referrals
+    user_payouts = visit_payouts + chat_payouts + referral_payouts
+
+    admin_visit_share = rates['visit_pay_rate'] * rates['admin_share'] * events.visits_all
+    admin_api_share = rates['admin_share'] * events.api_cost
+    admin_revenue = admin_visit_share + admin_api_share + events.payments
+
+    net = admin_revenue - user_payouts
+
+    def total(series):
+        return series.sum(axis=1)
+
+    results = []
+    columns = {
+        'visit_payouts': total(visit_payouts),
+        'chat_payouts': total(chat_payouts),
+        'referral_payouts': total(referral_payouts),
+        'user_payouts': total(user_payouts),
+        'admin_visit_share': total(admin_visit_share),
+        'admin_api_share': total(admin_api_share),
+        'admin_revenue': total(admin_revenue),
+        'net': total(net)
+    }
+    for k, config in enumerate(configs):
+        row = {'config': {f: float(config[f]) for f in RATE_FIELDS}}
+        row.update({name: round(float(values[k]), 2) for name, values in columns.items()})
+        if include_daily:
+            row['daily_net'] = np.round(net[k], 2).tolist()
+        results.append(row)
+
+    return {
+        'start': str(events.start_day),
+        'days': events.days,
+        'events': events.totals(),
+        'results': results
+    }
+
+
+class EarningsSimulator:
+    """Caches loaded history so repeated what-if runs skip the DB"""
+
+    def __init__(self, cache_seconds: int = 300):
+        self.cache_seconds = cache_seconds
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def load(self, engine, start: datetime, end: datetime) -> HistoricalEvents:
+        key = (start.date(), end.date())
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached and time.time() - cached.loaded_at < self.cache_seconds:
+                return cached
+
+        with engine.connect() as connection:
+            events = HistoricalEvents.from_database(connection, start, end)
+
+        with self._lock:
+            self._cache = {key: events}
+        return events
+
+    def run(self, engine, baseline: Dict, configs: Optional[List[Dict]] = None,
+            grid: Optional[Dict] = None, days: int = 90,
+            include_daily: bool = False) -> Dict:
+        end = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        start = end - timedelta(days=days)
+
+        for name in itertools.chain(grid or {}, *(configs or [])):
+            if name not in RATE_FIELDS:
+                raise ValueError(f"Unknown rate '{name}', expected one of {RATE_FIELDS}")
+        # Checked before anything is built: the baseline plus every config and grid point
+        if 1 + len(configs or []) + (grid_size(grid) if grid else 0) > MAX_CONFIGS:
+            raise ValueError(f"At most {MAX_CONFIGS} configurations per simulation")
+
+        candidates = [dict(baseline)]
+        for config in configs or []:
+            candidates.append({**baseline, **config})
+        if grid:
+            candidates.extend(expand_grid(grid, baseline))
+
+        started = time.perf_counter()
+        events = self.load(engine, start, end)
+        loaded = time.perf_counter()
+        result = simulate(events, candidates, include_daily)
+        result['timing_ms'] = {
+            'load': round((loaded - started) * 1000, 2),
+            'simulate': round((time.perf_counter() - loaded) * 1000, 2)
+        }
+        result['baseline'] = result['results'][0]
+        return result
+
+
+# Global simulator instance
+earnings_simulator = EarningsSimulator(int(os.getenv("SIMULATION_CACHE_SECONDS", "300")))
+
+
+# Helper functions for main.py integration
+def run_simulation(engine, baseline: Dict, configs: Optional[List[Dict]] = None,
+                   grid: Optional[Dict] = None, days: int = 90,
+                   include_daily: bool = False) -> Dict:
+    """Simulate the last ``days`` days under alternative rate configs"""
+    return earnings_simulator.run(engine, baseline, configs, grid, days, include_daily)
+
+
+def _parse_assignments(value: str) -> Dict[str, float]:
+    config = {}
+    for part in value.split(','):
+        name, _, number = part.partition('=')
+        if name not in RATE_FIELDS:
+            raise argparse.ArgumentTypeError(f"Unknown rate '{name}', expected one of {RATE_FIELDS}")
+        config[name] = float(number)
+    return config
+
+
+def _parse_grid(value: str):
+    name, _, numbers = value.partition('=')
+    if name not in RATE_FIELDS:
+        raise argparse.ArgumentTypeError(f"Unknown rate '{name}', expected one of {RATE_FIELDS}")
+    return name, [float(n) for n in numbers.split(':')]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay historical earnings under alternative rates")
+    parser.add_argument('--days', type=int, default=90, help="History window in days (default 90)")
+    parser.add_argument('--config', type=_parse_assignments, action='append', default=[],
+                        help="Rate overrides, e.g. visit_pay_rate=0.02,admin_share=0.6")
+    parser.add_argument('--grid', type=_parse_grid, action='append', default=[],
+                        help="Values to sweep, e.g. chat_pay_rate=0.01:0.03:0.05")
+    parser.add_argument('--daily', action='store_true', help="Include daily net series")
+    args = parser.parse_args(argv)
+
+    from main import app, db, VISIT_PAY_RATE, CHAT_PAY_RATE, REFERRAL_BONUS, ADMIN_SHARE
+
+    baseline = {
+        'visit_pay_rate': VISIT_PAY_RATE,
+        'chat_pay_rate': CHAT_PAY_RATE,
+        'referral_bonus': REFERRAL_BONUS,
+        'admin_share': ADMIN_SHARE
+    }
+    with app.app_context():
+        result = run_simulation(db.engine, baseline, args.config, dict(args.grid) or None,
+                                args.days, args.daily)
+
+    json.dump(result, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""
+Ganesh AI - Live Event Hub
+Fan-out of server-sent events (SSE) to connected dashboards
+
+Each published event is serialized to an SSE frame once and the same frame
+is queued for every subscriber of its channel. Subscribers live in this
+process only, so with several worker processes an event reaches the
+dashboards connected to the worker that committed it.
+"""
+
+import os
+import json
+import time
+import queue
+import threading
+from typing import Dict, Iterable, Iterator, Set
+
+
+def format_event(event: str, data) -> str:
+    """One SSE frame"""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'), default=str)}\n\n"
+
+
+class HubFull(Exception):
+    """Raised when a subscriber pool already has its maximum number of connections"""
+
+
+class Subscription:
+    """One connected client; frames wait in a bounded queue until streamed"""
+
+    __slots__ = ('channels', 'pool', 'queue', 'overflowed')
+
+    def __init__(self, channels: Iterable[str], pool: str, queue_size: int):
+        self.channels = tuple(channels)
+        self.pool = pool
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+
+class EventHub:
+    """Channel-based publish/subscribe for SSE streams.
+
+    A subscriber that falls ``queue_size`` frames behind is disconnected
+    rather than silently skipping frames; its ``EventSource`` reconnects
+    and starts again from a fresh snapshot. Each stream also ends after
+    ``max_connection_seconds`` so long-lived connections release their
+    server thread periodically.
+
+    Connections are capped per pool (``max_subscribers`` maps pool name to
+    its cap), so user dashboards can never take the slots the admin stream
+    needs. A pool without an entry gets no connections.
+    """
+
+    def __init__(self, max_subscribers: Dict[str, int] = None, queue_size: int = 100,
+                 heartbeat_seconds: float = 15, max_connection_seconds: float = 300):
+        self.max_subscribers = dict(max_subscribers or {'admin': 2, 'user': 2})
+        self.queue_size = queue_size
+        self.heartbeat_seconds = heartbeat_seconds
+        self.max_connection_seconds = max_connection_seconds
+        self._channels: Dict[str, Set[Subscription]] = {}
+        self._counts: Dict[str, int] = {pool: 0 for pool in self.max_subscribers}
+        self._lock = threading.Lock()
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def subscribe(self, channels: Iterable[str], pool: str) -> Subscription:
+        subscription = Subscription(channels, pool, self.queue_size)
+        with self._lock:
+            count = self._counts.get(pool, 0)
+            if count >= self.max_subscribers.get(pool, 0):
+                raise HubFull(f"{count} {pool} live connections already open")
+            self._counts[pool] = count + 1
+            for channel in subscription.channels:
+                self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            removed = False
+            for channel in subscription.channels:
+                subscribers = self._channels.get(channel)
+                if subscribers and subscription in subscribers:
+                    subscribers.discard(subscription)
+                    removed = True
+                    if not subscribers:
+                        del self._channels[channel]
+            if removed:
+                self._counts[subscription.pool] -= 1
+
+    def has_subscribers(self, channel: str) -> bool:
+        return channel in self._channels
+
+    def publish(self, channel: str, event: str, data) -> int:
+        """Queue ``event`` for every subscriber of ``channel``; returns how many got it"""
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        if not subscribers:
+            return 0
+
+        frame = format_event(event, data)
+        self.published += 1
+        delivered = 0
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(frame)
+                delivered += 1
+            except queue.Full:
+                subscription.overflowed = True
+                self.dropped += 1
+        self.delivered += delivered
+        return delivered
+
+    def stream(self, subscription: Subscription, first_frames: Iterable[str] = ()) -> Iterator[str]:
+        """SSE body for ``subscription``; unsubscribes when the client goes away"""
+        try:
+            yield "retry: 3000\n\n"
+            yield from first_frames
+            deadline = time.monotonic() + self.max_connection_seconds
+            while not subscription.overflowed and time.monotonic() < deadline:
+                try:
+                    yield subscription.queue.get(timeout=self.heartbeat_seconds)
+                except queue.Empty:
+                    # Comment line: keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+        finally:
+            self.unsubscribe(subscription)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            channels = {name: len(subscribers) for name, subscribers in self._channels.items()}
+            pools = dict(self._counts)
+        return {
+            'connections': sum(pools.values()),
+            'pools': pools,
+            'max_subscribers': self.max_subscribers,
+            'channels': len(channels),
+            'admin_connections': channels.get('admin', 0),
+            'published': self.published,
+            'delivered': self.delivered,
+            'dropped': self.dropped
+        }
+
+
+# Global event hub instance. Every open stream holds a server thread, so
+# keep the two caps together well below the worker's thread count.
+event_hub = EventHub(
+    max_subscribers={
+        'admin': int(os.getenv("LIVE_MAX_ADMIN_SUBSCRIBERS", "2")),
+        'user': int(os.getenv("LIVE_MAX_USER_SUBSCRIBERS", "2"))
+    },
+    queue_size=int(os.getenv("LIVE_QUEUE_SIZE", "100")),
+    heartbeat_seconds=float(os.getenv("LIVE_HEARTBEAT_SECONDS", "15")),
+    max_connection_seconds=float(os.getenv("LIVE_MAX_CONNECTION_SECONDS", "300"))
+)
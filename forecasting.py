@@ -0,0 +1,153 @@
+"""
+Ganesh AI - Forecasting
+Daily revenue and usage projections from the metric rollups
+
+Each daily series is split into a weekly seasonal pattern and a
+seasonally adjusted remainder (classical additive decomposition), the
+remainder is projected with damped-trend exponential smoothing (Holt),
+and the weekly pattern is added back. The smoothing parameters are picked
+by evaluating a whole grid of candidates at once: every NumPy step of the
+recursion advances all candidates together, so fitting costs one pass over
+the history. Forecasts are rebuilt once per UTC day.
+"""
+
+import os
+from datetime import date, timedelta
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from stats_cache import DailyValue
+
+SEASON_DAYS = 7
+
+# Candidate smoothing parameters: level, trend and trend damping
+ALPHAS = np.linspace(0.05, 0.95, 19)
+BETAS = np.linspace(0.0, 0.5, 11)
+PHIS = np.array([0.8, 0.9, 0.95, 0.98, 1.0])
+
+# z-score of the 95% prediction interval
+INTERVAL_Z = 1.96
+
+
+def seasonal_indices(series: np.ndarray, phases: np.ndarray, period: int = SEASON_DAYS) -> np.ndarray:
+    """Additive seasonal index per phase (mean deviation from the centered moving average).
+
+    Returns zeros when there are fewer than two full seasons.
+    """
+    if len(series) < 2 * period or period % 2 == 0:
+        return np.zeros(period)
+    trend = np.convolve(series, np.ones(period) / period, mode='valid')
+    half = period // 2
+    detrended = series[half:len(series) - half] - trend
+    detrended_phases = phases[half:len(series) - half]
+    sums = np.bincount(detrended_phases, weights=detrended, minlength=period)
+    counts = np.bincount(detrended_phases, minlength=period)
+    indices = sums / np.maximum(counts, 1)
+    return indices - indices.mean()
+
+
+def fit_holt(series: np.ndarray) -> Dict:
+    """Damped-trend Holt smoothing with the grid candidate of least one-step squared error"""
+    alpha, beta, phi = (grid.ravel() for grid in np.meshgrid(ALPHAS, BETAS, PHIS, indexing='ij'))
+    level = np.full(alpha.shape, series[0])
+    trend = np.full(alpha.shape, series[1] - series[0])
+    sse = np.zeros(alpha.shape)
+    for value in series[1:]:
+        predicted = level + phi * trend
+        sse += (value - predicted) ** 2
+        new_level = alpha * value + (1 - alpha) * predicted
+        trend = beta * (new_level - level) + (1 - beta) * phi * trend
+        level = new_level
+
+    best = int(np.argmin(sse))
+    return {
+        'alpha': float(alpha[best]),
+        'beta': float(beta[best]),
+        'phi': float(phi[best]),
+        'level': float(level[best]),
+        'trend': float(trend[best]),
+        'sigma': float(np.sqrt(sse[best] / (len(series) - 1)))
+    }
+
+
+def forecast_series(series: np.ndarray, first_day: int, horizon: int,
+                    period: int = SEASON_DAYS) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict]:
+    """``(forecast, lower, upper, model)`` for the ``horizon`` days after ``series``.
+
+    ``first_day`` is the day number of ``series[0]``, so the weekly phases
+    line up across calls. Projections are clipped at zero.
+    """
+    series = np.asarray(series, dtype=float)
+    phases = (first_day + np.arange(len(series) + horizon)) % period
+    steps = np.arange(1, horizon + 1)
+
+    if len(series) < 3:
+        mean = float(series.mean()) if len(series) else 0.0
+        forecast = np.full(horizon, mean)
+        return forecast, forecast.copy(), forecast.copy(), {'method': 'mean'}
+
+    indices = seasonal_indices(series, phases[:len(series)], period)
+    model = fit_holt(series - indices[phases[:len(series)]])
+    phi = model['phi']
+    damping = np.cumsum(phi ** steps)
+    forecast = model['level'] + model['trend'] * damping + indices[phases[len(series):]]
+    # Approximate interval: one-step error growing with the square root of the horizon
+    spread = INTERVAL_Z * model['sigma'] * np.sqrt(steps)
+    model.update(method='holt', seasonal=[round(float(value), 4) for value in indices])
+    return (np.maximum(forecast, 0), np.maximum(forecast - spread, 0), np.maximum(forecast + spread, 0), model)
+
+
+class Forecaster:
+    """Builds the daily projections of the configured metrics, once per UTC day.
+
+    ``report(read)`` calls ``read(start, end)`` for ``{name: daily values}``
+    over the complete days ``[start, end)`` of history and keeps the result
+    until the next day.
+    """
+
+    def __init__(self, history_days: int = 180, horizon_days: int = 30, log: Optional[Callable] = None):
+        self.history_days = history_days
+        self.horizon_days = horizon_days
+        self.log = log or (lambda section, level, message, extra=None: None)
+        self._daily = DailyValue('forecast', log=lambda *args: self.log(*args))
+
+    def build(self, today: date, history: Dict[str, np.ndarray]) -> Dict:
+        start = today - timedelta(days=self.history_days)
+        first_day = (start - date(1970, 1, 1)).days
+        metrics = {}
+        for name, series in history.items():
+            series = np.asarray(series, dtype=float)
+            # Leading days before the metric existed would read as a collapse to zero
+            nonzero = np.flatnonzero(series)
+            skip = int(nonzero[0]) if len(nonzero) else len(series)
+            forecast, lower, upper, model = forecast_series(series[skip:], first_day + skip, self.horizon_days)
+            metrics[name] = {
+                'history': [round(float(value), 4) for value in series],
+                'forecast': [round(float(value), 4) for value in forecast],
+                'lower': [round(float(value), 4) for value in lower],
+                'upper': [round(float(value), 4) for value in upper],
+                'next_7_days': round(float(forecast[:7].sum()), 2),
+                'next_30_days': round(float(forecast[:30].sum()), 2),
+                'model': model
+            }
+        return {
+            'day': today.isoformat(),
+            'history_start': start.isoformat(),
+            'forecast_start': today.isoformat(),
+            'horizon_days': self.horizon_days,
+            'metrics': metrics
+        }
+
+    def report(self, read: Callable[[date, date], Dict[str, np.ndarray]], refresh: bool = False) -> Tuple[Dict, Dict]:
+        """``(report, info)`` for the current UTC day"""
+        def compute(today):
+            return self.build(today, read(today - timedelta(days=self.history_days), today))
+        return self._daily.get(compute, refresh)
+
+
+# Global forecaster instance
+forecaster = Forecaster(
+    history_days=int(os.getenv("FORECAST_HISTORY_DAYS", "180")),
+    horizon_days=int(os.getenv("FORECAST_HORIZON_DAYS", "30"))
+)
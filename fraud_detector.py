@@ -0,0 +1,198 @@
+"""
+Ganesh AI - Streaming Visit Fraud Detection
+Sliding-window counters per IP, user and user-agent fingerprint
+"""
+
+import os
+import time
+import heapq
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+
+class SlidingWindowCounter:
+    """Bounded set of per-key sliding-window counters.
+
+    Every key owns a ring of ``buckets`` sub-window counts plus a running
+    total, so an update touches at most ``buckets`` slots regardless of
+    traffic. Keys are kept in LRU order and the least recently seen key is
+    evicted once ``max_keys`` is reached.
+    """
+
+    def __init__(self, window_seconds: float = 60.0, buckets: int = 12,
+                 max_keys: int = 50000):
+        self.window_seconds = window_seconds
+        self.buckets = buckets
+        self.bucket_width = window_seconds / buckets
+        self.max_keys = max_keys
+        # key -> [total, last_tick, ring of bucket counts]
+        self._entries = OrderedDict()
+
+    def add(self, key: str, now: Optional[float] = None) -> int:
+        """Record one event for ``key`` and return the count in the window"""
+        now = time.monotonic() if now is None else now
+        tick = int(now / self.bucket_width)
+        entry = self._entries.get(key)
+
+        if entry is None:
+            if len(self._entries) >= self.max_keys:
+                self._entries.popitem(last=False)
+            entry = [0, tick, [0] * self.buckets]
+            self._entries[key] = entry
+        else:
+            self._advance(entry, tick)
+            self._entries.move_to_end(key)
+
+        entry[2][tick % self.buckets] += 1
+        entry[0] += 1
+        return entry[0]
+
+    def count(self, key: str, now: Optional[float] = None) -> int:
+        """Current count in the window for ``key``"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return 0
+        now = time.monotonic() if now is None else now
+        self._advance(entry, int(now / self.bucket_width))
+        return entry[0]
+
+    def _advance(self, entry: List, tick: int):
+        """Expire buckets that slid out of the window since the last update"""
+        elapsed = tick - entry[1]
+        if elapsed <= 0:
+            return
+        ring = entry[2]
+        for step in range(1, min(elapsed, self.buckets) + 1):
+            slot = (entry[1] + step) % self.buckets
+            entry[0] -= ring[slot]
+            ring[slot] = 0
+        entry[1] = tick
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class VisitFraudDetector:
+    """Online anomaly detector for the visit earnings path"""
+
+    def __init__(self):
+        self.enabled = os.getenv("FRAUD_DETECTION_ENABLED", "true").lower() == "true"
+        window = float(os.getenv("FRAUD_WINDOW_SECONDS", "60"))
+        buckets = int(os.getenv("FRAUD_WINDOW_BUCKETS", "12"))
+        max_keys = int(os.getenv("FRAUD_MAX_KEYS", "50000"))
+
+        self.thresholds = {
+            'ip': int(os.getenv("FRAUD_IP_THRESHOLD", "30")),
+            'user': int(os.getenv("FRAUD_USER_THRESHOLD", "20")),
+            'ua': int(os.getenv("FRAUD_UA_THRESHOLD", "200")),
+        }
+        self.counters = {
+            dimension: SlidingWindowCounter(window, buckets, max_keys)
+            for dimension in self.thresholds
+        }
+        self.max_offenders = int(os.getenv("FRAUD_MAX_OFFENDERS", "1000"))
+        self._offenders = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(user_agent: Optional[str], accept_language: Optional[str] = None) -> str:
+        """Short stable fingerprint of the client's user agent"""
+        raw = f"{(user_agent or '').strip().lower()}|{(accept_language or '').strip().lower()}"
+        return hashlib.blake2b(raw.encode('utf-8'), digest_size=8).hexdigest()
+
+    def inspect(self, ip_address: Optional[str], user_id: Optional[int],
+                fingerprint: Optional[str]) -> Dict:
+        """Count a visit and decide whether its earnings should be credited.
+
+        Returns ``{'suppress': bool, 'flag_user': bool, 'reasons': [...]}``.
+        """
+        verdict = {'suppress': False, 'flag_user': False, 'reasons': []}
+        if not self.enabled:
+            return verdict
+
+        keys = {'ip': ip_address, 'user': user_id, 'ua': fingerprint}
+        with self._lock:
+            for dimension, key in keys.items():
+                if key is None or key == '':
+                    continue
+                key = str(key)
+                count = self.counters[dimension].add(key)
+                if count > self.thresholds[dimension]:
+                    verdict['suppress'] = True
+                    verdict['reasons'].append(dimension)
+                    self._record_offender(dimension, key, count, user_id)
+
+        # A user is flagged when their own rate, or their IP's, is abusive
+        verdict['flag_user'] = user_id is not None and bool(
+            {'user', 'ip'} & set(verdict['reasons'])
+        )
+        return verdict
+
+    def _record_offender(self, dimension: str, key: str, count: int,
+                         user_id: Optional[int]):
+        """Track suppressed events per offending key (caller holds the lock)"""
+        offender_key = (dimension, key)
+        offender = self._offenders.get(offender_key)
+        if offender is None:
+            if len(self._offenders) >= self.max_offenders:
+                self._offenders.popitem(last=False)
+            offender = {'dimension': dimension, 'key': key, 'suppressed': 0,
+                        'peak_rate': 0, 'user_ids': set()}
+            self._offenders[offender_key] = offender
+        else:
+            self._offenders.move_to_end(offender_key)
+
+        offender['suppressed'] += 1
+        offender['peak_rate'] = max(offender['peak_rate'], count)
+        offender['last_seen'] = time.time()
+        if user_id is not None and len(offender['user_ids']) < 20:
+            offender['user_ids'].add(user_id)
+
+    def top_offenders(self, limit: int = 20) -> List[Dict]:
+        """Offending keys with the most suppressed visits"""
+        with self._lock:
+            top = heapq.nlargest(limit, self._offenders.values(),
+                                 key=lambda o: o['suppressed'])
+            return [{
+                'dimension': o['dimension'],
+                'key': o['key'],
+                'suppressed': o['suppressed'],
+                'peak_rate': o['peak_rate'],
+                'last_seen': o['last_seen'],
+                'user_ids': sorted(o['user_ids'])
+            } for o in top]
+
+    def get_stats(self) -> Dict:
+        """Thresholds and tracked key counts"""
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'window_seconds': self.counters['ip'].window_seconds,
+                'thresholds': dict(self.thresholds),
+                'tracked_keys': {d: len(c) for d, c in self.counters.items()},
+                'offenders': len(self._offenders)
+            }
+
+
+# Global fraud detector instance
+fraud_detector = VisitFraudDetector()
+
+
+# Helper functions for main.py integration
+def inspect_visit(ip_address: Optional[str], user_id: Optional[int],
+                  user_agent: Optional[str], accept_language: Optional[str] = None) -> Dict:
+    """Count a visit and return the fraud verdict"""
+    fingerprint = fraud_detector.fingerprint(user_agent, accept_language)
+    return fraud_detector.inspect(ip_address, user_id, fingerprint)
+
+
+def get_top_offenders(limit: int = 20) -> List[Dict]:
+    """Get the top fraud offenders"""
+    return fraud_detector.top_offenders(limit)
+
+
+def get_fraud_stats() -> Dict:
+    """Get fraud detector statistics"""
+    return fraud_detector.get_stats()
@@ -0,0 +1,60 @@
+"""
+Ganesh AI - String Intern Cache
+In-process cache for dictionary-encoded strings (user agents, referrers)
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+def value_hash(value: str) -> str:
+    """Fixed-width hash used as the unique key of a dictionary row"""
+    return hashlib.blake2b(value.encode('utf-8'), digest_size=8).hexdigest()
+
+
+class InternCache:
+    """Bounded two-way LRU cache between dictionary strings and row ids"""
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._ids = OrderedDict()     # value -> id
+        self._values = {}             # id -> value
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_id(self, value: str) -> Optional[int]:
+        with self._lock:
+            row_id = self._ids.get(value)
+            if row_id is None:
+                self.misses += 1
+                return None
+            self._ids.move_to_end(value)
+            self.hits += 1
+            return row_id
+
+    def get_value(self, row_id: int) -> Optional[str]:
+        with self._lock:
+            return self._values.get(row_id)
+
+    def put(self, value: str, row_id: int):
+        with self._lock:
+            if value in self._ids:
+                self._ids.move_to_end(value)
+                return
+            if len(self._ids) >= self.max_size:
+                old_value, old_id = self._ids.popitem(last=False)
+                self._values.pop(old_id, None)
+            self._ids[value] = row_id
+            self._values[row_id] = value
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+            self._values.clear()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {'size': len(self._ids), 'hits': self.hits, 'misses': self.misses}
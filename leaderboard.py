@@ -0,0 +1,322 @@
+"""
+Ganesh AI - Leaderboards
+In-memory ranked scores for the top-earner and top-referrer boards
+
+Each board keeps its users sorted by score and is updated with the new
+score whenever a committed transaction changes it, so the top of the
+board and any user's rank are read without sorting the users table.
+Boards are seeded from the database, snapshotted to an ``.npz`` file for
+a fast warm start, and periodically re-read from the database in the
+background; the boards live in each worker process, and only the worker
+holding ``<file>.lock`` writes the snapshot.
+"""
+
+import os
+import time
+import atexit
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from timeseries import claim_file
+
+# Entries per block before it is split in two
+BLOCK_SIZE = 512
+
+
+class RankedScores:
+    """Scores ordered by ``(-score, user_id)`` in bounded sorted blocks.
+
+    Finding an entry is a bisect over the blocks' last keys and one within
+    the block; the rank adds the sizes of the blocks before it from a
+    Fenwick tree. Updates, ``rank`` and ``top`` are logarithmic apart from
+    shifting entries inside one block. Only positive scores are ranked.
+    """
+
+    def __init__(self, block_size: int = BLOCK_SIZE):
+        self.block_size = block_size
+        self._scores: Dict[int, float] = {}
+        self._blocks: List[List[Tuple[float, int]]] = []
+        self._maxes: List[Tuple[float, int]] = []
+        self._tree: List[int] = []
+
+    def __len__(self):
+        return len(self._scores)
+
+    # ---- block sizes (Fenwick tree) -----------------------------------
+
+    def _rebuild_tree(self):
+        tree = [0] * len(self._blocks)
+        for index, block in enumerate(self._blocks):
+            tree[index] += len(block)
+            parent = index | (index + 1)
+            if parent < len(tree):
+                tree[parent] += tree[index]
+        self._tree = tree
+
+    def _resize(self, index: int, delta: int):
+        while index < len(self._tree):
+            self._tree[index] += delta
+            index |= index + 1
+
+    def _before(self, index: int) -> int:
+        """Entries in the blocks before ``index``"""
+        total = 0
+        while index > 0:
+            total += self._tree[index - 1]
+            index &= index - 1
+        return total
+
+    # ---- updates ------------------------------------------------------
+
+    def _insert(self, key: Tuple[float, int]):
+        if not self._blocks:
+            self._blocks.append([key])
+            self._maxes.append(key)
+            self._rebuild_tree()
+            return
+        index = min(bisect_left(self._maxes, key), len(self._blocks) - 1)
+        block = self._blocks[index]
+        insort(block, key)
+        self._maxes[index] = block[-1]
+        if len(block) > self.block_size:
+            half = len(block) // 2
+            self._blocks[index:index + 1] = [block[:half], block[half:]]
+            self._maxes[index:index + 1] = [block[half - 1], block[-1]]
+            self._rebuild_tree()
+        else:
+            self._resize(index, 1)
+
+    def _remove(self, key: Tuple[float, int]):
+        index = bisect_left(self._maxes, key)
+        block = self._blocks[index]
+        del block[bisect_left(block, key)]
+        if block:
+            self._maxes[index] = block[-1]
+            self._resize(index, -1)
+        else:
+            del self._blocks[index]
+            del self._maxes[index]
+            self._rebuild_tree()
+
+    def set(self, user_id: int, score: float):
+        score = float(score or 0)
+        previous = self._scores.get(user_id)
+        if previous == score:
+            return
+        if previous is not None:
+            self._remove((-previous, user_id))
+            del self._scores[user_id]
+        if score > 0:
+            self._insert((-score, user_id))
+            self._scores[user_id] = score
+
+    def load(self, user_ids: Sequence[int], scores: Sequence[float]):
+        """Replace every entry; one sort instead of an insert per user"""
+        keys = sorted((-float(score), int(user_id)) for user_id, score in zip(user_ids, scores) if score and score > 0)
+        self._scores = {user_id: -negated for negated, user_id in keys}
+        self._blocks = [keys[start:start + self.block_size] for start in range(0, len(keys), self.block_size)]
+        self._maxes = [block[-1] for block in self._blocks]
+        self._rebuild_tree()
+
+    # ---- reads --------------------------------------------------------
+
+    def score(self, user_id: int) -> Optional[float]:
+        return self._scores.get(user_id)
+
+    def rank(self, user_id: int) -> Optional[int]:
+        """1-based rank, or ``None`` when the user has no score"""
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        key = (-score, user_id)
+        index = bisect_left(self._maxes, key)
+        return self._before(index) + bisect_left(self._blocks[index], key) + 1
+
+    def top(self, limit: int) -> List[Tuple[int, float]]:
+        """``(user_id, score)`` of the ``limit`` highest scores"""
+        result = []
+        for block in self._blocks:
+            for negated, user_id in block:
+                if len(result) >= limit:
+                    return result
+                result.append((user_id, -negated))
+        return result
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """User ids and scores in rank order"""
+        keys = [key for block in self._blocks for key in block]
+        return (np.array([user_id for _, user_id in keys], dtype=np.int64),
+                np.array([-negated for negated, _ in keys], dtype=float))
+
+
+class Leaderboards:
+    """Named ``RankedScores`` boards shared by the request threads.
+
+    ``apply`` takes ``(board, user_id, new_score)`` changes after they are
+    committed. A resync re-reads every board from the database into new
+    structures; changes applied while it runs are replayed on top before
+    the boards are swapped, so none are lost.
+    """
+
+    def __init__(self, boards: Sequence[str], path: Optional[str] = None, log: Optional[Callable] = None):
+        self.names = tuple(boards)
+        self.path = path
+        self.log = log or (lambda section, level, message, extra=None: None)
+        self._boards = {name: RankedScores() for name in self.names}
+        self._lock = threading.Lock()
+        self._replay: Optional[List[Tuple[str, int, float]]] = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._writer = None
+        self.ready = False
+        self.loaded_from = None
+        self.last_synced = None
+        self.last_saved = None
+        self.updates = 0
+
+    def apply(self, changes: Iterable[Tuple[str, int, float]]):
+        with self._lock:
+            for name, user_id, score in changes:
+                self._boards[name].set(user_id, score)
+                if self._replay is not None:
+                    self._replay.append((name, user_id, score))
+                self.updates += 1
+
+    def top(self, name: str, limit: int = 10) -> List[Tuple[int, float]]:
+        with self._lock:
+            return self._boards[name].top(limit)
+
+    def rank(self, name: str, user_id: int) -> Tuple[Optional[int], Optional[float]]:
+        """``(rank, score)`` of ``user_id``, ``(None, None)`` when unranked"""
+        with self._lock:
+            board = self._boards[name]
+            return board.rank(user_id), board.score(user_id)
+
+    def sync(self, read: Callable[[str], Tuple[Sequence[int], Sequence[float]]]):
+        """Rebuild every board from ``read(name) -> (user_ids, scores)``"""
+        with self._lock:
+            self._replay = []
+        try:
+            boards = {}
+            for name in self.names:
+                board = RankedScores()
+                board.load(*read(name))
+                boards[name] = board
+        except Exception:
+            with self._lock:
+                self._replay = None
+            raise
+        with self._lock:
+            for name, user_id, score in self._replay:
+                boards[name].set(user_id, score)
+            self._boards, self._replay = boards, None
+        self.ready = True
+        self.loaded_from = 'database'
+        self.last_synced = datetime.utcnow().isoformat()
+
+    # ---- persistence --------------------------------------------------
+
+    def save(self, path: Optional[str] = None):
+        """Write every board atomically (temp file, then rename)"""
+        path = path or self.path
+        if not path or not self.ready:
+            return
+        with self._lock:
+            arrays = {}
+            for name, board in self._boards.items():
+                arrays[f"{name}.ids"], arrays[f"{name}.scores"] = board.arrays()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as handle:
+            np.savez_compressed(handle, **arrays)
+        os.replace(tmp_path, path)
+        self.last_saved = datetime.utcnow().isoformat()
+
+    def load(self, path: Optional[str] = None) -> bool:
+        """Fill the boards from a snapshot; False if there is none"""
+        path = path or self.path
+        if not path or not os.path.exists(path):
+            return False
+        with np.load(path) as saved:
+            boards = {}
+            for name in self.names:
+                board = RankedScores()
+                if f"{name}.ids" in saved:
+                    board.load(saved[f"{name}.ids"].tolist(), saved[f"{name}.scores"].tolist())
+                boards[name] = board
+        with self._lock:
+            self._boards = boards
+        self.ready = True
+        self.loaded_from = path
+        return True
+
+    def start(self, read: Callable[[str], Tuple[Sequence[int], Sequence[float]]],
+              resync_seconds: float, save_seconds: float):
+        """Warm-start from the snapshot, then keep the boards synced with the database and saved"""
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            # Workers share the snapshot, so only the one holding its lock saves it
+            self._writer = claim_file(self.path) if self.path else None
+            if self.path and self._writer is None:
+                self.log("leaderboard", "INFO", f"Another worker saves {self.path}; loading it only")
+
+            def synced():
+                try:
+                    self.sync(read)
+                except Exception as e:
+                    self.log("leaderboard", "ERROR", f"Leaderboard sync failed: {e}")
+
+            def loop():
+                try:
+                    self.load()
+                except Exception as e:
+                    self.log("leaderboard", "WARNING", f"Ignoring leaderboard snapshot: {e}")
+                synced()
+                saving = save_seconds if self._writer else 0
+                intervals = [seconds for seconds in (resync_seconds, saving) if seconds > 0]
+                last_sync = last_save = time.monotonic()
+                while intervals:
+                    time.sleep(min(intervals))
+                    now = time.monotonic()
+                    if resync_seconds > 0 and now - last_sync >= resync_seconds:
+                        synced()
+                        last_sync = now
+                    if saving > 0 and now - last_save >= saving:
+                        try:
+                            self.save()
+                        except Exception as e:
+                            self.log("leaderboard", "ERROR", f"Saving leaderboards failed: {e}")
+                        last_save = now
+
+            if self._writer:
+                atexit.register(self.save)
+            self._thread = threading.Thread(target=loop, name="leaderboards", daemon=True)
+            self._thread.start()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            sizes = {name: len(board) for name, board in self._boards.items()}
+        return {
+            'boards': sizes,
+            'ready': self.ready,
+            'updates': self.updates,
+            'loaded_from': self.loaded_from,
+            'last_synced': self.last_synced,
+            'last_saved': self.last_saved,
+            'path': self.path,
+            'saving': self._writer is not None
+        }
+
+
+# Global leaderboards: total earnings and referral counts
+leaderboards = Leaderboards(
+    ('earnings', 'referrals'),
+    path=os.getenv("LEADERBOARD_FILE", "leaderboards.npz")
+)
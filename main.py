@@ -26,7 +26,7 @@ import threading
 import asyncio
 import random
 import hashlib
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, Any, List
 from urllib.parse import quote, unquote
 
@@ -42,9 +42,12 @@ from functools import wraps
 
 from flask import (
     Flask, request, jsonify, render_template, render_template_string,
-    session, redirect, url_for, flash, send_from_directory, make_response
+    session, redirect, url_for, flash, send_from_directory, make_response, g,
+    Response, stream_with_context
 )
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import lambda_stmt, select
+from sqlalchemy.exc import IntegrityError
 
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.middleware.proxy_fix import ProxyFix
@@ -58,6 +61,32 @@ except ImportError:
     SCHEDULER_AVAILABLE = False
     BackgroundScheduler = None
 
+from rate_limiter import check_rate_limit, get_rate_limit_stats
+from fraud_detector import inspect_visit, get_top_offenders, get_fraud_stats
+from intern_cache import InternCache, value_hash
+from chat_analytics import chat_analytics, MODEL_NAMES
+from migrations import MigrationEngine
+from db_profiles import engine_options, apply_engine_profile, normalize_database_url
+from db_types import Money, UTCDateTime
+from bulk_ingest import bulk_insert
+from retention import retention_manager
+from stats_cache import stats_cache
+from event_hub import event_hub, format_event, HubFull
+from timeseries import time_series
+from cohorts import cohort_analytics, extract_days
+from leaderboard import leaderboards
+from forecasting import forecaster
+from presence import presence
+from user_search import user_search, create_search_indexes
+from rollups import RollupBatch, upsert_rollups, read_rollups, read_series, bucket_start, ALL_TIME
+from query_profiler import query_profiler
+from slow_query_log import slow_query_log
+from pagination import (
+    InvalidCursor, keyset_select_page, iter_keyset_select, page_size, encode_cursor, decode_cursor,
+    stream_json_array, stream_ndjson, stream_csv, gzip_stream
+)
+from read_models import ReadModel
+
 # Telegram Bot imports (optional for production)
 try:
     from telegram import Update, Bot, InlineKeyboardButton, InlineKeyboardMarkup
@@ -96,7 +125,7 @@ ADMIN_PASS = os.getenv("ADMIN_PASS", "12345")
 ADMIN_ID = os.getenv("ADMIN_ID", "6646320334")
 
 # Database Configuration
-DB_URL = os.getenv("DB_URL", "sqlite:///data.db")
+DB_URL = normalize_database_url(os.getenv("DB_URL", "sqlite:///data.db"))
 SQLITE_PATH = os.getenv("SQLITE_PATH", "app.db")
 
 # API Keys
@@ -186,34 +215,53 @@ app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
 # Database setup
 app.config['SQLALCHEMY_DATABASE_URI'] = DB_URL
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(DB_URL)
 db = SQLAlchemy(app)
 
+# WAL, busy timeout and cache pragmas on every new SQLite connection
+with app.app_context():
+    DB_PROFILE = apply_engine_profile(db.engine)
+    query_profiler.install(db.engine)
+    slow_query_log.install(db.engine)
+
 # =========================
 # DATABASE MODELS
 # =========================
 
 class User(db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        db.Index('ix_users_role', 'role'),
+        db.Index('ix_users_last_visit', 'last_visit'),
+        db.Index('ix_users_premium_until', 'premium_until'),
+        # Keyset pagination sort orders in the admin user listing
+        db.Index('ix_users_total_earned_id', 'total_earned', 'id'),
+        db.Index('ix_users_chats_count_id', 'chats_count', 'id'),
+        # Date-range exports
+        db.Index('ix_users_created_at', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
-    wallet = db.Column(db.Float, default=0.0)
+    wallet = db.Column(Money, default=0.0)
     role = db.Column(db.String(20), default='user')
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(UTCDateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
     telegram_id = db.Column(db.String(50), unique=True, nullable=True)
     
     # 💰 Monetization Fields
-    total_earned = db.Column(db.Float, default=0.0)      # Total earnings
+    total_earned = db.Column(Money, default=0.0)      # Total earnings
     visits_count = db.Column(db.Integer, default=0)       # Visit count
     chats_count = db.Column(db.Integer, default=0)        # Chat count
     referrals_count = db.Column(db.Integer, default=0)    # Referral count
     referral_code = db.Column(db.String(20), unique=True) # Unique referral code
     referred_by = db.Column(db.String(20), nullable=True) # Who referred this user
-    premium_until = db.Column(db.DateTime, nullable=True) # Premium subscription end
-    last_visit = db.Column(db.DateTime, default=datetime.utcnow)
+    premium_until = db.Column(UTCDateTime, nullable=True) # Premium subscription end
+    # active_history keeps the previous value even when it was expired, for the active-user rollups
+    last_visit = db.column_property(db.Column(UTCDateTime, default=datetime.utcnow), active_history=True)
+    fraud_flagged = db.Column(db.Boolean, default=False)  # Flagged by visit fraud detection
     
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -259,24 +307,34 @@ class User(db.Model):
             'chats_count': self.chats_count,
             'referrals_count': self.referrals_count,
             'referral_code': self.referral_code,
-            'is_premium': self.is_premium()
+            'is_premium': self.is_premium(),
+            'fraud_flagged': bool(self.fraud_flagged)
         }
 
 class Transaction(db.Model):
     __tablename__ = 'transactions'
+    __table_args__ = (
+        db.Index('ix_transactions_user_created', 'user_id', 'created_at'),
+        db.Index('ix_transactions_type_created', 'transaction_type', 'created_at'),
+        db.Index('ix_transactions_created_at', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(Money, nullable=False)
     transaction_type = db.Column(db.String(20), nullable=False)  # credit, debit
     payment_method = db.Column(db.String(50), nullable=True)
     payment_id = db.Column(db.String(100), nullable=True)
     status = db.Column(db.String(20), default='pending')
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(UTCDateTime, default=datetime.utcnow)
     description = db.Column(db.Text, nullable=True)
 
 class APIUsage(db.Model):
     __tablename__ = 'api_usage'
+    __table_args__ = (
+        db.Index('ix_api_usage_user_created', 'user_id', 'created_at'),
+        db.Index('ix_api_usage_created_at', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
@@ -284,23 +342,78 @@ class APIUsage(db.Model):
     api_type = db.Column(db.String(50), nullable=False)  # gpt4, claude, gemini, free
     model_name = db.Column(db.String(100), nullable=True)
     tokens_used = db.Column(db.Integer, default=0)
-    cost = db.Column(db.Float, default=0.0)
-    earnings_generated = db.Column(db.Float, default=0.0)  # Revenue from this request
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    request_data = db.Column(db.Text, nullable=True)
-    response_data = db.Column(db.Text, nullable=True)
+    cost = db.Column(Money, default=0.0)
+    earnings_generated = db.Column(Money, default=0.0)  # Revenue from this request
+    created_at = db.Column(UTCDateTime, default=datetime.utcnow)
+    # Wide payloads are loaded on first access, not with every row
+    request_data = db.deferred(db.Column(db.Text, nullable=True))
+    response_data = db.deferred(db.Column(db.Text, nullable=True))
+
+class VisitUserAgent(db.Model):
+    """Dictionary of distinct User-Agent strings referenced by visits"""
+    __tablename__ = 'visit_user_agents'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    value_hash = db.Column(db.String(16), unique=True, nullable=False)
+    value = db.Column(db.Text, nullable=False)
+
+class VisitReferrer(db.Model):
+    """Dictionary of distinct referrer URLs referenced by visits"""
+    __tablename__ = 'visit_referrers'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    value_hash = db.Column(db.String(16), unique=True, nullable=False)
+    value = db.Column(db.String(500), nullable=False)
 
 class Visit(db.Model):
     __tablename__ = 'visits'
+    __table_args__ = (
+        db.Index('ix_visits_created_at', 'created_at'),
+        db.Index('ix_visits_user_created', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     ip_address = db.Column(db.String(45), nullable=True)
-    user_agent = db.Column(db.Text, nullable=True)
+    user_agent_id = db.Column(db.Integer, db.ForeignKey('visit_user_agents.id'), nullable=True)
     page = db.Column(db.String(200), nullable=True)
-    referrer = db.Column(db.String(500), nullable=True)
-    earnings_generated = db.Column(db.Float, default=0.0)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    referrer_id = db.Column(db.Integer, db.ForeignKey('visit_referrers.id'), nullable=True)
+    earnings_generated = db.Column(Money, default=0.0)
+    created_at = db.Column(UTCDateTime, default=datetime.utcnow)
+    
+    @property
+    def user_agent(self):
+        return lookup_interned(VisitUserAgent, user_agent_cache, self.user_agent_id)
+    
+    @property
+    def referrer(self):
+        return lookup_interned(VisitReferrer, referrer_cache, self.referrer_id)
+
+class ChatEvent(db.Model):
+    """Compact chat analytics event, written in batches by track_chat"""
+    __tablename__ = 'chat_events'
+    __table_args__ = (
+        db.Index('ix_chat_events_created_at', 'created_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    model_code = db.Column(db.SmallInteger, nullable=False, default=0)  # see chat_analytics.MODEL_CODES
+    prompt_length = db.Column(db.Integer, default=0)
+    response_length = db.Column(db.Integer, default=0)
+    latency_ms = db.Column(db.Integer, default=0)
+    cost = db.Column(Money, default=0.0)
+    created_at = db.Column(UTCDateTime, default=datetime.utcnow)
+
+class MetricRollup(db.Model):
+    """Hourly/daily/monthly/all-time metric totals, maintained by the flush hook in METRIC ROLLUPS"""
+    __tablename__ = 'metric_rollups'
+    
+    period = db.Column(db.String(8), primary_key=True)  # hour, day, month, all
+    bucket = db.Column(UTCDateTime, primary_key=True)
+    metric = db.Column(db.String(40), primary_key=True)
+    value = db.Column(Money, nullable=False, default=0.0)
+    count = db.Column(db.Integer, nullable=False, default=0)
 
 class Referral(db.Model):
     __tablename__ = 'referrals'
@@ -309,13 +422,17 @@ class Referral(db.Model):
     referrer_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     referred_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     referral_code = db.Column(db.String(20), nullable=False)
-    bonus_amount = db.Column(db.Float, default=0.0)
+    bonus_amount = db.Column(Money, default=0.0)
     status = db.Column(db.String(20), default='active')  # active, completed
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(UTCDateTime, default=datetime.utcnow)
 
 class PaymentOrder(db.Model):
     """Cashfree Payment Orders"""
     __tablename__ = 'payment_orders'
+    __table_args__ = (
+        db.Index('ix_payment_orders_user_created', 'user_id', 'created_at'),
+        db.Index('ix_payment_orders_created_at', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -325,9 +442,9 @@ class PaymentOrder(db.Model):
     purpose = db.Column(db.String(100), nullable=False)  # wallet_topup, premium_monthly, etc.
     status = db.Column(db.String(20), default='created')  # created, paid, failed, cancelled
     payment_session_id = db.Column(db.String(200), nullable=True)
-    gateway_response = db.Column(db.Text, nullable=True)  # JSON response from Cashfree
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    gateway_response = db.deferred(db.Column(db.Text, nullable=True))  # JSON response from Cashfree
+    created_at = db.Column(UTCDateTime, default=datetime.utcnow)
+    updated_at = db.Column(UTCDateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationship
     user = db.relationship('User', backref='payment_orders')
@@ -335,22 +452,579 @@ class PaymentOrder(db.Model):
 class WithdrawalRequest(db.Model):
     """User Withdrawal Requests"""
     __tablename__ = 'withdrawal_requests'
+    __table_args__ = (
+        db.Index('ix_withdrawal_requests_status_created', 'status', 'created_at'),
+        db.Index('ix_withdrawal_requests_user_created', 'user_id', 'created_at'),
+        db.Index('ix_withdrawal_requests_created_at', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     amount = db.Column(db.Numeric(10, 2), nullable=False)
     status = db.Column(db.String(20), default='pending')  # pending, processing, completed, failed
     transfer_id = db.Column(db.String(100), unique=True, nullable=True)
-    bank_details = db.Column(db.Text, nullable=False)  # JSON with bank account details
-    gateway_response = db.Column(db.Text, nullable=True)  # JSON response from Cashfree
-    admin_notes = db.Column(db.Text, nullable=True)
-    processed_at = db.Column(db.DateTime, nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    bank_details = db.deferred(db.Column(db.Text, nullable=False))  # JSON with bank account details
+    gateway_response = db.deferred(db.Column(db.Text, nullable=True))  # JSON response from Cashfree
+    admin_notes = db.deferred(db.Column(db.Text, nullable=True))
+    processed_at = db.Column(UTCDateTime, nullable=True)
+    created_at = db.Column(UTCDateTime, default=datetime.utcnow)
+    updated_at = db.Column(UTCDateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationship
     user = db.relationship('User', backref='withdrawal_requests')
 
+# =========================
+# READ MODELS
+# =========================
+
+# Projections for read-heavy endpoints: only the serialized columns, as tuples
+USER_STATS_ROW = ReadModel('UserStatsRow',
+    wallet=User.wallet, total_earned=User.total_earned, chats_count=User.chats_count,
+    visits_count=User.visits_count, referrals_count=User.referrals_count,
+    premium_until=User.premium_until
+)
+
+ADMIN_USER_ROW = ReadModel('AdminUserRow',
+    id=User.id, username=User.username, email=User.email, wallet=User.wallet,
+    total_earned=User.total_earned, chats_count=User.chats_count,
+    referrals_count=User.referrals_count, is_active=User.is_active,
+    premium_until=User.premium_until, created_at=User.created_at
+)
+
+ADMIN_USER_SEARCH_ROW = ReadModel('AdminUserSearchRow',
+    id=User.id, username=User.username, email=User.email, referral_code=User.referral_code,
+    telegram_id=User.telegram_id, is_active=User.is_active
+)
+
+TRANSACTION_ROW = ReadModel('TransactionRow',
+    id=Transaction.id, payment_id=Transaction.payment_id, transaction_type=Transaction.transaction_type,
+    amount=Transaction.amount, status=Transaction.status, created_at=Transaction.created_at,
+    description=Transaction.description
+)
+
+PAYMENT_ORDER_ROW = ReadModel('PaymentOrderRow',
+    id=PaymentOrder.id, order_id=PaymentOrder.order_id, amount=PaymentOrder.amount,
+    status=PaymentOrder.status, purpose=PaymentOrder.purpose, created_at=PaymentOrder.created_at
+)
+
+WITHDRAWAL_ROW = ReadModel('WithdrawalRow',
+    id=WithdrawalRequest.id, transfer_id=WithdrawalRequest.transfer_id, amount=WithdrawalRequest.amount,
+    status=WithdrawalRequest.status, created_at=WithdrawalRequest.created_at
+)
+
+API_USAGE_ROW = ReadModel('APIUsageRow',
+    id=APIUsage.id, api_type=APIUsage.api_type, model_name=APIUsage.model_name,
+    tokens_used=APIUsage.tokens_used, cost=APIUsage.cost,
+    earnings_generated=APIUsage.earnings_generated, created_at=APIUsage.created_at
+)
+
+ACTIVITY_ROW = ReadModel('ActivityRow',
+    transaction_type=Transaction.transaction_type, amount=Transaction.amount,
+    status=Transaction.status, created_at=Transaction.created_at,
+    description=Transaction.description, username=User.username
+)
+
+# Accounting exports; bank details and gateway payloads are never exported
+USER_EXPORT_ROW = ReadModel('UserExportRow',
+    id=User.id, username=User.username, email=User.email, role=User.role, wallet=User.wallet,
+    total_earned=User.total_earned, visits_count=User.visits_count, chats_count=User.chats_count,
+    referrals_count=User.referrals_count, referral_code=User.referral_code,
+    referred_by=User.referred_by, is_active=User.is_active, premium_until=User.premium_until,
+    created_at=User.created_at
+)
+
+TRANSACTION_EXPORT_ROW = ReadModel('TransactionExportRow',
+    id=Transaction.id, user_id=Transaction.user_id, transaction_type=Transaction.transaction_type,
+    amount=Transaction.amount, payment_method=Transaction.payment_method,
+    payment_id=Transaction.payment_id, status=Transaction.status,
+    description=Transaction.description, created_at=Transaction.created_at
+)
+
+PAYMENT_ORDER_EXPORT_ROW = ReadModel('PaymentOrderExportRow',
+    id=PaymentOrder.id, user_id=PaymentOrder.user_id, order_id=PaymentOrder.order_id,
+    amount=PaymentOrder.amount, currency=PaymentOrder.currency, purpose=PaymentOrder.purpose,
+    status=PaymentOrder.status, created_at=PaymentOrder.created_at, updated_at=PaymentOrder.updated_at
+)
+
+WITHDRAWAL_EXPORT_ROW = ReadModel('WithdrawalExportRow',
+    id=WithdrawalRequest.id, user_id=WithdrawalRequest.user_id, amount=WithdrawalRequest.amount,
+    status=WithdrawalRequest.status, transfer_id=WithdrawalRequest.transfer_id,
+    processed_at=WithdrawalRequest.processed_at, created_at=WithdrawalRequest.created_at,
+    updated_at=WithdrawalRequest.updated_at
+)
+
+# =========================
+# HOT LOOKUPS
+# =========================
+
+# Single-row lookups on the busiest paths. Each is a lambda_stmt, so the
+# statement is built and compiled once per call site and later calls only
+# bind the new value, instead of rebuilding a Query every time.
+
+def _first(statement):
+    return db.session.execute(statement).scalars().first()
+
+def user_by_id(user_id):
+    """Checks the session identity map before querying"""
+    return db.session.get(User, user_id) if user_id is not None else None
+
+def user_by_username(username):
+    return _first(lambda_stmt(lambda: select(User).where(User.username == username).limit(1)))
+
+def user_by_email(email):
+    return _first(lambda_stmt(lambda: select(User).where(User.email == email).limit(1)))
+
+def user_by_telegram_id(telegram_id):
+    return _first(lambda_stmt(lambda: select(User).where(User.telegram_id == telegram_id).limit(1)))
+
+def user_by_referral_code(referral_code):
+    return _first(lambda_stmt(lambda: select(User).where(User.referral_code == referral_code).limit(1)))
+
+def payment_order_by_order_id(order_id):
+    return _first(lambda_stmt(lambda: select(PaymentOrder).where(PaymentOrder.order_id == order_id).limit(1)))
+
+_admin_user_id = None
+
+def get_admin_user():
+    """The admin account that receives revenue shares.
+    
+    Its id is remembered after the first lookup, so later calls are a
+    primary-key get that is usually served from the identity map.
+    """
+    global _admin_user_id
+    if _admin_user_id is not None:
+        admin_user = db.session.get(User, _admin_user_id)
+        if admin_user is not None and admin_user.role == 'admin':
+            return admin_user
+    admin_user = _first(lambda_stmt(
+        lambda: select(User).where(User.role == 'admin').order_by(User.id).limit(1)
+    ))
+    _admin_user_id = admin_user.id if admin_user else None
+    return admin_user
+
+# =========================
+# METRIC ROLLUPS
+# =========================
+
+# Periods that count distinct active users (an all-time bucket would only count signups again)
+ACTIVE_USER_PERIODS = ('hour', 'day', 'month')
+
+def _attribute_change(obj, name):
+    """(old, new) for a modified attribute, or None when it did not change"""
+    history = db.inspect(obj).attrs[name].history
+    if not history.added:
+        return None
+    return (history.deleted[0] if history.deleted else None), history.added[0]
+
+def collect_rollups(session, flush_context):
+    """Fold the rows written by this flush into the rollup tables, in the same transaction.
+    
+    Revenue comes from new transactions, visits from new visits, signups
+    from new users. Chats and earnings follow the deltas of the users'
+    counters. A user counts once per bucket as active: when last_visit moves
+    into a bucket it was not in before.
+    
+    The same events, except active users, feed the minute time series
+    once the transaction commits.
+    """
+    batch = RollupBatch()
+    events = []
+    now = datetime.utcnow()
+    
+    def record(metric, when, value=0.0, count=1):
+        batch.add(metric, when, value, count)
+        events.append((metric, when, value, count))
+    
+    for obj in session.new:
+        if isinstance(obj, Transaction):
+            record(f"revenue.{obj.transaction_type}", obj.created_at or now, float(obj.amount or 0))
+        elif isinstance(obj, Visit):
+            record('visits', obj.created_at or now, float(obj.earnings_generated or 0))
+        elif isinstance(obj, User):
+            record('signups', obj.created_at or now)
+            if obj.chats_count:
+                record('chats', now, count=obj.chats_count)
+            if obj.total_earned:
+                record('earned', now, float(obj.total_earned), count=0)
+            if obj.last_visit:
+                batch.add('active_users', obj.last_visit, periods=ACTIVE_USER_PERIODS)
+    
+    for obj in session.dirty:
+        if not isinstance(obj, User):
+            continue
+        change = _attribute_change(obj, 'chats_count')
+        if change:
+            record('chats', now, count=(change[1] or 0) - (change[0] or 0))
+        change = _attribute_change(obj, 'total_earned')
+        if change:
+            record('earned', now, float(change[1] or 0) - float(change[0] or 0), count=0)
+        change = _attribute_change(obj, 'last_visit')
+        if change and change[1]:
+            old, new = change
+            periods = [period for period in ACTIVE_USER_PERIODS
+                       if old is None or bucket_start(period, old) != bucket_start(period, new)]
+            batch.add('active_users', new, periods=periods)
+    
+    if batch:
+        upsert_rollups(session.connection(), MetricRollup.__table__, batch)
+        queue_live_metrics(session, batch)
+    if events:
+        session.info.setdefault('series_events', []).extend(events)
+
+db.event.listen(db.session, 'after_flush', collect_rollups)
+
+ADMIN_ROLLUP_METRICS = ('revenue.credit', 'signups', 'chats', 'earned', 'active_users')
+
+def admin_stats():
+    """Admin dashboard totals.
+    
+    Totals and today/month figures are read from a handful of rollup rows
+    and active-user counts from the in-memory presence windows. The two
+    remaining counts are index range scans bounded by how many users are
+    currently premium or waiting on a withdrawal, not by the size of the
+    history.
+    """
+    now = datetime.utcnow()
+    totals = read_rollups(db.session.connection(), MetricRollup.__table__, [
+        ('all', ALL_TIME), ('day', bucket_start('day', now)), ('month', bucket_start('month', now))
+    ], ADMIN_ROLLUP_METRICS)
+    return {
+        'total_users': totals[('all', 'signups')][1],
+        'total_revenue': totals[('all', 'revenue.credit')][0],
+        'total_chats': totals[('all', 'chats')][1],
+        'active_users': presence.count('day'),
+        'active_hour': presence.count('hour'),
+        'online_now': presence.count('online'),
+        'active_today': totals[('day', 'active_users')][1],
+        'premium_users': User.query.filter(User.premium_until > now).count(),
+        'pending_withdrawals': WithdrawalRequest.query.filter_by(status='pending').count(),
+        'total_earnings': totals[('all', 'earned')][0],
+        'today_revenue': totals[('day', 'revenue.credit')][0],
+        'month_revenue': totals[('month', 'revenue.credit')][0]
+    }
+
+# =========================
+# STATS CACHE
+# =========================
+
+stats_cache.log = log
+
+# Committed writes to these models make the cached admin statistics stale
+STATS_INVALIDATING_MODELS = (PaymentOrder, WithdrawalRequest)
+
+def admin_stats_snapshot():
+    """Admin statistics and the recent activity feed, as served by /api/admin/stats"""
+    recent_activity = []
+    recent_transactions = ACTIVITY_ROW.all(db.session, ACTIVITY_ROW.select().outerjoin(
+        User, User.id == Transaction.user_id
+    ).order_by(Transaction.created_at.desc()).limit(10))
+    
+    for txn in recent_transactions:
+        recent_activity.append({
+            'time': txn.created_at.isoformat(),
+            'user': txn.username or 'Unknown',
+            'action': txn.description or f"{txn.transaction_type.title()} Transaction",
+            'amount': float(txn.amount),
+            'status': 'success' if txn.status == 'completed' else 'pending'
+        })
+    return {'stats': admin_stats(), 'recent_activity': recent_activity}
+
+def cached_admin_stats():
+    """``(snapshot, cache info)``; one computation per TTL shared by every admin"""
+    return stats_cache.get('admin_stats', admin_stats_snapshot)
+
+def note_stats_changes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, STATS_INVALIDATING_MODELS):
+            session.info['stats_changed'] = True
+            return
+
+def invalidate_stats_on_commit(session):
+    if session.info.pop('stats_changed', False):
+        stats_cache.invalidate('admin_stats')
+
+def discard_stats_changes(session):
+    session.info.pop('stats_changed', None)
+
+db.event.listen(db.session, 'after_flush', note_stats_changes)
+db.event.listen(db.session, 'after_commit', invalidate_stats_on_commit)
+db.event.listen(db.session, 'after_rollback', discard_stats_changes)
+
+# =========================
+# LIVE UPDATES
+# =========================
+
+# All-time rollup metrics pushed to admin dashboards as deltas: metric -> (stats key, field)
+ADMIN_LIVE_METRICS = {
+    'signups': ('total_users', 'count'),
+    'revenue.credit': ('total_revenue', 'value'),
+    'chats': ('total_chats', 'count'),
+    'earned': ('total_earnings', 'value')
+}
+ADMIN_LIVE_EVENTS = {'signups': 'signup', 'chats': 'chat'}
+
+def user_stats_dict(user):
+    """Dashboard stats for a User or a USER_STATS_ROW"""
+    return {
+        'wallet': float(user.wallet or 0),
+        'total_earned': float(user.total_earned or 0),
+        'chats_count': user.chats_count or 0,
+        'visits_count': user.visits_count or 0,
+        'referrals_count': user.referrals_count or 0,
+        'is_premium': bool(user.premium_until and user.premium_until > datetime.utcnow())
+    }
+
+def _pending_live_updates(session):
+    return session.info.setdefault('live_updates', {'deltas': {}, 'events': set(), 'users': {}})
+
+def queue_live_metrics(session, batch):
+    """Hold this flush's all-time rollup deltas until the transaction commits"""
+    if not event_hub.has_subscribers('admin'):
+        return
+    pending = _pending_live_updates(session)
+    for metric, (value, count) in batch.totals('all').items():
+        if metric in ADMIN_LIVE_METRICS:
+            key, field = ADMIN_LIVE_METRICS[metric]
+            pending['deltas'][key] = pending['deltas'].get(key, 0) + (value if field == 'value' else count)
+        if metric in ADMIN_LIVE_EVENTS:
+            pending['events'].add(ADMIN_LIVE_EVENTS[metric])
+
+def collect_live_updates(session, flush_context):
+    """Note payments, withdrawals and changed user balances for connected dashboards"""
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, User):
+            if event_hub.has_subscribers(f"user:{obj.id}"):
+                _pending_live_updates(session)['users'][obj.id] = user_stats_dict(obj)
+        elif isinstance(obj, PaymentOrder) and event_hub.has_subscribers('admin'):
+            _pending_live_updates(session)['events'].add('payment')
+        elif isinstance(obj, WithdrawalRequest) and event_hub.has_subscribers('admin'):
+            _pending_live_updates(session)['events'].add('withdrawal')
+
+def publish_live_updates(session):
+    """Publish what the committed transaction changed, one frame per channel"""
+    pending = session.info.pop('live_updates', None)
+    if not pending:
+        return
+    if pending['deltas'] or pending['events']:
+        event_hub.publish('admin', 'metrics', {
+            'deltas': pending['deltas'],
+            'events': sorted(pending['events'])
+        })
+    for user_id, stats in pending['users'].items():
+        event_hub.publish(f"user:{user_id}", 'stats', stats)
+
+def discard_live_updates(session):
+    session.info.pop('live_updates', None)
+
+db.event.listen(db.session, 'after_flush', collect_live_updates)
+db.event.listen(db.session, 'after_commit', publish_live_updates)
+db.event.listen(db.session, 'after_rollback', discard_live_updates)
+
+def live_response(subscription, first_frames):
+    response = Response(event_hub.stream(subscription, first_frames), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Tell reverse proxies (nginx) not to buffer the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    # Also covers a client that disconnects before the stream starts
+    response.call_on_close(lambda: event_hub.unsubscribe(subscription))
+    return response
+
+# =========================
+# TIME SERIES
+# =========================
+
+time_series.log = log
+TIMESERIES_SAVE_SECONDS = int(os.getenv("TIMESERIES_SAVE_SECONDS", "300"))
+
+def append_series_events(session):
+    events = session.info.pop('series_events', None)
+    if events:
+        time_series.add_many(events)
+
+def discard_series_events(session):
+    session.info.pop('series_events', None)
+
+db.event.listen(db.session, 'after_commit', append_series_events)
+db.event.listen(db.session, 'after_rollback', discard_series_events)
+
+def backfill_time_series(store, cutoff, chunk_size=10000):
+    """Rebuild the minute series from the rows created before ``cutoff``, for a first start without a saved file"""
+    since = cutoff - timedelta(minutes=store.capacity)
+    with app.app_context():
+        with db.engine.connect() as connection:
+            kinds = connection.execute(db.select(Transaction.transaction_type).distinct()).scalars().all()
+            sources = [
+                (f"revenue.{kind}", db.select(Transaction.created_at, Transaction.amount).where(
+                    Transaction.transaction_type == kind, Transaction.created_at >= since,
+                    Transaction.created_at < cutoff))
+                for kind in kinds
+            ] + [
+                ('visits', db.select(Visit.created_at, Visit.earnings_generated).where(
+                    Visit.created_at >= since, Visit.created_at < cutoff)),
+                ('signups', db.select(User.created_at).where(User.created_at >= since, User.created_at < cutoff)),
+                ('chats', db.select(ChatEvent.created_at).where(
+                    ChatEvent.created_at >= since, ChatEvent.created_at < cutoff)),
+            ]
+            for metric, statement in sources:
+                result = connection.execution_options(stream_results=True).execute(statement)
+                while True:
+                    rows = result.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    columns = list(zip(*rows))
+                    store.add_columns(metric, columns[0], columns[1] if len(columns) > 1 else None)
+    log("timeseries", "INFO", "Time series rebuilt from the database", store.get_stats())
+
+# =========================
+# COHORT ANALYTICS
+# =========================
+
+cohort_analytics.log = log
+
+def extract_cohort_report(analytics, today):
+    """Read the (user_id, day) arrays of the report window and build the report from them"""
+    since = analytics.window_start(today)
+    funnel_since = analytics.funnel_start(today)
+    with db.engine.connect() as connection:
+        users = extract_days(connection, db.select(User.id, User.created_at).where(
+            User.created_at >= since, User.role != 'admin'))
+        visits = extract_days(connection, db.select(Visit.user_id, Visit.created_at).where(
+            Visit.created_at >= since, Visit.user_id.isnot(None)))
+        chats = extract_days(connection, db.select(ChatEvent.user_id, ChatEvent.created_at).where(
+            ChatEvent.created_at >= since, ChatEvent.user_id.isnot(None)))
+        api_calls = extract_days(connection, db.select(APIUsage.user_id, APIUsage.created_at).where(
+            APIUsage.created_at >= since, APIUsage.user_id.isnot(None)))
+        premium_ids, _ = extract_days(connection, db.select(User.id, User.created_at).where(
+            User.created_at >= funnel_since, User.premium_until.isnot(None)))
+        visitors = connection.execute(
+            db.select(db.func.count(db.distinct(Visit.ip_address))).where(Visit.created_at >= funnel_since)
+        ).scalar() or 0
+    
+    return analytics.build(today, users, [visits, chats, api_calls], visitors,
+                           [chats[0], api_calls[0]], premium_ids)
+
+# =========================
+# FORECASTING
+# =========================
+
+forecaster.log = log
+
+# Forecast name -> (daily rollup metric, field)
+FORECAST_METRICS = {
+    'revenue': ('revenue.credit', 'value'),
+    'chats': ('chats', 'count'),
+    'visits': ('visits', 'count'),
+    'signups': ('signups', 'count')
+}
+
+def read_forecast_history(start, end):
+    """Daily rollup values of FORECAST_METRICS for the days in [start, end), zero-filled"""
+    days = (end - start).days
+    with db.engine.connect() as connection:
+        series = read_series(
+            connection, MetricRollup.__table__, 'day',
+            datetime.combine(start, datetime.min.time()), datetime.combine(end, datetime.min.time()),
+            [metric for metric, _ in FORECAST_METRICS.values()]
+        )
+    history = {}
+    for name, (metric, field) in FORECAST_METRICS.items():
+        values = [0.0] * days
+        for point in series[metric]:
+            index = (datetime.fromisoformat(point['bucket']).date() - start).days
+            if 0 <= index < days:
+                values[index] = point[field]
+        history[name] = values
+    return history
+
+# =========================
+# LEADERBOARDS
+# =========================
+
+leaderboards.log = log
+LEADERBOARD_RESYNC_SECONDS = int(os.getenv("LEADERBOARD_RESYNC_SECONDS", "3600"))
+LEADERBOARD_SAVE_SECONDS = int(os.getenv("LEADERBOARD_SAVE_SECONDS", "600"))
+LEADERBOARD_MAX_LIMIT = 50
+
+# Board -> the User column it ranks (admins are not ranked)
+LEADERBOARD_SCORES = {'earnings': 'total_earned', 'referrals': 'referrals_count'}
+
+def collect_leaderboard_changes(session, flush_context):
+    """Note the new scores of users whose earnings or referrals this flush changed"""
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, User) or obj.role == 'admin':
+            continue
+        for board, column in LEADERBOARD_SCORES.items():
+            change = _attribute_change(obj, column)
+            if change:
+                session.info.setdefault('leaderboard_changes', {})[(board, obj.id)] = float(change[1] or 0)
+
+def apply_leaderboard_changes(session):
+    changes = session.info.pop('leaderboard_changes', None)
+    if changes:
+        leaderboards.apply((board, user_id, score) for (board, user_id), score in changes.items())
+
+def discard_leaderboard_changes(session):
+    session.info.pop('leaderboard_changes', None)
+
+db.event.listen(db.session, 'after_flush', collect_leaderboard_changes)
+db.event.listen(db.session, 'after_commit', apply_leaderboard_changes)
+db.event.listen(db.session, 'after_rollback', discard_leaderboard_changes)
+
+def read_leaderboard(board):
+    """(user_ids, scores) of every user with a positive score on ``board``"""
+    column = getattr(User, LEADERBOARD_SCORES[board])
+    with app.app_context():
+        with db.engine.connect() as connection:
+            rows = connection.execute(
+                db.select(User.id, column).where(column > 0, User.role != 'admin')
+            ).all()
+    return [row[0] for row in rows], [row[1] for row in rows]
+
+# =========================
+# STRING INTERNING
+# =========================
+
+INTERN_CACHE_SIZE = int(os.getenv("INTERN_CACHE_SIZE", "10000"))
+user_agent_cache = InternCache(INTERN_CACHE_SIZE)
+referrer_cache = InternCache(INTERN_CACHE_SIZE)
+
+def intern_string(model, cache, value, max_length):
+    """Return the dictionary row id for ``value``, inserting it if new"""
+    if not value:
+        return None
+    value = value[:max_length]
+    
+    row_id = cache.get_id(value)
+    if row_id is not None:
+        return row_id
+    
+    digest = value_hash(value)
+    row_id = db.session.query(model.id).filter_by(value_hash=digest).scalar()
+    if row_id is not None:
+        cache.put(value, row_id)
+        return row_id
+    
+    # New value: insert inside a savepoint so a concurrent insert of the same
+    # string only costs a re-read. It is cached on the next lookup, once committed.
+    try:
+        with db.session.begin_nested():
+            row = model(value_hash=digest, value=value)
+            db.session.add(row)
+        return row.id
+    except IntegrityError:
+        return db.session.query(model.id).filter_by(value_hash=digest).scalar()
+
+def lookup_interned(model, cache, row_id):
+    """Resolve a dictionary row id back to its string"""
+    if row_id is None:
+        return None
+    value = cache.get_value(row_id)
+    if value is None:
+        value = db.session.query(model.value).filter_by(id=row_id).scalar()
+        if value is not None:
+            cache.put(value, row_id)
+    return value
+
 # =========================
 # DATABASE INITIALIZATION
 # =========================
@@ -360,9 +1034,10 @@ def init_db():
     try:
         with app.app_context():
             db.create_all()
+            migrate_database()
             
             # Create admin user if not exists
-            admin_user = User.query.filter_by(username=ADMIN_USER).first()
+            admin_user = user_by_username(ADMIN_USER)
             if not admin_user:
                 admin_user = User(
                     username=ADMIN_USER,
@@ -380,10 +1055,37 @@ def init_db():
         log("database", "ERROR", f"Database initialization failed: {e}")
         raise
 
+# =========================
+# DATA RETENTION
+# =========================
+# Months of visits/api_usage older than the retention window are archived
+# to ARCHIVE_DIR and removed from the live tables (see retention.py)
+RETENTION_INTERVAL_HOURS = float(os.getenv("RETENTION_INTERVAL_HOURS", "24"))
+RETENTION_TABLES = [Visit.__table__, APIUsage.__table__]
+retention_manager.log = log
+
 # =========================
 # AUTHENTICATION DECORATORS
 # =========================
 
+def remember_premium(premium_until):
+    """Keep the session's copy of ``premium_until`` (epoch seconds) current for the rate-limit tier.
+    
+    Upgrades land in the payment webhook, outside the user's session, so the
+    copy is refreshed whenever the user's row is read.
+    """
+    value = premium_until.replace(tzinfo=timezone.utc).timestamp() if premium_until else None
+    if session.get('premium_until') != value:
+        session['premium_until'] = value
+
+def get_current_user():
+    """The logged-in user, loaded at most once per request"""
+    if 'current_user' not in g:
+        g.current_user = db.session.get(User, session['user_id']) if 'user_id' in session else None
+        if g.current_user:
+            remember_premium(g.current_user.premium_until)
+    return g.current_user
+
 def login_required(f):
     """Decorator to require login for routes"""
     @wraps(f)
@@ -402,7 +1104,7 @@ def admin_required(f):
             flash('Please log in to access this page.', 'error')
             return redirect(url_for('login'))
         
-        user = User.query.get(session['user_id'])
+        user = get_current_user()
         if not user or user.role != 'admin':
             flash('Admin access required.', 'error')
             return redirect(url_for('dashboard'))
@@ -410,6 +1112,95 @@ def admin_required(f):
         return f(*args, **kwargs)
     return wrapper
 
+# =========================
+# RATE LIMITING
+# =========================
+
+def get_request_tier():
+    """Resolve the rate-limit tier from the session without touching the DB"""
+    if session.get('user_role') == 'admin':
+        return 'admin'
+    # Compared with the clock on every request, so an expired premium drops to free at once
+    premium_until = session.get('premium_until')
+    return 'premium' if premium_until and premium_until > time.time() else 'free'
+
+@app.before_request
+def enforce_rate_limits():
+    """Reject request floods before any view (and DB access) runs"""
+    limited = check_rate_limit(
+        request.endpoint,
+        get_request_tier(),
+        session.get('user_id'),
+        request.remote_addr
+    )
+    if not limited:
+        return None
+    
+    if request.path.startswith('/api/'):
+        response = jsonify({
+            'success': False,
+            'message': 'Too many requests. Please slow down.',
+            'retry_after': limited['retry_after']
+        })
+    else:
+        response = make_response('Too many requests. Please slow down.')
+    
+    response.status_code = 429
+    response.headers['Retry-After'] = str(limited['retry_after'])
+    response.headers['X-RateLimit-Limit'] = str(limited['limit'])
+    response.headers['X-RateLimit-Scope'] = limited['scope']
+    return response
+
+# =========================
+# QUERY PROFILING
+# =========================
+# Admins always get the headers; everyone else only when enabled
+QUERY_DEBUG_HEADERS = os.getenv("QUERY_DEBUG_HEADERS", str(DEBUG)).lower() == "true"
+query_profiler.log = log
+slow_query_log.log = log
+
+@app.before_request
+def begin_query_profile():
+    query_profiler.begin()
+
+@app.after_request
+def add_query_headers(response):
+    """Expose the request's query count and database time"""
+    queries = query_profiler.current()
+    if queries is not None and (QUERY_DEBUG_HEADERS or session.get('user_role') == 'admin'):
+        response.headers['X-DB-Queries'] = str(queries.count)
+        response.headers['X-DB-Time'] = f"{queries.db_ms:.2f}ms"
+    return response
+
+@app.teardown_request
+def end_query_profile(exc=None):
+    query_profiler.end(request.endpoint)
+
+presence.log = log
+
+@app.before_request
+def touch_presence():
+    """Every authenticated request marks its user as seen (memory only)"""
+    user_id = session.get('user_id')
+    if user_id:
+        presence.touch(user_id)
+
+def read_recent_presence(since):
+    """(user_id, last_visit) of users seen since ``since``, to seed the presence windows"""
+    with app.app_context():
+        with db.engine.connect() as connection:
+            return connection.execute(
+                db.select(User.id, User.last_visit).where(User.last_visit >= since)
+            ).all()
+
+@app.before_request
+def start_background_jobs():
+    """Start the retention scheduler, time-series, leaderboard and presence upkeep in whichever process serves traffic"""
+    retention_manager.start(db.engine, RETENTION_TABLES, RETENTION_INTERVAL_HOURS)
+    time_series.start(backfill_time_series, TIMESERIES_SAVE_SECONDS)
+    leaderboards.start(read_leaderboard, LEADERBOARD_RESYNC_SECONDS, LEADERBOARD_SAVE_SECONDS)
+    presence.start(read_recent_presence)
+
 # =========================
 # 🧠 ADVANCED AI SYSTEM 🧠
 # =========================
@@ -625,44 +1416,90 @@ ai_manager = AIModelManager()
 def track_visit(user_id=None, page='/', referrer=None):
     """Track user visit and generate earnings"""
     try:
-        ip_address = request.environ.get('HTTP_X_FORWARDED_FOR', request.remote_addr)
+        ip_address = request.remote_addr  # Client address as resolved by ProxyFix (x_for=1)
         user_agent = request.headers.get('User-Agent', '')
         
+        # Check the visit against the sliding-window fraud counters
+        verdict = inspect_visit(
+            ip_address, user_id, user_agent,
+            request.headers.get('Accept-Language')
+        )
+        
+        user = user_by_id(user_id) if user_id else None
+        if user and verdict['flag_user'] and not user.fraud_flagged:
+            user.fraud_flagged = True
+            log("fraud", "WARNING", f"User {user_id} flagged for visit fraud", {
+                'ip': ip_address, 'reasons': verdict['reasons']
+            })
+        
+        suppressed = verdict['suppress'] or bool(user and user.fraud_flagged)
+        earnings = 0.0 if suppressed else VISIT_PAY_RATE
+        
         # Create visit record
         visit = Visit(
             user_id=user_id,
             ip_address=ip_address,
-            user_agent=user_agent,
+            user_agent_id=intern_string(VisitUserAgent, user_agent_cache, user_agent, 1000),
             page=page,
-            referrer=referrer,
-            earnings_generated=VISIT_PAY_RATE
+            referrer_id=intern_string(VisitReferrer, referrer_cache, referrer, 500),
+            earnings_generated=earnings
         )
         db.session.add(visit)
         
         # Add earnings to user if logged in
-        if user_id:
-            user = User.query.get(user_id)
-            if user:
-                user.visits_count += 1
-                user.last_visit = datetime.utcnow()
+        if user:
+            user.visits_count += 1
+            user.last_visit = datetime.utcnow()
+            if not suppressed:
                 user.add_earnings(VISIT_PAY_RATE, f"Visit earnings for {page}")
         
         # Add earnings to admin (70% of visit earnings)
-        admin_user = User.query.filter_by(role='admin').first()
-        if admin_user:
-            admin_earnings = VISIT_PAY_RATE * ADMIN_SHARE
-            admin_user.add_earnings(admin_earnings, f"Admin share from visit to {page}")
+        if not suppressed:
+            admin_user = get_admin_user()
+            if admin_user:
+                admin_earnings = VISIT_PAY_RATE * ADMIN_SHARE
+                admin_user.add_earnings(admin_earnings, f"Admin share from visit to {page}")
         
         db.session.commit()
-        log("monetization", "INFO", f"Visit tracked: {page} - Earnings: ₹{VISIT_PAY_RATE}")
+        log("monetization", "INFO", f"Visit tracked: {page} - Earnings: ₹{earnings}")
         
     except Exception as e:
         log("monetization", "ERROR", f"Visit tracking failed: {e}")
 
+# List price per chat for the web chat models
+CHAT_MODEL_COSTS = {
+    'ganesh-free': 0.0,
+    'gpt-4-turbo': GPT4_COST,
+    'claude-3-sonnet': CLAUDE_COST,
+    'gemini-pro': GEMINI_COST
+}
+
+def write_chat_events(batch):
+    """Insert a batch of queued chat events (runs on the analytics thread)"""
+    with app.app_context():
+        bulk_insert(db.session.connection(), ChatEvent.__table__, batch)
+        db.session.commit()
+
+chat_analytics.configure(
+    write_chat_events,
+    on_error=lambda e: log("analytics", "ERROR", f"Chat event batch write failed: {e}")
+)
+
+def track_chat(user_id, message, response, model, latency_ms=0):
+    """Queue a chat analytics event; never waits on database I/O"""
+    try:
+        chat_analytics.track(
+            user_id, model,
+            len(message or ''), len(response or ''),
+            int(latency_ms), CHAT_MODEL_COSTS.get(model, 0.0)
+        )
+    except Exception as e:
+        log("analytics", "ERROR", f"Chat tracking failed: {e}")
+
 def process_referral(referral_code, new_user_id):
     """Process referral bonus"""
     try:
-        referrer = User.query.filter_by(referral_code=referral_code).first()
+        referrer = user_by_referral_code(referral_code)
         if referrer and referrer.id != new_user_id:
             # Add referral bonus to referrer
             referrer.add_earnings(REFERRAL_BONUS, f"Referral bonus for user {new_user_id}")
@@ -678,7 +1515,7 @@ def process_referral(referral_code, new_user_id):
             db.session.add(referral)
             
             # Update referred user
-            new_user = User.query.get(new_user_id)
+            new_user = user_by_id(new_user_id)
             if new_user:
                 new_user.referred_by = referral_code
                 # Give welcome bonus to new user
@@ -697,7 +1534,7 @@ def generate_ad_revenue():
         # Simulate ad clicks and impressions
         daily_ad_revenue = random.uniform(50, 200)  # ₹50-200 per day
         
-        admin_user = User.query.filter_by(role='admin').first()
+        admin_user = get_admin_user()
         if admin_user:
             admin_user.add_earnings(daily_ad_revenue, "Daily ad revenue")
             db.session.commit()
@@ -709,7 +1546,7 @@ def generate_ad_revenue():
 def query_openai(prompt: str, user_id: Optional[int] = None) -> str:
     """Legacy OpenAI function - now uses AI Manager"""
     try:
-        user = User.query.get(user_id) if user_id else None
+        user = user_by_id(user_id) if user_id else None
         
         # Use async AI manager in sync context
         import asyncio
@@ -1164,11 +2001,11 @@ def register():
             return redirect(url_for('register'))
         
         # Check if user exists
-        if User.query.filter_by(username=username).first():
+        if user_by_username(username):
             flash('Username already exists.', 'error')
             return redirect(url_for('register'))
         
-        if User.query.filter_by(email=email).first():
+        if user_by_email(email):
             flash('Email already registered.', 'error')
             return redirect(url_for('register'))
         
@@ -1257,12 +2094,13 @@ def login():
             flash('Username and password are required.', 'error')
             return redirect(url_for('login'))
         
-        user = User.query.filter_by(username=username).first()
+        user = user_by_username(username)
         
         if user and user.check_password(password) and user.is_active:
             session['user_id'] = user.id
             session['username'] = user.username
             session['user_role'] = user.role
+            remember_premium(user.premium_until)
             
             flash(f'Welcome back, {user.username}!', 'success')
             
@@ -1344,7 +2182,7 @@ def logout():
 @login_required
 def dashboard():
     """Modern ChatGPT-style Dashboard with Visit Tracking"""
-    user = User.query.get(session['user_id'])
+    user = get_current_user()
     
     # Track visit for monetization
     track_visit(user.id, '/dashboard', request.referrer)
@@ -1355,8 +2193,12 @@ def dashboard():
         db.session.commit()
     
     # Get user's recent data
-    transactions = Transaction.query.filter_by(user_id=user.id).order_by(Transaction.created_at.desc()).limit(5).all()
-    api_usage = APIUsage.query.filter_by(user_id=user.id).order_by(APIUsage.created_at.desc()).limit(5).all()
+    transactions = TRANSACTION_ROW.all(db.session, TRANSACTION_ROW.select().where(
+        Transaction.user_id == user.id
+    ).order_by(Transaction.created_at.desc()).limit(5))
+    api_usage = API_USAGE_ROW.all(db.session, API_USAGE_ROW.select().where(
+        APIUsage.user_id == user.id
+    ).order_by(APIUsage.created_at.desc()).limit(5))
     available_models = ai_manager.get_available_models(user)
     
     return render_template('dashboard_new.html',
@@ -1373,24 +2215,10 @@ def dashboard():
 @admin_required
 def admin_dashboard():
     """Advanced Admin Control Panel"""
-    user = User.query.get(session['user_id'])
+    user = get_current_user()
     
     # Get comprehensive statistics
-    stats = {
-        'total_users': User.query.count(),
-        'total_revenue': db.session.query(db.func.sum(Transaction.amount)).filter(
-            Transaction.transaction_type == 'credit'
-        ).scalar() or 0,
-        'total_chats': db.session.query(db.func.sum(User.chats_count)).scalar() or 0,
-        'active_users': User.query.filter(
-            User.last_visit >= datetime.utcnow() - timedelta(days=1)
-        ).count(),
-        'premium_users': User.query.filter(
-            User.premium_until > datetime.utcnow()
-        ).count(),
-        'pending_withdrawals': WithdrawalRequest.query.filter_by(status='pending').count(),
-        'total_earnings': db.session.query(db.func.sum(User.total_earned)).scalar() or 0
-    }
+    stats = cached_admin_stats()[0]['stats']
     
     return render_template('admin_panel.html',
         app_name=APP_NAME,
@@ -1447,66 +2275,165 @@ telegram_app = None
 # MAIN APPLICATION STARTUP
 # =========================
 
+migration_engine = MigrationEngine(log)
+
+@migration_engine.migration(1, "Add monetization and fraud columns to users")
+def migration_user_columns(connection):
+    """Bring pre-monetization users tables up to the current columns"""
+    from sqlalchemy import inspect, text
+    
+    inspector = inspect(connection)
+    if not inspector.has_table('users'):
+        return
+    
+    columns = [col['name'] for col in inspector.get_columns('users')]
+    column_defaults = {
+        'total_earned': '0',
+        'visits_count': '0',
+        'chats_count': '0',
+        'referrals_count': '0',
+        'referral_code': None,
+        'referred_by': None,
+        'premium_until': None,
+        'last_visit': None,
+        'fraud_flagged': 'FALSE'
+    }
+    
+    for col, default in column_defaults.items():
+        if col not in columns:
+            # Compile the model's column type so the DDL is valid on every backend
+            col_type = User.__table__.c[col].type.compile(dialect=connection.dialect)
+            ddl = f"ALTER TABLE users ADD COLUMN {col} {col_type}"
+            if default is not None:
+                ddl += f" DEFAULT {default}"
+            connection.execute(text(ddl))
+            log("database", "INFO", f"Added column: {col}")
+
+@migration_engine.migration(2, "Intern visit user agents and referrers")
+def migration_visit_dictionaries(connection):
+    """Move inline visits.user_agent/referrer text into the dictionary tables"""
+    from sqlalchemy import inspect, text
+    
+    inspector = inspect(connection)
+    if not inspector.has_table('visits'):
+        return
+    columns = [col['name'] for col in inspector.get_columns('visits')]
+    if 'user_agent' not in columns and 'referrer' not in columns:
+        return
+    
+    log("database", "INFO", "Converting visits to interned user agent/referrer ids")
+    conversions = [
+        ('user_agent', 'user_agent_id', VisitUserAgent, 1000),
+        ('referrer', 'referrer_id', VisitReferrer, 500),
+    ]
+    
+    for old_col, new_col, model, max_length in conversions:
+        if old_col not in columns:
+            continue
+        if new_col not in columns:
+            connection.execute(text(f"ALTER TABLE visits ADD COLUMN {new_col} INTEGER"))
+        
+        table = model.__tablename__
+        existing = set(connection.execute(db.select(model.value)).scalars())
+        values = connection.execute(text(
+            f"SELECT DISTINCT {old_col} FROM visits WHERE {old_col} IS NOT NULL AND {old_col} != ''"
+        )).scalars()
+        new_rows = []
+        for value in values:
+            value = value[:max_length]
+            if value not in existing:
+                existing.add(value)
+                new_rows.append({'value_hash': value_hash(value), 'value': value})
+        if new_rows:
+            connection.execute(db.insert(model), new_rows)
+        
+        # A temporary index on the dictionary value turns the back-fill into
+        # one indexed lookup per visit row instead of a scan per distinct value.
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS tmp_{table}_value ON {table} (value)"))
+        connection.execute(text(
+            f"UPDATE visits SET {new_col} = "
+            f"(SELECT id FROM {table} WHERE {table}.value = SUBSTR(visits.{old_col}, 1, {max_length})) "
+            f"WHERE {old_col} IS NOT NULL AND {old_col} != ''"
+        ))
+        connection.execute(text(f"DROP INDEX tmp_{table}_value"))
+        connection.execute(text(f"ALTER TABLE visits DROP COLUMN {old_col}"))
+        log("database", "INFO", f"Interned visits.{old_col} into {table}")
+
+@migration_engine.migration(3, "Create hot-path indexes")
+def migration_hot_path_indexes(connection):
+    """Create the indexes declared on the models for existing tables"""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+@migration_engine.migration(4, "Index admin user listing sort orders")
+def migration_user_sort_indexes(connection):
+    """Backfill NULL counters (keyset cursors cannot step past NULLs) and index the sorts"""
+    from sqlalchemy import text
+    
+    connection.execute(text("UPDATE users SET total_earned = 0 WHERE total_earned IS NULL"))
+    connection.execute(text("UPDATE users SET chats_count = 0 WHERE chats_count IS NULL"))
+    for index in User.__table__.indexes:
+        if index.name in ('ix_users_total_earned_id', 'ix_users_chats_count_id'):
+            index.create(connection, checkfirst=True)
+
+@migration_engine.migration(5, "Backfill metric rollups")
+def migration_metric_rollups(connection):
+    """Seed the rollup table from the existing history.
+    
+    Only each user's latest visit is known, so past active-user buckets are
+    approximate; chats and earnings before this point go to the all-time
+    totals only.
+    """
+    table = MetricRollup.__table__
+    table.create(connection, checkfirst=True)
+    if connection.execute(db.select(db.func.count()).select_from(table)).scalar():
+        return
+    
+    batch = RollupBatch()
+    stream = connection.execution_options(stream_results=True)
+    for created_at, transaction_type, amount in stream.execute(
+        db.select(Transaction.created_at, Transaction.transaction_type, Transaction.amount)
+    ):
+        if created_at:
+            batch.add(f"revenue.{transaction_type}", created_at, float(amount or 0))
+    for created_at, earnings in stream.execute(db.select(Visit.created_at, Visit.earnings_generated)):
+        if created_at:
+            batch.add('visits', created_at, float(earnings or 0))
+    for created_at, last_visit, chats, earned in stream.execute(
+        db.select(User.created_at, User.last_visit, User.chats_count, User.total_earned)
+    ):
+        batch.add('signups', created_at or ALL_TIME)
+        if last_visit:
+            batch.add('active_users', last_visit, periods=ACTIVE_USER_PERIODS)
+        if chats:
+            batch.add('chats', ALL_TIME, count=chats, periods=('all',))
+        if earned:
+            batch.add('earned', ALL_TIME, float(earned), count=0, periods=('all',))
+    upsert_rollups(connection, table, batch)
+    log("database", "INFO", f"Backfilled {len(batch)} metric rollup rows")
+
+@migration_engine.migration(6, "Index created_at for date-range exports")
+def migration_export_indexes(connection):
+    """Create the created_at indexes used by /api/admin/export"""
+    names = ('ix_users_created_at', 'ix_payment_orders_created_at', 'ix_withdrawal_requests_created_at')
+    for model in (User, PaymentOrder, WithdrawalRequest):
+        for index in model.__table__.indexes:
+            if index.name in names:
+                index.create(connection, checkfirst=True)
+
+@migration_engine.migration(7, "Index admin user search")
+def migration_user_search_indexes(connection):
+    """Prefix indexes and the trigram index (FTS5 table or pg_trgm) behind /api/admin/users/search"""
+    create_search_indexes(connection, log)
+
 def migrate_database():
-    """Migrate database schema to add missing columns"""
+    """Apply pending versioned schema migrations"""
     try:
-        from sqlalchemy import inspect, text
-        
-        # Check if we need to add new columns
-        inspector = inspect(db.engine)
-        
-        # Check if users table exists
-        if not inspector.has_table('users'):
-            log("database", "INFO", "Users table doesn't exist, will be created by db.create_all()")
-            return
-            
-        columns = [col['name'] for col in inspector.get_columns('users')]
-        
-        missing_columns = []
-        required_columns = [
-            'total_earned', 'visits_count', 'chats_count', 'referrals_count',
-            'referral_code', 'referred_by', 'premium_until', 'last_visit'
-        ]
-        
-        for col in required_columns:
-            if col not in columns:
-                missing_columns.append(col)
-        
-        if missing_columns:
-            log("database", "INFO", f"Adding missing columns: {missing_columns}")
-            
-            # Add missing columns with ALTER TABLE using session.execute
-            for col in missing_columns:
-                try:
-                    if col in ['total_earned']:
-                        db.session.execute(text(f"ALTER TABLE users ADD COLUMN {col} FLOAT DEFAULT 0.0"))
-                    elif col in ['visits_count', 'chats_count', 'referrals_count']:
-                        db.session.execute(text(f"ALTER TABLE users ADD COLUMN {col} INTEGER DEFAULT 0"))
-                    elif col in ['referral_code', 'referred_by']:
-                        db.session.execute(text(f"ALTER TABLE users ADD COLUMN {col} VARCHAR(20)"))
-                    elif col in ['premium_until', 'last_visit']:
-                        db.session.execute(text(f"ALTER TABLE users ADD COLUMN {col} DATETIME"))
-                    
-                    log("database", "INFO", f"Added column: {col}")
-                except Exception as e:
-                    log("database", "WARNING", f"Could not add column {col}: {e}")
-            
-            # Commit changes
-            db.session.commit()
-            log("database", "INFO", "Database migration completed")
-        else:
-            log("database", "INFO", "Database schema is up to date")
-            
+        migration_engine.run(db.engine)
     except Exception as e:
         log("database", "ERROR", f"Database migration failed: {e}")
-        # If migration fails, recreate tables
-        try:
-            log("database", "INFO", "Attempting to recreate database tables...")
-            db.drop_all()
-            db.create_all()
-            log("database", "INFO", "Database recreated successfully")
-        except Exception as e2:
-            log("database", "ERROR", f"Database recreation failed: {e2}")
+        raise
 
 # =========================
 # API ROUTES FOR FRONTEND
@@ -1525,7 +2452,7 @@ def api_chat():
         if not message:
             return jsonify({'success': False, 'message': 'Message is required'})
         
-        user = User.query.get(session['user_id'])
+        user = get_current_user()
         if not user:
             return jsonify({'success': False, 'message': 'User not found'})
         
@@ -1540,10 +2467,12 @@ def api_chat():
                 })
         
         # Generate AI response based on model
+        started = time.perf_counter()
         response = generate_ai_response(message, model, user)
+        latency_ms = (time.perf_counter() - started) * 1000
         
         # Track chat for monetization
-        track_chat(user.id, message, response, model)
+        track_chat(user.id, message, response, model, latency_ms)
         
         # Update user stats
         user.chats_count = (user.chats_count or 0) + 1
@@ -1819,25 +2748,72 @@ Experience the future of AI with Premium! 🚀"""
 def api_user_stats():
     """Get current user statistics"""
     try:
-        user = User.query.get(session['user_id'])
+        user = USER_STATS_ROW.one_or_none(
+            db.session, USER_STATS_ROW.select().where(User.id == session['user_id'])
+        )
         if not user:
             return jsonify({'success': False, 'message': 'User not found'})
+        remember_premium(user.premium_until)
         
         return jsonify({
             'success': True,
-            'stats': {
-                'wallet': float(user.wallet),
-                'total_earned': float(user.total_earned),
-                'chats_count': user.chats_count or 0,
-                'visits_count': user.visits_count or 0,
-                'referrals_count': user.referrals_count or 0,
-                'is_premium': user.premium_until and user.premium_until > datetime.utcnow()
-            }
+            'stats': user_stats_dict(user)
         })
     except Exception as e:
         log("api", "ERROR", f"Stats API error: {e}")
         return jsonify({'success': False, 'message': 'Internal server error'})
 
+@app.route('/api/user/live', methods=['GET'])
+@login_required
+def api_user_live():
+    """Server-sent stream of the current user's stats, pushed as they change"""
+    user_id = session['user_id']
+    try:
+        subscription = event_hub.subscribe([f"user:{user_id}"], pool='user')
+    except HubFull as e:
+        return jsonify({'success': False, 'message': str(e)}), 503
+    
+    try:
+        # Subscribed first, so no change between this read and the stream is missed
+        user = USER_STATS_ROW.one_or_none(db.session, USER_STATS_ROW.select().where(User.id == user_id))
+    except Exception as e:
+        event_hub.unsubscribe(subscription)
+        log("api", "ERROR", f"Live stats error: {e}")
+        return jsonify({'success': False, 'message': 'Internal server error'}), 500
+    if not user:
+        event_hub.unsubscribe(subscription)
+        return jsonify({'success': False, 'message': 'User not found'}), 404
+    return live_response(subscription, [format_event('stats', user_stats_dict(user))])
+
+@app.route('/api/leaderboard', methods=['GET'])
+@login_required
+def api_leaderboard():
+    """Top earners or referrers plus the caller's own rank: ?board=earnings|referrals&limit="""
+    board = request.args.get('board', 'earnings')
+    if board not in LEADERBOARD_SCORES:
+        return jsonify({'success': False, 'message': f"Unknown board: {board}"}), 400
+    limit = page_size(request.args.get('limit'), default=10, maximum=LEADERBOARD_MAX_LIMIT)
+    
+    try:
+        top = leaderboards.top(board, limit)
+        rank, score = leaderboards.rank(board, session['user_id'])
+        names = dict(db.session.execute(
+            db.select(User.id, User.username).where(User.id.in_([user_id for user_id, _ in top]))
+        ).all()) if top else {}
+        return jsonify({
+            'success': True,
+            'board': board,
+            'ready': leaderboards.ready,
+            'top': [
+                {'rank': position, 'username': names.get(user_id), 'score': score_value}
+                for position, (user_id, score_value) in enumerate(top, 1)
+            ],
+            'me': {'rank': rank, 'score': score or 0}
+        })
+    except Exception as e:
+        log("api", "ERROR", f"Leaderboard API error: {e}")
+        return jsonify({'success': False, 'message': 'Failed to get leaderboard'})
+
 @app.route('/api/withdrawal', methods=['POST'])
 @login_required
 def api_withdrawal():
@@ -1846,7 +2822,7 @@ def api_withdrawal():
         data = request.get_json()
         amount = float(data.get('amount', 0))
         
-        user = User.query.get(session['user_id'])
+        user = get_current_user()
         if not user:
             return jsonify({'success': False, 'message': 'User not found'})
         
@@ -1889,7 +2865,7 @@ def api_subscribe():
         data = request.get_json()
         plan = data.get('plan', 'monthly')
         
-        user = User.query.get(session['user_id'])
+        user = get_current_user()
         if not user:
             return jsonify({'success': False, 'message': 'User not found'})
         
@@ -1944,112 +2920,251 @@ def api_log_error():
 def api_admin_stats():
     """Get admin dashboard statistics"""
     try:
-        # Get comprehensive statistics
-        stats = {
-            'total_users': User.query.count(),
-            'total_revenue': db.session.query(db.func.sum(Transaction.amount)).filter(
-                Transaction.transaction_type == 'credit'
-            ).scalar() or 0,
-            'total_chats': db.session.query(db.func.sum(User.chats_count)).scalar() or 0,
-            'active_users': User.query.filter(
-                User.last_visit >= datetime.utcnow() - timedelta(days=1)
-            ).count(),
-            'premium_users': User.query.filter(
-                User.premium_until > datetime.utcnow()
-            ).count(),
-            'pending_withdrawals': WithdrawalRequest.query.filter_by(status='pending').count(),
-            'total_earnings': db.session.query(db.func.sum(User.total_earned)).scalar() or 0,
-            'today_revenue': db.session.query(db.func.sum(Transaction.amount)).filter(
-                Transaction.transaction_type == 'credit',
-                Transaction.created_at >= datetime.utcnow().date()
-            ).scalar() or 0,
-            'month_revenue': db.session.query(db.func.sum(Transaction.amount)).filter(
-                Transaction.transaction_type == 'credit',
-                Transaction.created_at >= datetime.utcnow().replace(day=1)
-            ).scalar() or 0
-        }
-        
-        # Get recent activity
-        recent_activity = []
-        recent_transactions = Transaction.query.order_by(Transaction.created_at.desc()).limit(10).all()
-        
-        for txn in recent_transactions:
-            user = User.query.get(txn.user_id)
-            recent_activity.append({
-                'time': txn.created_at.isoformat(),
-                'user': user.username if user else 'Unknown',
-                'action': txn.description or f"{txn.transaction_type.title()} Transaction",
-                'amount': float(txn.amount),
-                'status': 'success' if txn.status == 'completed' else 'pending'
-            })
-        
+        snapshot, cache_info = cached_admin_stats()
         return jsonify({
             'success': True,
-            'stats': stats,
-            'recent_activity': recent_activity
+            'stats': snapshot['stats'],
+            'recent_activity': snapshot['recent_activity'],
+            'cache': cache_info
         })
         
     except Exception as e:
         log("admin", "ERROR", f"Admin stats API error: {e}")
         return jsonify({'success': False, 'message': 'Failed to get statistics'})
 
+# Sort orders for the admin user listing; each ends in the unique id
+ADMIN_USER_SORTS = {
+    'created_desc': [(User.id, True)],
+    'created_asc': [(User.id, False)],
+    'earnings_desc': [(User.total_earned, True), (User.id, True)],
+    'chats_desc': [(User.chats_count, True), (User.id, True)]
+}
+
+def admin_users_query(args, row_model=ADMIN_USER_ROW, match='contains'):
+    """Filtered ``row_model`` select and sort keys from the listing's query string.
+    
+    ``q`` is matched against username, email, referral code and Telegram id,
+    as a substring or a prefix (``match``) through the search indexes.
+    """
+    sort = args.get('sort', 'created_desc')
+    if sort not in ADMIN_USER_SORTS:
+        raise ValueError(f"Unknown sort: {sort}")
+    
+    query = row_model.select()
+    status = args.get('filter', '')
+    if status == 'premium':
+        query = query.where(User.premium_until > datetime.utcnow())
+    elif status == 'active':
+        query = query.where(User.is_active.is_(True))
+    elif status == 'inactive':
+        query = query.where(User.is_active.is_(False))
+    elif status:
+        raise ValueError(f"Unknown filter: {status}")
+    
+    search = (args.get('q') or '').strip()
+    if search:
+        query = query.where(user_search.condition(
+            db.session.connection(), User, search, args.get('match', match)
+        ))
+    return query, ADMIN_USER_SORTS[sort]
+
+ADMIN_USER_FIELDS = (
+    'id', 'username', 'email', 'wallet', 'total_earned', 'chats_count', 'referrals_count',
+    'is_active', 'is_premium', 'created_at'
+)
+
+def admin_user_row(u):
+    return {
+        'id': u.id,
+        'username': u.username,
+        'email': u.email,
+        'wallet': float(u.wallet or 0),
+        'total_earned': float(u.total_earned or 0),
+        'chats_count': u.chats_count or 0,
+        'referrals_count': u.referrals_count or 0,
+        'is_active': u.is_active,
+        'is_premium': bool(u.premium_until and u.premium_until > datetime.utcnow()),
+        'created_at': u.created_at.isoformat() if u.created_at else None
+    }
+
 @app.route('/api/admin/users', methods=['GET'])
 @login_required
 @admin_required
 def api_admin_users():
-    """Get all users for admin panel"""
-    user = User.query.get(session['user_id'])
-    if not user or user.role != 'admin':
-        return jsonify({'success': False, 'message': 'Admin access required'})
-    
+    """Get one page of users for the admin panel (keyset paginated)"""
     try:
-        users = User.query.all()
-        users_data = []
-        
-        for u in users:
-            users_data.append({
-                'id': u.id,
-                'username': u.username,
-                'email': u.email,
-                'wallet': float(u.wallet),
-                'total_earned': float(u.total_earned),
-                'chats_count': u.chats_count or 0,
-                'referrals_count': u.referrals_count or 0,
-                'is_active': u.is_active,
-                'created_at': u.created_at.isoformat() if u.created_at else None
-            })
-        
+        query, keys = admin_users_query(request.args)
+        users, next_cursor = keyset_select_page(
+            db.session, query, keys, page_size(request.args.get('limit')),
+            request.args.get('cursor'), ADMIN_USER_ROW.row
+        )
         return jsonify({
             'success': True,
-            'users': users_data
+            'users': [admin_user_row(u) for u in users],
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
         })
-        
+    except (ValueError, InvalidCursor) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         log("api", "ERROR", f"Admin users API error: {e}")
         return jsonify({'success': False, 'message': 'Internal server error'})
 
+@app.route('/api/admin/users/search', methods=['GET'])
+@login_required
+@admin_required
+def api_admin_users_search():
+    """Find users by username, email, referral code or Telegram id (prefix by default; keyset paginated)"""
+    if not (request.args.get('q') or '').strip():
+        return jsonify({'success': False, 'message': 'q is required'}), 400
+    try:
+        query, keys = admin_users_query(request.args, ADMIN_USER_SEARCH_ROW, match='prefix')
+        users, next_cursor = keyset_select_page(
+            db.session, query, keys, page_size(request.args.get('limit')),
+            request.args.get('cursor'), ADMIN_USER_SEARCH_ROW.row
+        )
+        return jsonify({
+            'success': True,
+            'users': [u._asdict() for u in users],
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        })
+    except (ValueError, InvalidCursor) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        log("api", "ERROR", f"Admin user search error: {e}")
+        return jsonify({'success': False, 'message': 'Internal server error'})
+
+@app.route('/api/admin/users/export', methods=['GET'])
+@login_required
+@admin_required
+def api_admin_users_export():
+    """Stream every matching user as NDJSON (default), CSV or a JSON array"""
+    try:
+        admin_users_query(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'message': f"Unknown format: {export_format}"}), 400
+    
+    args = request.args.copy()
+    
+    def rows():
+        # Projected rows never enter the session, so the identity map stays empty
+        query, keys = admin_users_query(args)
+        yield from iter_keyset_select(db.session, query, keys, row_factory=ADMIN_USER_ROW.row)
+    
+    log("admin", "INFO", f"User export ({export_format}) by {session.get('username')}")
+    return export_response(rows(), admin_user_row, ADMIN_USER_FIELDS, export_format, 'users',
+                           request.args.get('gzip') == '1')
+
+# Formats for streamed exports: (media type, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'json': ('application/json', 'json')
+}
+
+# Date-range exports: dataset -> (model, projection)
+EXPORT_DATASETS = {
+    'users': (User, USER_EXPORT_ROW),
+    'transactions': (Transaction, TRANSACTION_EXPORT_ROW),
+    'payments': (PaymentOrder, PAYMENT_ORDER_EXPORT_ROW),
+    'withdrawals': (WithdrawalRequest, WITHDRAWAL_EXPORT_ROW)
+}
+
+def export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def export_row(row):
+    return {field: export_value(value) for field, value in row._asdict().items()}
+
+def export_response(rows, serialize, fields, export_format, filename, compress=False):
+    """Streamed download of ``rows``; nothing is buffered beyond one chunk"""
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    if export_format == 'csv':
+        body = stream_csv(rows, serialize, fields)
+    elif export_format == 'ndjson':
+        body = stream_ndjson(rows, serialize)
+    else:
+        body = stream_json_array(rows, serialize)
+    
+    filename = f"{filename}.{extension}"
+    if compress:
+        body, mimetype, filename = gzip_stream(body), 'application/gzip', f"{filename}.gz"
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/admin/export/<dataset>', methods=['GET'])
+@login_required
+@admin_required
+def api_admin_export(dataset):
+    """Stream users, transactions, payments or withdrawals: ?format=csv|ndjson|json&start=&end=&gzip=1"""
+    if dataset not in EXPORT_DATASETS:
+        return jsonify({'success': False, 'message': f"Unknown dataset: {dataset}"}), 404
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'message': f"Unknown format: {export_format}"}), 400
+    try:
+        start = parse_utc(request.args.get('start'), None)
+        end = parse_utc(request.args.get('end'), None)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': f"Invalid date: {e}"}), 400
+    
+    model, read_model = EXPORT_DATASETS[dataset]
+    query = read_model.select()
+    if start is None and end is None:
+        keys = [(model.id, False)]
+    else:
+        # A date range walks the created_at index; created_at ties are broken by id
+        keys = [(model.created_at, False), (model.id, False)]
+        if start is not None:
+            query = query.where(model.created_at >= start)
+        if end is not None:
+            query = query.where(model.created_at < end)
+    
+    def rows():
+        yield from iter_keyset_select(db.session, query, keys, row_factory=read_model.row)
+    
+    log("admin", "INFO", f"Export of {dataset} ({export_format}) by {session.get('username')}", {
+        'start': request.args.get('start'), 'end': request.args.get('end')
+    })
+    return export_response(rows(), export_row, read_model.fields, export_format, dataset,
+                           request.args.get('gzip') == '1')
+
 @app.route('/api/admin/revenue', methods=['GET'])
 @login_required
 def api_admin_revenue():
     """Get revenue statistics for admin"""
-    user = User.query.get(session['user_id'])
+    user = get_current_user()
     if not user or user.role != 'admin':
         return jsonify({'success': False, 'message': 'Admin access required'})
     
     try:
         # Calculate revenue statistics
-        total_users = User.query.count()
+        stats = cached_admin_stats()[0]['stats']
+        total_users = stats['total_users']
         active_users = User.query.filter_by(is_active=True).count()
-        total_earned = db.session.query(db.func.sum(User.total_earned)).scalar() or 0
+        total_earned = stats['total_earnings']
         
-        # Today's revenue (placeholder calculation)
-        today = datetime.utcnow().date()
-        today_revenue = total_earned * 0.1  # Placeholder calculation
+        # Projections come from the nightly forecast, built at most once a day
+        report, _ = forecaster.report(read_forecast_history)
+        revenue_forecast = report['metrics']['revenue']
         
         return jsonify({
             'success': True,
             'total_revenue': float(total_earned),
-            'today_revenue': float(today_revenue),
+            'today_revenue': float(stats['today_revenue']),
+            'month_revenue': float(stats['month_revenue']),
+            'forecast': {
+                'today': revenue_forecast['forecast'][0] if revenue_forecast['forecast'] else 0.0,
+                'next_7_days': revenue_forecast['next_7_days'],
+                'next_30_days': revenue_forecast['next_30_days']
+            },
             'total_users': total_users,
             'active_users': active_users
         })
@@ -2058,11 +3173,362 @@ def api_admin_revenue():
         log("api", "ERROR", f"Admin revenue API error: {e}")
         return jsonify({'success': False, 'message': 'Internal server error'})
 
+# Rollup periods the metrics API serves, with the bucket length and maximum buckets returned
+METRIC_SERIES_PERIODS = {
+    'hour': (timedelta(hours=1), 24 * 31),
+    'day': (timedelta(days=1), 366)
+}
+
+@app.route('/api/admin/metrics', methods=['GET'])
+@login_required
+@admin_required
+def api_admin_metrics():
+    """Hourly or daily series of the rollup metrics"""
+    period = request.args.get('period', 'hour')
+    if period not in METRIC_SERIES_PERIODS:
+        return jsonify({'success': False, 'message': f"Unknown period: {period}"}), 400
+    length, maximum = METRIC_SERIES_PERIODS[period]
+    buckets = page_size(request.args.get('buckets'), default=48 if period == 'hour' else 30, maximum=maximum)
+    metrics = [m for m in request.args.get('metrics', '').split(',') if m] or [
+        'revenue.credit', 'revenue.debit', 'visits', 'signups', 'chats', 'earned', 'active_users'
+    ]
+    
+    try:
+        now = datetime.utcnow()
+        series = read_series(
+            db.session.connection(), MetricRollup.__table__, period,
+            now - length * (buckets - 1), now + length, metrics
+        )
+        return jsonify({'success': True, 'period': period, 'series': series})
+    except Exception as e:
+        log("admin", "ERROR", f"Metrics API error: {e}")
+        return jsonify({'success': False, 'message': 'Failed to get metrics'})
+
+@app.route('/api/admin/live', methods=['GET'])
+@login_required
+@admin_required
+def api_admin_live():
+    """Server-sent stream of dashboard metric deltas, starting with a fresh snapshot"""
+    try:
+        subscription = event_hub.subscribe(['admin'], pool='admin')
+    except HubFull as e:
+        return jsonify({'success': False, 'message': str(e)}), 503
+    
+    try:
+        # Fresh rather than cached, since the deltas that follow apply on top of it
+        snapshot = admin_stats_snapshot()
+    except Exception as e:
+        event_hub.unsubscribe(subscription)
+        log("admin", "ERROR", f"Live stats snapshot error: {e}")
+        return jsonify({'success': False, 'message': 'Failed to get statistics'}), 500
+    return live_response(subscription, [format_event('snapshot', snapshot)])
+
+@app.route('/api/admin/live/status', methods=['GET'])
+@login_required
+@admin_required
+def api_admin_live_status():
+    """Connections and delivery counters of the live event hub"""
+    return jsonify({'success': True, 'hub': event_hub.get_stats()})
+
+@app.route('/api/admin/stats/cache', methods=['GET'])
+@login_required
+@admin_required
+def api_admin_stats_cache():
+    """Hit counts, computation time and age of the shared stats cache"""
+    return jsonify({'success': True, 'cache': stats_cache.get_stats()})
+
+# Longest range the time-series API resamples in one call
+TIMESERIES_MAX_POINTS = 5000
+
+def parse_utc(value, default):
+    """ISO timestamp from a query string as naive UTC"""
+    if not value:
+        return default
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+@app.route('/api/admin/timeseries', methods=['GET'])
+@login_required
+@admin_required
+def api_admin_timeseries():
+    """Resampled minute series: ?metric=&start=&end=&step=<minutes>&field=value|count&agg=sum|mean|max"""
+    try:
+        step = int(request.args.get('step', 60))
+        if step < 1:
+            raise ValueError("step must be at least one minute")
+        end = parse_utc(request.args.get('end'), datetime.utcnow().replace(second=0, microsecond=0) + timedelta(minutes=1))
+        start = parse_utc(request.args.get('start'), end - timedelta(days=1))
+        if end <= start:
+            raise ValueError("end must be after start")
+        if (end - start) / timedelta(minutes=step) > TIMESERIES_MAX_POINTS:
+            raise ValueError(f"At most {TIMESERIES_MAX_POINTS} points per request")
+        
+        started = time.perf_counter()
+        points = time_series.query(
+            request.args.get('metric', 'revenue.credit'), start, end, step,
+            request.args.get('field', 'value'), request.args.get('agg', 'sum')
+        )
+        query_us = round((time.perf_counter() - started) * 1e6, 1)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        log("admin", "ERROR", f"Time series API error: {e}")
+        return jsonify({'success': False, 'message': 'Failed to get time series'})
+    
+    return jsonify({
+        'success': True,
+        'start': start.isoformat(),
+        'step_minutes': step,
+        'points': points.round(4).tolist(),
+        'query_us': query_us,
+        'available': time_series.metrics()
+    })
+
+@app.route('/api/admin/cohorts', methods=['GET'])
+@login_required
+@admin_required
+def api_admin_cohorts():
+    """Weekly signup cohorts, retention curve and signup funnel (computed once per day)"""
+    try:
+        report, info = cohort_analytics.report(
+            extract_cohort_report, refresh=request.args.get('refresh') == '1'
+        )
+        return jsonify({'success': True, 'report': report, 'computed': info})
+    except Exception as e:
+        log("admin", "ERROR", f"Cohort analytics API error: {e}")
+        return jsonify({'success': False, 'message': 'Failed to get cohort analytics'})
+
+@app.route('/api/admin/forecast', methods=['GET'])
+@login_required
+@admin_required
+def api_admin_forecast():
+    """Daily history and projections of revenue, chats, visits and signups (rebuilt once per day)"""
+    try:
+        report, info = forecaster.report(read_forecast_history, refresh=request.args.get('refresh') == '1')
+        return jsonify({'success': True, 'report': report, 'computed': info})
+    except Exception as e:
+        log("admin", "ERROR", f"Forecast API error: {e}")
+        return jsonify({'success': False, 'message': 'Failed to get forecast'})
+
+@app.route('/api/admin/presence', methods=['GET'])
+@login_required
+@admin_required
+def api_admin_presence():
+    """Online-now and active-user counts from the in-memory presence windows"""
+    return jsonify({'success': True, 'presence': presence.get_stats()})
+
+@app.route('/api/admin/leaderboards', methods=['GET'])
+@login_required
+@admin_required
+def api_admin_leaderboards():
+    """Leaderboard sizes, sync and snapshot status"""
+    return jsonify({'success': True, 'leaderboards': leaderboards.get_stats()})
+
+@app.route('/api/admin/rate-limits', methods=['GET'])
+@login_required
+@admin_required
+def api_admin_rate_limits():
+    """Get rate limiter counters and configured limits"""
+    try:
+        return jsonify({
+            'success': True,
+            'rate_limits': get_rate_limit_stats()
+        })
+    except Exception as e:
+        log("admin", "ERROR", f"Rate limit stats API error: {e}")
+        return jsonify({'success': False, 'message': 'Failed to get rate limit statistics'})
+
+@app.route('/api/admin/fraud', methods=['GET'])
+@login_required
+@admin_required
+def api_admin_fraud():
+    """Get top visit-fraud offenders and flagged accounts"""
+    try:
+        limit = page_size(request.args.get('limit'), default=20, maximum=100)
+        flagged = User.query.filter_by(fraud_flagged=True).order_by(User.id).limit(limit).all()
+        
+        return jsonify({
+            'success': True,
+            'detector': get_fraud_stats(),
+            'top_offenders': get_top_offenders(limit),
+            'flagged_users': [{
+                'id': u.id,
+                'username': u.username,
+                'visits_count': u.visits_count or 0,
+                'total_earned': float(u.total_earned or 0)
+            } for u in flagged]
+        })
+    except Exception as e:
+        log("admin", "ERROR", f"Fraud stats API error: {e}")
+        return jsonify({'success': False, 'message': 'Failed to get fraud statistics'})
+
+@app.route('/api/admin/fraud/clear/<int:user_id>', methods=['POST'])
+@login_required
+@admin_required
+def api_admin_fraud_clear(user_id):
+    """Clear the fraud flag on a user account"""
+    try:
+        target = user_by_id(user_id)
+        if not target:
+            return jsonify({'success': False, 'message': 'User not found'})
+        
+        target.fraud_flagged = False
+        db.session.commit()
+        log("admin", "INFO", f"Fraud flag cleared for user {user_id} by {session.get('username')}")
+        
+        return jsonify({'success': True, 'message': 'Fraud flag cleared'})
+    except Exception as e:
+        log("admin", "ERROR", f"Fraud clear API error: {e}")
+        return jsonify({'success': False, 'message': 'Failed to clear fraud flag'})
+
+@app.route('/api/admin/simulate', methods=['POST'])
+@login_required
+@admin_required
+def api_admin_simulate():
+    """Replay historical earnings under alternative pay rates"""
+    try:
+        data = request.get_json() or {}
+        days = min(max(int(data.get('days', 90)), 1), 730)
+        
+        from earnings_simulator import run_simulation
+        
+        baseline = {
+            'visit_pay_rate': VISIT_PAY_RATE,
+            'chat_pay_rate': CHAT_PAY_RATE,
+            'referral_bonus': REFERRAL_BONUS,
+            'admin_share': ADMIN_SHARE
+        }
+        result = run_simulation(
+            db.engine, baseline,
+            configs=data.get('configs'),
+            grid=data.get('grid'),
+            days=days,
+            include_daily=bool(data.get('include_daily'))
+        )
+        return jsonify({'success': True, 'simulation': result})
+        
+    except (ValueError, TypeError, KeyError) as e:
+        return jsonify({'success': False, 'message': f'Invalid simulation request: {e}'}), 400
+    except Exception as e:
+        log("admin", "ERROR", f"Simulation API error: {e}")
+        return jsonify({'success': False, 'message': 'Simulation failed'})
+
+@app.route('/api/admin/chat-analytics', methods=['GET'])
+@login_required
+@admin_required
+def api_admin_chat_analytics():
+    """Get per-model chat usage counters"""
+    try:
+        rows = db.session.query(
+            ChatEvent.model_code,
+            db.func.count(ChatEvent.id),
+            db.func.avg(ChatEvent.latency_ms),
+            db.func.sum(ChatEvent.cost)
+        ).group_by(ChatEvent.model_code).all()
+        
+        return jsonify({
+            'success': True,
+            'live': chat_analytics.get_stats(),
+            'totals': [{
+                'model': MODEL_NAMES.get(code, 'other'),
+                'chats': chats,
+                'avg_latency_ms': round(float(latency or 0), 1),
+                'total_cost': round(float(cost or 0), 2)
+            } for code, chats, latency, cost in rows]
+        })
+    except Exception as e:
+        log("admin", "ERROR", f"Chat analytics API error: {e}")
+        return jsonify({'success': False, 'message': 'Failed to get chat analytics'})
+
+@app.route('/api/admin/db-profile', methods=['GET'])
+@login_required
+@admin_required
+def api_admin_db_profile():
+    """Get per-endpoint query counts, database time and N+1 suspects"""
+    try:
+        return jsonify({'success': True, 'profile': query_profiler.get_stats()})
+    except Exception as e:
+        log("admin", "ERROR", f"DB profile API error: {e}")
+        return jsonify({'success': False, 'message': 'Failed to get query profile'})
+
+@app.route('/api/admin/db-profile/reset', methods=['POST'])
+@login_required
+@admin_required
+def api_admin_db_profile_reset():
+    """Clear the query profile counters"""
+    query_profiler.reset()
+    return jsonify({'success': True, 'message': 'Query profile reset'})
+
+@app.route('/api/admin/slow-queries', methods=['GET'])
+@login_required
+@admin_required
+def api_admin_slow_queries():
+    """Get recent slow statements with their query plans"""
+    try:
+        limit = min(request.args.get('limit', 100, type=int), 500)
+        full_scan_only = request.args.get('full_scan') == '1'
+        return jsonify({
+            'success': True,
+            'stats': slow_query_log.get_stats(),
+            'queries': slow_query_log.get_entries(limit, full_scan_only)
+        })
+    except Exception as e:
+        log("admin", "ERROR", f"Slow queries API error: {e}")
+        return jsonify({'success': False, 'message': 'Failed to get slow queries'})
+
+@app.route('/api/admin/slow-queries/clear', methods=['POST'])
+@login_required
+@admin_required
+def api_admin_slow_queries_clear():
+    """Empty the slow query log and its plan cache"""
+    slow_query_log.clear()
+    return jsonify({'success': True, 'message': 'Slow query log cleared'})
+
+@app.route('/api/admin/retention', methods=['GET'])
+@login_required
+@admin_required
+def api_admin_retention():
+    """Get retention policy, last run and archive files"""
+    try:
+        with db.engine.connect() as connection:
+            pending = {
+                table.name: [
+                    {'month': f"{start:%Y-%m}", 'rows': rows}
+                    for start, _, rows in retention_manager.expired_partitions(connection, table)
+                ] for table in RETENTION_TABLES
+            }
+        return jsonify({
+            'success': True,
+            'retention': retention_manager.get_stats(),
+            'pending': pending
+        })
+    except Exception as e:
+        log("admin", "ERROR", f"Retention API error: {e}")
+        return jsonify({'success': False, 'message': 'Failed to get retention status'})
+
+@app.route('/api/admin/retention/run', methods=['POST'])
+@login_required
+@admin_required
+def api_admin_retention_run():
+    """Archive expired partitions now"""
+    try:
+        data = request.get_json(silent=True) or {}
+        result = retention_manager.run(db.engine, RETENTION_TABLES, dry_run=bool(data.get('dry_run')))
+        if 'skipped' in result:
+            return jsonify({'success': False, 'message': result['skipped']}), 409
+        log("admin", "INFO", f"Retention run by {session.get('username')}", result)
+        return jsonify({'success': True, 'result': result})
+    except Exception as e:
+        log("admin", "ERROR", f"Retention run error: {e}")
+        return jsonify({'success': False, 'message': 'Retention run failed'})
+
 @app.route('/api/admin/bot/<action>', methods=['POST'])
 @login_required
 def api_admin_bot(action):
     """Control Telegram bot"""
-    user = User.query.get(session['user_id'])
+    user = get_current_user()
     if not user or user.role != 'admin':
         return jsonify({'success': False, 'message': 'Admin access required'})
     
@@ -2188,18 +3654,96 @@ def create_withdrawal():
         log("payment", "ERROR", f"Withdrawal creation error: {e}")
         return jsonify({'success': False, 'message': 'Withdrawal request failed'})
 
+def transaction_history_sources():
+    """(rank, model, read model, serializer) for each ledger merged into the history"""
+    return [
+        (0, Transaction, TRANSACTION_ROW, lambda t: {
+            'id': t.payment_id or f"T{t.id}",
+            'type': t.transaction_type,
+            'amount': float(t.amount),
+            'status': t.status,
+            'purpose': 'earning',
+            'date': t.created_at.isoformat(),
+            'description': t.description
+        }),
+        (1, PaymentOrder, PAYMENT_ORDER_ROW, lambda p: {
+            'id': p.order_id,
+            'type': 'payment',
+            'amount': float(p.amount),
+            'status': p.status,
+            'purpose': p.purpose,
+            'date': p.created_at.isoformat(),
+            'description': f"Payment: {p.purpose}"
+        }),
+        (2, WithdrawalRequest, WITHDRAWAL_ROW, lambda w: {
+            'id': w.transfer_id or f"W{w.id}",
+            'type': 'withdrawal',
+            'amount': float(w.amount),
+            'status': w.status,
+            'purpose': 'withdrawal',
+            'date': w.created_at.isoformat(),
+            'description': f"Withdrawal: ₹{w.amount}"
+        })
+    ]
+
+def transaction_history_page(user_id, limit, cursor=None):
+    """Newest-first page of a user's transactions, payments and withdrawals.
+    
+    Each ledger is read with its own keyset query on (created_at, id); the
+    cursor is the (created_at, rank, id) of the last item returned, so the
+    merged order is total even when two ledgers share a timestamp.
+    """
+    position = decode_history_cursor(cursor)
+    candidates = []
+    for rank, model, read_model, serialize in transaction_history_sources():
+        query = read_model.select().where(model.user_id == user_id)
+        if position is not None:
+            created_at, last_rank, last_id = position
+            # Same timestamp: lower-ranked ledgers come after, higher-ranked ones before
+            if rank == last_rank:
+                tie = model.id < last_id
+            else:
+                tie = db.true() if rank < last_rank else db.false()
+            query = query.where(db.or_(
+                model.created_at < created_at,
+                db.and_(model.created_at == created_at, tie)
+            ))
+        rows = read_model.all(db.session, query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1))
+        candidates.extend((row.created_at, rank, row.id, serialize(row)) for row in rows)
+    
+    candidates.sort(key=lambda c: (c[0], c[1], c[2]), reverse=True)
+    page = candidates[:limit]
+    next_cursor = None
+    if len(candidates) > limit:
+        created_at, rank, row_id, _ = page[-1]
+        next_cursor = encode_cursor([created_at, rank, row_id])
+    return [c[3] for c in page], next_cursor
+
+def decode_history_cursor(cursor):
+    values = decode_cursor(cursor, 3)
+    if values is not None and not isinstance(values[0], datetime):
+        raise InvalidCursor("Malformed cursor")
+    return values
+
 @app.route('/api/transactions')
 @login_required
 def get_transactions():
-    """Get user transaction history"""
+    """Get user transaction history (keyset paginated, newest first)"""
     try:
-        limit = int(request.args.get('limit', 50))
-        
-        from cashfree_integration import get_transaction_history
-        
-        history = get_transaction_history(session['user_id'], limit)
-        return jsonify({'success': True, 'transactions': history})
+        history, next_cursor = transaction_history_page(
+            session['user_id'],
+            page_size(request.args.get('limit'), maximum=100),
+            request.args.get('cursor')
+        )
+        return jsonify({
+            'success': True,
+            'transactions': history,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        })
         
+    except InvalidCursor as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         log("payment", "ERROR", f"Transaction history error: {e}")
         return jsonify({'success': False, 'message': 'Failed to get transactions'})
@@ -2240,7 +3784,7 @@ if __name__ == '__main__':
             migrate_database()
             
             # Create admin user if not exists
-            admin_user = User.query.filter_by(username=ADMIN_USER).first()
+            admin_user = user_by_username(ADMIN_USER)
             if not admin_user:
                 admin_user = User(
                     username=ADMIN_USER,
@@ -0,0 +1,80 @@
+"""
+Ganesh AI - Versioned Schema Migrations
+Numbered migration steps with the applied version recorded in the database
+"""
+
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import (
+    Column, DateTime, Integer, MetaData, String, Table, func, insert, select
+)
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+version_metadata = MetaData()
+
+schema_version = Table(
+    'schema_version', version_metadata,
+    Column('version', Integer, primary_key=True),
+    Column('description', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False)
+)
+
+
+class MigrationEngine:
+    """Applies registered migrations in order, each in its own transaction.
+
+    The highest applied version is stored in ``schema_version``; when it
+    matches the latest registered step, ``run`` returns after a single
+    query without inspecting the schema.
+    """
+
+    def __init__(self, log: Optional[Callable] = None):
+        self.log = log or (lambda section, level, message, extra=None: None)
+        self._steps: Dict[int, tuple] = {}
+
+    def migration(self, version: int, description: str):
+        """Decorator registering ``fn(connection)`` as migration ``version``"""
+        def register(fn):
+            if version in self._steps:
+                raise ValueError(f"Duplicate migration version {version}")
+            self._steps[version] = (description, fn)
+            return fn
+        return register
+
+    @property
+    def latest(self) -> int:
+        return max(self._steps) if self._steps else 0
+
+    def current_version(self, engine) -> Optional[int]:
+        """Applied schema version, or ``None`` before versioning was introduced"""
+        try:
+            with engine.connect() as connection:
+                return connection.execute(select(func.max(schema_version.c.version))).scalar()
+        except (OperationalError, ProgrammingError):
+            return None
+
+    def pending(self, engine) -> List[int]:
+        current = self.current_version(engine) or 0
+        return sorted(v for v in self._steps if v > current)
+
+    def run(self, engine) -> int:
+        """Apply pending migrations and return the resulting schema version"""
+        current = self.current_version(engine)
+        if current == self.latest:
+            self.log("database", "INFO", f"Database schema is up to date (version {current})")
+            return current
+
+        version_metadata.create_all(engine, checkfirst=True)
+        for version in self.pending(engine):
+            description, fn = self._steps[version]
+            with engine.begin() as connection:
+                fn(connection)
+                connection.execute(insert(schema_version).values(
+                    version=version,
+                    description=description,
+                    applied_at=datetime.utcnow()
+                ))
+            self.log("database", "INFO", f"Applied migration {version}: {description}")
+
+        return self.latest
@@ -0,0 +1,199 @@
+"""
+Ganesh AI - Keyset Pagination
+Cursor-based paging and streamed CSV/JSON/NDJSON exports for large listings
+
+A listing is ordered by one or more sort keys ending in a unique column
+(normally ``id``). The cursor carries the sort-key values of the last row
+returned, and the next page starts strictly after them, so every page is
+an index range scan instead of an ever-growing OFFSET.
+"""
+
+import io
+import csv
+import json
+import zlib
+import base64
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+EXPORT_CHUNK_SIZE = 1000
+
+# (sort expression, descending)
+SortKey = Tuple[object, bool]
+
+
+class InvalidCursor(ValueError):
+    """Raised for cursors that were not produced by ``encode_cursor``"""
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and 'dt' in value:
+        return datetime.fromisoformat(value['dt'])
+    return value
+
+
+def encode_cursor(values: Sequence) -> str:
+    payload = json.dumps([_encode_value(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token: Optional[str], size: int) -> Optional[List]:
+    """Sort-key values from ``token``, or ``None`` for the first page"""
+    if not token:
+        return None
+    try:
+        payload = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = [_decode_value(v) for v in json.loads(payload)]
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Malformed cursor: {e}")
+    if len(values) != size:
+        raise InvalidCursor("Cursor does not match the requested sort order")
+    return values
+
+
+def page_size(value, default: int = DEFAULT_PAGE_SIZE, maximum: int = MAX_PAGE_SIZE) -> int:
+    """Clamp a client-supplied ``limit``"""
+    try:
+        return max(1, min(int(value), maximum))
+    except (TypeError, ValueError):
+        return default
+
+
+def after_cursor(keys: Sequence[SortKey], values: Sequence):
+    """WHERE clause selecting rows strictly after ``values`` in ``keys`` order.
+
+    Expands to ``k0 > v0 OR (k0 = v0 AND k1 > v1) OR ...`` (``<`` for
+    descending keys), which works on every backend and with mixed
+    directions.
+    """
+    clauses = []
+    for i, (expression, descending) in enumerate(keys):
+        equal = [keys[j][0] == values[j] for j in range(i)]
+        beyond = expression < values[i] if descending else expression > values[i]
+        clauses.append(and_(*equal, beyond))
+    return or_(*clauses)
+
+
+def order_by(keys: Sequence[SortKey]) -> List:
+    return [expression.desc() if descending else expression.asc() for expression, descending in keys]
+
+
+def keyset_page(query, keys: Sequence[SortKey], limit: int,
+                cursor: Optional[str] = None) -> Tuple[List, Optional[str]]:
+    """One page of an ORM ``query`` plus the cursor for the next page.
+
+    The sort-key values are selected alongside each row so the cursor can
+    be built from computed expressions (e.g. ``coalesce``) as well as
+    plain columns.
+    """
+    values = decode_cursor(cursor, len(keys))
+    query = query.add_columns(*[expression.label(f"_sort_{i}") for i, (expression, _) in enumerate(keys)])
+    if values is not None:
+        query = query.filter(after_cursor(keys, values))
+    rows = query.order_by(*order_by(keys)).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][-len(keys):])
+    return [row[0] for row in rows], next_cursor
+
+
+def keyset_select_page(session, statement, keys: Sequence[SortKey], limit: int,
+                       cursor: Optional[str] = None,
+                       row_factory: Callable = tuple) -> Tuple[List, Optional[str]]:
+    """``keyset_page`` for a Core ``select``, e.g. a read model projection.
+
+    ``row_factory`` receives each result row with the sort keys still
+    appended (``ReadModel.row`` drops them).
+    """
+    values = decode_cursor(cursor, len(keys))
+    statement = statement.add_columns(*[expression.label(f"_sort_{i}") for i, (expression, _) in enumerate(keys)])
+    if values is not None:
+        statement = statement.where(after_cursor(keys, values))
+    rows = session.execute(statement.order_by(*order_by(keys)).limit(limit + 1)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][-len(keys):])
+    return [row_factory(row) for row in rows], next_cursor
+
+
+def iter_keyset(query, keys: Sequence[SortKey], chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator:
+    """Every row of ``query`` in ``keys`` order, fetched one keyset page at a time"""
+    cursor = None
+    while True:
+        rows, cursor = keyset_page(query, keys, chunk_size, cursor)
+        yield from rows
+        if cursor is None:
+            return
+
+
+def iter_keyset_select(session, statement, keys: Sequence[SortKey], chunk_size: int = EXPORT_CHUNK_SIZE,
+                       row_factory: Callable = tuple) -> Iterator:
+    """``iter_keyset`` for a Core ``select``"""
+    cursor = None
+    while True:
+        rows, cursor = keyset_select_page(session, statement, keys, chunk_size, cursor, row_factory)
+        yield from rows
+        if cursor is None:
+            return
+
+
+def stream_ndjson(items: Iterable, serialize: Callable[[object], Dict]) -> Iterator[str]:
+    for item in items:
+        yield json.dumps(serialize(item), default=str) + '\n'
+
+
+def stream_json_array(items: Iterable, serialize: Callable[[object], Dict]) -> Iterator[str]:
+    """A JSON array emitted element by element"""
+    yield '['
+    first = True
+    for item in items:
+        yield ('' if first else ',') + json.dumps(serialize(item), default=str)
+        first = False
+    yield ']'
+
+
+def _csv_value(value):
+    # Leading = + - @ would be evaluated as a formula when opened in a spreadsheet
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@'):
+        return "'" + value
+    return value
+
+
+def stream_csv(items: Iterable, serialize: Callable[[object], Dict], fields: Sequence[str],
+               chunk_rows: int = EXPORT_CHUNK_SIZE) -> Iterator[str]:
+    """CSV with a header row, emitted ``chunk_rows`` rows at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for count, item in enumerate(items, 1):
+        row = serialize(item)
+        writer.writerow([_csv_value(row.get(field)) for field in fields])
+        if count % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def gzip_stream(chunks: Iterable[str], level: int = 6) -> Iterator[bytes]:
+    """Gzip a text stream on the fly; compressed bytes go out as soon as deflate emits them"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,148 @@
+"""
+Ganesh AI - Presence Tracker
+Who is online now, and how many users were active in the last hour or day,
+kept in memory from authenticated requests and Telegram messages
+
+Every user is filed under the minute they were last seen. Each window
+(5 minutes, 1 hour, 24 hours) keeps a running count of the users whose
+last-seen minute falls inside it: a touch moves one user between minute
+buckets, and as the clock advances the buckets sliding out of a window are
+subtracted from its count. Reads are O(1) and nothing is written to the
+database. Counts cover the requests served by this process.
+"""
+
+import os
+import time
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+
+from timeseries import minute_of
+
+# Window name -> width in minutes
+WINDOWS = {'online': 5, 'hour': 60, 'day': 1440}
+
+
+class PresenceTracker:
+    """Sliding-window active-user counts over per-minute buckets of user ids"""
+
+    def __init__(self, windows: Dict[str, int] = WINDOWS, log: Optional[Callable] = None):
+        self.windows = dict(windows)
+        self.horizon = max(self.windows.values())
+        self.log = log or (lambda section, level, message, extra=None: None)
+        self._last_seen: Dict[int, int] = {}
+        self._buckets: Dict[int, Set[int]] = {}
+        self._totals = {name: 0 for name in self.windows}
+        self._head: Optional[int] = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.touches = 0
+
+    def _advance(self, minute: int):
+        """Move the clock to ``minute``, expiring buckets that left each window"""
+        head = self._head
+        if head is None or minute <= head:
+            if head is None:
+                self._head = minute
+            return
+        if minute - head >= self.horizon:
+            self._last_seen.clear()
+            self._buckets.clear()
+            self._totals = {name: 0 for name in self.windows}
+        else:
+            for name, width in self.windows.items():
+                # Minutes (head - width, minute - width] leave the window; none after head have users
+                for expired in range(head - width + 1, min(minute - width, head) + 1):
+                    bucket = self._buckets.get(expired)
+                    if bucket:
+                        self._totals[name] -= len(bucket)
+            for expired in range(head - self.horizon + 1, minute - self.horizon + 1):
+                for user_id in self._buckets.pop(expired, ()):
+                    del self._last_seen[user_id]
+        self._head = minute
+
+    def _touch(self, user_id: int, minute: int):
+        previous = self._last_seen.get(user_id)
+        if previous is not None and previous >= minute:
+            return
+        if minute <= self._head - self.horizon:
+            return
+        if previous is not None:
+            self._buckets[previous].discard(user_id)
+        self._buckets.setdefault(minute, set()).add(user_id)
+        self._last_seen[user_id] = minute
+        for name, width in self.windows.items():
+            start = self._head - width
+            # The new minute is later than the previous one, so only entering a window counts
+            if minute > start and (previous is None or previous <= start):
+                self._totals[name] += 1
+
+    def touch(self, user_id: int, when: Optional[datetime] = None):
+        """Mark ``user_id`` as seen now (or at ``when``, naive UTC)"""
+        minute = minute_of(when) if when else int(time.time() // 60)
+        with self._lock:
+            self._advance(minute)
+            self._touch(user_id, minute)
+            self.touches += 1
+
+    def seed(self, seen: Iterable[Tuple[int, datetime]]):
+        """Mark ``(user_id, last_seen)`` pairs, e.g. from the database at startup"""
+        with self._lock:
+            self._advance(int(time.time() // 60))
+            for user_id, when in seen:
+                if when:
+                    # Clock skew must not file anyone ahead of the clock
+                    self._touch(user_id, min(minute_of(when), self._head))
+
+    def count(self, window: str) -> int:
+        """Users seen in the last ``window``"""
+        with self._lock:
+            self._advance(int(time.time() // 60))
+            return self._totals[window]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            self._advance(int(time.time() // 60))
+            return dict(self._totals)
+
+    def is_online(self, user_id: int) -> bool:
+        with self._lock:
+            self._advance(int(time.time() // 60))
+            last_seen = self._last_seen.get(user_id)
+            return last_seen is not None and last_seen > self._head - self.windows['online']
+
+    def start(self, read: Callable[[datetime], Iterable[Tuple[int, datetime]]]):
+        """Seed the windows in the background from ``read(since)``, once per process"""
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is not None:
+                return
+
+            def load():
+                try:
+                    self.seed(read(datetime.utcnow() - timedelta(minutes=self.horizon)))
+                except Exception as e:
+                    self.log("presence", "ERROR", f"Seeding presence failed: {e}")
+
+            self._thread = threading.Thread(target=load, name="presence", daemon=True)
+            self._thread.start()
+
+    def get_stats(self) -> Dict:
+        counts = self.counts()
+        return {
+            'counts': counts,
+            'windows_minutes': self.windows,
+            'tracked_users': len(self._last_seen),
+            'buckets': len(self._buckets),
+            'touches': self.touches
+        }
+
+
+# Global presence tracker instance
+presence = PresenceTracker({
+    'online': int(os.getenv("PRESENCE_ONLINE_MINUTES", "5")),
+    'hour': 60,
+    'day': 1440
+})
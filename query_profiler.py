@@ -0,0 +1,182 @@
+"""
+Ganesh AI - Query Profiler
+Counts SQL statements and database time per request and flags N+1 patterns
+"""
+
+import os
+import re
+import time
+import threading
+import contextvars
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import event
+
+# Bound-parameter lists from expanded IN clauses vary in length; fold them
+# so "IN (?, ?)" and "IN (?, ?, ?)" count as the same statement shape
+_PARAM_LIST = re.compile(r"\((?:\s*(?:\?|%\(\w+\)s|:\w+)\s*,)+\s*(?:\?|%\(\w+\)s|:\w+)\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    shape = _WHITESPACE.sub(' ', statement).strip()
+    return _PARAM_LIST.sub('(?...)', shape)
+
+
+class RequestQueries:
+    """Statements executed while serving one request"""
+
+    __slots__ = ('count', 'seconds', 'shapes')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+
+    @property
+    def db_ms(self) -> float:
+        return round(self.seconds * 1000, 2)
+
+
+class QueryProfiler:
+    """SQLAlchemy cursor hooks feeding per-request and per-endpoint counters.
+
+    ``begin``/``end`` bracket a request; statements run outside a request
+    (background threads, CLI tools) are not attributed to any endpoint.
+    A statement shape repeated ``n_plus_one_threshold`` times or more in
+    one request is reported as an N+1 suspect.
+    """
+
+    def __init__(self, n_plus_one_threshold: int = 5, max_endpoints: int = 200,
+                 max_suspects: int = 100, log: Optional[Callable] = None):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.max_endpoints = max_endpoints
+        self.max_suspects = max_suspects
+        self.log = log or (lambda section, level, message, extra=None: None)
+        self._current = contextvars.ContextVar('request_queries', default=None)
+        self._lock = threading.Lock()
+        self._endpoints = OrderedDict()
+        self._suspects = OrderedDict()
+        self._installed = set()
+
+    def install(self, engine):
+        """Attach the cursor hooks to ``engine`` (once per engine)"""
+        if id(engine) in self._installed:
+            return
+        self._installed.add(id(engine))
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self._current.get() is not None:
+            context._profiler_started = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        queries = self._current.get()
+        if queries is None:
+            return
+        started = getattr(context, '_profiler_started', None)
+        if started is not None:
+            queries.seconds += time.perf_counter() - started
+        queries.count += 1
+        queries.shapes[statement] += 1
+
+    def begin(self) -> RequestQueries:
+        queries = RequestQueries()
+        self._current.set(queries)
+        return queries
+
+    def current(self) -> Optional[RequestQueries]:
+        return self._current.get()
+
+    def end(self, endpoint: Optional[str]) -> Optional[RequestQueries]:
+        """Close the current request and fold it into the endpoint counters"""
+        queries = self._current.get()
+        if queries is None:
+            return None
+        self._current.set(None)
+        endpoint = endpoint or 'unknown'
+
+        repeated = [(statement_shape(s), n) for s, n in queries.shapes.items()
+                    if n >= self.n_plus_one_threshold]
+
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                if len(self._endpoints) >= self.max_endpoints:
+                    self._endpoints.popitem(last=False)
+                stats = self._endpoints[endpoint] = {
+                    'requests': 0, 'queries': 0, 'db_seconds': 0.0,
+                    'max_queries': 0, 'n_plus_one_requests': 0
+                }
+            stats['requests'] += 1
+            stats['queries'] += queries.count
+            stats['db_seconds'] += queries.seconds
+            stats['max_queries'] = max(stats['max_queries'], queries.count)
+            if repeated:
+                stats['n_plus_one_requests'] += 1
+
+            new_suspects = []
+            for shape, repeats in repeated:
+                key = (endpoint, shape)
+                suspect = self._suspects.get(key)
+                if suspect is None:
+                    if len(self._suspects) >= self.max_suspects:
+                        self._suspects.popitem(last=False)
+                    suspect = self._suspects[key] = {
+                        'endpoint': endpoint, 'statement': shape[:500],
+                        'occurrences': 0, 'max_repeats': 0
+                    }
+                    new_suspects.append(suspect)
+                suspect['occurrences'] += 1
+                suspect['max_repeats'] = max(suspect['max_repeats'], repeats)
+                suspect['last_seen'] = time.time()
+
+        for suspect in new_suspects:
+            self.log("database", "WARNING", f"Possible N+1 query in {endpoint}",
+                     {'statement': suspect['statement'][:200], 'repeats': suspect['max_repeats']})
+        return queries
+
+    def get_endpoint_stats(self, limit: int = 50) -> List[Dict]:
+        """Endpoints ordered by total database time"""
+        with self._lock:
+            snapshot = [(name, dict(stats)) for name, stats in self._endpoints.items()]
+        rows = []
+        for name, stats in snapshot:
+            requests = stats['requests']
+            rows.append({
+                'endpoint': name,
+                'requests': requests,
+                'avg_queries': round(stats['queries'] / requests, 1),
+                'max_queries': stats['max_queries'],
+                'avg_db_ms': round(stats['db_seconds'] * 1000 / requests, 2),
+                'total_db_ms': round(stats['db_seconds'] * 1000, 1),
+                'n_plus_one_requests': stats['n_plus_one_requests']
+            })
+        rows.sort(key=lambda row: row['total_db_ms'], reverse=True)
+        return rows[:limit]
+
+    def get_suspects(self) -> List[Dict]:
+        with self._lock:
+            suspects = [dict(s) for s in self._suspects.values()]
+        suspects.sort(key=lambda s: s['occurrences'], reverse=True)
+        return suspects
+
+    def get_stats(self) -> Dict:
+        return {
+            'n_plus_one_threshold': self.n_plus_one_threshold,
+            'endpoints': self.get_endpoint_stats(),
+            'n_plus_one': self.get_suspects()
+        }
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self._suspects.clear()
+
+
+# Global query profiler instance
+query_profiler = QueryProfiler(
+    n_plus_one_threshold=int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+)
@@ -0,0 +1,244 @@
+"""
+Ganesh AI - Tiered Token-Bucket Rate Limiter
+Per-user and per-IP request limits for API and earning routes
+"""
+
+import os
+import json
+import math
+import time
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Default limits per route endpoint and tier as (tokens per second, burst).
+# ``None`` means the tier is not limited on that route. The ``ip`` tier is
+# applied to every request from an address, logged in or not.
+DEFAULT_RATE_LIMITS = {
+    'index': {
+        'free': (0.5, 10),
+        'premium': (1.0, 20),
+        'admin': None,
+        'ip': (1.0, 30),
+    },
+    'dashboard': {
+        'free': (0.5, 10),
+        'premium': (1.0, 20),
+        'admin': None,
+        'ip': (1.0, 30),
+    },
+    'api_chat': {
+        'free': (0.2, 5),
+        'premium': (1.0, 20),
+        'admin': None,
+        'ip': (0.5, 15),
+    },
+    'login': {
+        'free': (0.1, 5),
+        'premium': (0.1, 5),
+        'admin': (0.1, 5),
+        'ip': (0.2, 10),
+    },
+}
+
+
+class TokenBucketTable:
+    """Sharded in-memory table of token buckets keyed by client id"""
+
+    def __init__(self, shards: int = 16, sweep_interval: float = 60.0):
+        self.shards = shards
+        self.sweep_interval = sweep_interval
+        # Each bucket is a (tokens, updated_at, full_at) tuple. ``full_at`` is
+        # when the bucket refills completely, so sweeping never needs the rate.
+        self._tables = [{} for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self._last_sweep = [time.monotonic()] * shards
+
+    def consume(self, key: str, rate: float, burst: int,
+                now: Optional[float] = None) -> Tuple[bool, int, float]:
+        """Take one token from ``key``'s bucket.
+
+        Returns ``(allowed, remaining, retry_after_seconds)``.
+        """
+        now = time.monotonic() if now is None else now
+        index = hash(key) % self.shards
+        table = self._tables[index]
+
+        with self._locks[index]:
+            bucket = table.get(key)
+            if bucket is None:
+                tokens = float(burst)
+            else:
+                tokens = min(float(burst), bucket[0] + (now - bucket[1]) * rate)
+
+            if tokens >= 1.0:
+                tokens -= 1.0
+                allowed, retry_after = True, 0.0
+            else:
+                allowed, retry_after = False, (1.0 - tokens) / rate
+
+            table[key] = (tokens, now, now + (burst - tokens) / rate)
+
+            if now - self._last_sweep[index] >= self.sweep_interval:
+                self._sweep_shard(index, now)
+
+        return allowed, int(tokens), retry_after
+
+    def consume_all(self, limits: Sequence[Tuple[str, float, int]],
+                    now: Optional[float] = None) -> Tuple[Optional[int], float]:
+        """Take one token from every ``(key, rate, burst)`` bucket, or from none.
+
+        Returns ``(denied, retry_after_seconds)``, where ``denied`` is the
+        index of the first limit without a token (``None`` when all had one).
+        A request refused by one bucket does not spend the others' tokens.
+        """
+        now = time.monotonic() if now is None else now
+        indexes = [hash(key) % self.shards for key, _, _ in limits]
+        # Shard locks are always taken in index order, so two callers never wait on each other
+        locks = [self._locks[index] for index in sorted(set(indexes))]
+        for lock in locks:
+            lock.acquire()
+        try:
+            levels: List[float] = []
+            for (key, rate, burst), index in zip(limits, indexes):
+                bucket = self._tables[index].get(key)
+                if bucket is None:
+                    levels.append(float(burst))
+                else:
+                    levels.append(min(float(burst), bucket[0] + (now - bucket[1]) * rate))
+
+            denied, retry_after = None, 0.0
+            for position, tokens in enumerate(levels):
+                if tokens < 1.0:
+                    denied, retry_after = position, (1.0 - tokens) / limits[position][1]
+                    break
+
+            for (key, rate, burst), index, tokens in zip(limits, indexes, levels):
+                if denied is None:
+                    tokens -= 1.0
+                self._tables[index][key] = (tokens, now, now + (burst - tokens) / rate)
+            for index in set(indexes):
+                if now - self._last_sweep[index] >= self.sweep_interval:
+                    self._sweep_shard(index, now)
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+        return denied, retry_after
+
+    def _sweep_shard(self, index: int, now: float):
+        """Drop buckets that have refilled completely (caller holds the lock)"""
+        table = self._tables[index]
+        for key in [k for k, bucket in table.items() if bucket[2] <= now]:
+            del table[key]
+        self._last_sweep[index] = now
+
+    def sweep(self):
+        """Clean up idle buckets in every shard"""
+        now = time.monotonic()
+        for index in range(self.shards):
+            with self._locks[index]:
+                self._sweep_shard(index, now)
+
+    def __len__(self):
+        return sum(len(table) for table in self._tables)
+
+
+class RateLimiter:
+    """Route- and tier-aware rate limiter backed by token buckets"""
+
+    def __init__(self):
+        self.enabled = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+        self.rules = self._load_rules(os.getenv("RATE_LIMITS"))
+        self.buckets = TokenBucketTable(
+            shards=int(os.getenv("RATE_LIMIT_SHARDS", "16")),
+            sweep_interval=float(os.getenv("RATE_LIMIT_SWEEP_SECONDS", "60"))
+        )
+        self._counters = Counter()
+        self._counter_lock = threading.Lock()
+
+    @staticmethod
+    def _load_rules(override: Optional[str]) -> Dict:
+        """Merge a JSON ``RATE_LIMITS`` override into the default rules"""
+        rules = {endpoint: dict(tiers) for endpoint, tiers in DEFAULT_RATE_LIMITS.items()}
+        if not override:
+            return rules
+
+        for endpoint, tiers in json.loads(override).items():
+            merged = rules.setdefault(endpoint, {})
+            for tier, limit in tiers.items():
+                merged[tier] = tuple(limit) if limit else None
+        return rules
+
+    def check(self, endpoint: Optional[str], tier: str, user_id: Optional[int],
+              ip_address: Optional[str]) -> Optional[Dict]:
+        """Check a request against its route limits.
+
+        Returns ``None`` when the request may proceed, otherwise a dict with
+        ``retry_after`` (whole seconds), ``limit`` and ``scope``.
+        """
+        if not self.enabled or endpoint not in self.rules:
+            return None
+
+        tiers = self.rules[endpoint]
+        if tier in tiers and tiers[tier] is None:
+            self._count(endpoint, 'exempt')
+            return None
+
+        checks = []
+        if user_id is not None and tiers.get(tier):
+            checks.append(('user', f"{endpoint}:u:{user_id}", tiers[tier]))
+        if ip_address and tiers.get('ip'):
+            checks.append(('ip', f"{endpoint}:ip:{ip_address}", tiers['ip']))
+
+        # All or nothing: a user refused on the IP limit keeps their own tokens, and vice versa
+        denied, retry_after = self.buckets.consume_all([(key, rate, burst) for _, key, (rate, burst) in checks])
+        if denied is not None:
+            scope, _, (_, burst) = checks[denied]
+            self._count(endpoint, 'limited')
+            return {
+                'retry_after': max(1, math.ceil(retry_after)),
+                'limit': burst,
+                'scope': scope
+            }
+
+        self._count(endpoint, 'allowed')
+        return None
+
+    def _count(self, endpoint: str, outcome: str):
+        with self._counter_lock:
+            self._counters[(endpoint, outcome)] += 1
+
+    def get_stats(self) -> Dict:
+        """Per-route allowed/limited/exempt counters and table size"""
+        with self._counter_lock:
+            counters = dict(self._counters)
+
+        routes = {}
+        for (endpoint, outcome), count in counters.items():
+            routes.setdefault(endpoint, {'allowed': 0, 'limited': 0, 'exempt': 0})[outcome] = count
+
+        return {
+            'enabled': self.enabled,
+            'active_buckets': len(self.buckets),
+            'routes': routes,
+            'rules': {
+                endpoint: {tier: list(limit) if limit else None for tier, limit in tiers.items()}
+                for endpoint, tiers in self.rules.items()
+            }
+        }
+
+
+# Global rate limiter instance
+rate_limiter = RateLimiter()
+
+
+# Helper functions for main.py integration
+def check_rate_limit(endpoint: Optional[str], tier: str, user_id: Optional[int],
+                     ip_address: Optional[str]) -> Optional[Dict]:
+    """Check a request against the configured limits"""
+    return rate_limiter.check(endpoint, tier, user_id, ip_address)
+
+
+def get_rate_limit_stats() -> Dict:
+    """Get rate limiter counters"""
+    return rate_limiter.get_stats()
@@ -0,0 +1,46 @@
+"""
+Ganesh AI - Read Models
+Column-projected views for read-heavy endpoints
+
+A read model names the handful of columns an endpoint actually serializes
+and returns them as plain namedtuple rows (``__slots__ = ()``), skipping
+ORM identity-map bookkeeping, change tracking and the wide text columns a
+full entity would load.
+"""
+
+from collections import namedtuple
+from typing import Iterable, List, Optional, Sequence
+
+from sqlalchemy import select
+
+
+class ReadModel:
+    """A named projection: ``ReadModel('UserRow', id=User.id, name=User.username)``.
+
+    ``select()`` starts a Core statement over the projected columns; the
+    caller adds joins, filters and ordering. ``all``/``one_or_none`` run it
+    and build rows, and ``row`` builds one from any result row whose
+    leading columns are the projection (e.g. with sort keys appended).
+    """
+
+    def __init__(self, name: str, **columns):
+        self.name = name
+        self.fields = tuple(columns)
+        self.row_type = namedtuple(name, self.fields)
+        self._columns = [expression.label(field) for field, expression in columns.items()]
+
+    def select(self):
+        return select(*self._columns)
+
+    def row(self, values: Sequence):
+        return self.row_type._make(values[:len(self.fields)])
+
+    def rows(self, result: Iterable) -> List:
+        return [self.row(values) for values in result]
+
+    def all(self, session, statement) -> List:
+        return self.rows(session.execute(statement))
+
+    def one_or_none(self, session, statement) -> Optional[tuple]:
+        values = session.execute(statement.limit(1)).first()
+        return self.row(values) if values is not None else None
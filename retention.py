@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Ganesh AI - Data Retention & Archival
+Rolls old months of high-volume tables out of the live database into
+compressed monthly archive files
+
+Each table is treated as a sequence of calendar-month (UTC) partitions.
+Once a whole month falls outside the table's retention window it is
+streamed to ``<archive_dir>/<table>/<table>-YYYY-MM-<first_id>-<last_id>.ndjson.gz``,
+deleted from the live table in id-ordered batches, and the table is
+re-analyzed (plus VACUUM) so the hot indexes only cover recent months.
+
+Usage: python retention.py [--dry-run] [--list]
+"""
+
+import os
+import sys
+import json
+import gzip
+import time
+import argparse
+import threading
+from datetime import datetime, date
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import Table, and_, delete, func, select, text
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, single worker assumed
+    fcntl = None
+
+# Days of history kept in the live tables; 0 disables archival for a table
+RETENTION_DAYS = {
+    'visits': int(os.getenv("VISIT_RETENTION_DAYS", "90")),
+    'api_usage': int(os.getenv("API_USAGE_RETENTION_DAYS", "30")),
+}
+
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def next_month(value: datetime) -> datetime:
+    if value.month == 12:
+        return datetime(value.year + 1, 1, 1)
+    return datetime(value.year, value.month + 1, 1)
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class RetentionManager:
+    """Archives expired monthly partitions and maintains the live tables.
+
+    Runs are serialized across gunicorn workers with an advisory lock on
+    ``<archive_dir>/.retention.lock``; a worker that cannot take the lock
+    skips the run.
+    """
+
+    def __init__(self, archive_dir: str, retention_days: Optional[Dict[str, int]] = None,
+                 batch_size: int = 5000, log: Optional[Callable] = None):
+        self.archive_dir = archive_dir
+        self.retention_days = dict(retention_days or RETENTION_DAYS)
+        self.batch_size = batch_size
+        self.log = log or (lambda section, level, message, extra=None: None)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.last_run = None
+        self.last_result = None
+        self.runs = 0
+
+    # ---- partitions -------------------------------------------------
+
+    def cutoff(self, table: str, now: Optional[datetime] = None) -> Optional[datetime]:
+        """Start of the oldest month that must stay live, or None if unlimited"""
+        days = self.retention_days.get(table, 0)
+        if days <= 0:
+            return None
+        now = now or datetime.utcnow()
+        # Only whole months roll over, so keep the month containing now - days
+        return month_start(datetime.fromordinal(now.toordinal() - days))
+
+    def expired_partitions(self, connection, table: Table,
+                           now: Optional[datetime] = None) -> List[Tuple[datetime, datetime, int]]:
+        """(start, end, rows) for every month older than the table's cutoff"""
+        cutoff = self.cutoff(table.name, now)
+        if cutoff is None:
+            return []
+        oldest = connection.execute(
+            select(func.min(table.c.created_at)).where(table.c.created_at < cutoff)
+        ).scalar()
+        partitions = []
+        if oldest is None:
+            return partitions
+        start = month_start(oldest)
+        while start < cutoff:
+            end = next_month(start)
+            rows = connection.execute(
+                select(func.count()).select_from(table).where(
+                    and_(table.c.created_at >= start, table.c.created_at < end))
+            ).scalar()
+            if rows:
+                partitions.append((start, end, rows))
+            start = end
+        return partitions
+
+    # ---- archival ---------------------------------------------------
+
+    def _iter_partition(self, engine, table: Table, start: datetime, end: datetime) -> Iterator[List[Dict]]:
+        """Partition rows in id order, ``batch_size`` at a time"""
+        last_id = 0
+        while True:
+            with engine.connect() as connection:
+                rows = connection.execute(
+                    select(table).where(and_(
+                        table.c.created_at >= start,
+                        table.c.created_at < end,
+                        table.c.id > last_id
+                    )).order_by(table.c.id).limit(self.batch_size)
+                ).mappings().all()
+            if not rows:
+                return
+            last_id = rows[-1]['id']
+            yield rows
+
+    def archive_partition(self, engine, table: Table, start: datetime, end: datetime) -> Dict:
+        """Write one month to a gzip NDJSON file, then delete it from the live table.
+
+        The file is named after the id range it holds and is only renamed
+        into place once complete, so an interrupted run leaves either no
+        archive or a full one. Rows are deleted after the rename; if that
+        is interrupted the next run archives the remainder to a new file.
+        """
+        directory = os.path.join(self.archive_dir, table.name)
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = os.path.join(directory, f".{table.name}-{start:%Y-%m}.tmp")
+
+        ids = []
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as archive:
+            for rows in self._iter_partition(engine, table, start, end):
+                for row in rows:
+                    archive.write(json.dumps({k: _json_value(v) for k, v in row.items()}))
+                    archive.write('\n')
+                ids.append((rows[0]['id'], rows[-1]['id'], len(rows)))
+
+        if not ids:
+            os.remove(tmp_path)
+            return {'month': f"{start:%Y-%m}", 'rows': 0, 'file': None}
+
+        first_id, last_id = ids[0][0], ids[-1][1]
+        path = os.path.join(directory, f"{table.name}-{start:%Y-%m}-{first_id}-{last_id}.ndjson.gz")
+        os.replace(tmp_path, path)
+
+        deleted = 0
+        for low, high, _ in ids:
+            with engine.begin() as connection:
+                deleted += connection.execute(delete(table).where(and_(
+                    table.c.id >= low,
+                    table.c.id <= high,
+                    table.c.created_at >= start,
+                    table.c.created_at < end
+                ))).rowcount
+
+        return {
+            'month': f"{start:%Y-%m}",
+            'rows': sum(count for _, _, count in ids),
+            'deleted': deleted,
+            'file': os.path.relpath(path, self.archive_dir),
+            'bytes': os.path.getsize(path)
+        }
+
+    def maintain(self, engine, tables: List[str]):
+        """Refresh planner statistics and reclaim space after a roll-over"""
+        if not tables:
+            return
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            if engine.dialect.name == 'postgresql':
+                for name in tables:
+                    connection.execute(text(f"VACUUM (ANALYZE) {name}"))
+            elif engine.dialect.name == 'sqlite':
+                for name in tables:
+                    connection.execute(text(f"ANALYZE {name}"))
+                # SQLite can only vacuum the whole file; partitions roll over
+                # monthly so the exclusive lock is rare and short-lived
+                connection.execute(text("VACUUM"))
+            else:
+                for name in tables:
+                    connection.execute(text(f"ANALYZE {name}"))
+
+    # ---- runs -------------------------------------------------------
+
+    def _acquire(self):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        handle = open(os.path.join(self.archive_dir, '.retention.lock'), 'w')
+        if fcntl is None:
+            return handle
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return None
+        return handle
+
+    def run(self, engine, tables: List[Table], dry_run: bool = False,
+            now: Optional[datetime] = None) -> Dict:
+        """Archive every expired partition of ``tables``; returns a per-table summary"""
+        lock = self._acquire()
+        if lock is None:
+            return {'skipped': 'another worker is running retention'}
+
+        started = time.perf_counter()
+        result = {'tables': {}, 'dry_run': dry_run}
+        try:
+            rolled = []
+            for table in tables:
+                name = table.name
+                if self.retention_days.get(name, 0) <= 0:
+                    continue
+                with engine.connect() as connection:
+                    partitions = self.expired_partitions(connection, table, now)
+                if dry_run:
+                    result['tables'][name] = [
+                        {'month': f"{start:%Y-%m}", 'rows': rows} for start, _, rows in partitions
+                    ]
+                    continue
+                archived = [self.archive_partition(engine, table, start, end) for start, end, _ in partitions]
+                result['tables'][name] = archived
+                if archived:
+                    rolled.append(name)
+                    self.log("retention", "INFO", f"Archived {len(archived)} partition(s) of {name}",
+                             {'rows': sum(p['rows'] for p in archived)})
+            if not dry_run:
+                self.maintain(engine, rolled)
+        finally:
+            lock.close()
+
+        result['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        if not dry_run:
+            self.last_run = datetime.utcnow().isoformat()
+            self.last_result = result
+            self.runs += 1
+        return result
+
+    def start(self, engine, tables: List[Table], interval_hours: float, initial_delay: float = 600):
+        """Run retention periodically on a daemon thread (idempotent)"""
+        if self._thread is not None or interval_hours <= 0:
+            return
+        with self._start_lock:
+            if self._thread is not None:
+                return
+
+            def loop():
+                time.sleep(initial_delay)
+                while True:
+                    try:
+                        self.run(engine, tables)
+                    except Exception as e:
+                        self.log("retention", "ERROR", f"Retention run failed: {e}")
+                    time.sleep(interval_hours * 3600)
+
+            self._thread = threading.Thread(target=loop, name="retention", daemon=True)
+            self._thread.start()
+
+    def list_archives(self) -> List[Dict]:
+        archives = []
+        for name in sorted(self.retention_days):
+            directory = os.path.join(self.archive_dir, name)
+            if not os.path.isdir(directory):
+                continue
+            for filename in sorted(os.listdir(directory)):
+                if filename.endswith('.ndjson.gz'):
+                    archives.append({
+                        'table': name,
+                        'file': filename,
+                        'bytes': os.path.getsize(os.path.join(directory, filename))
+                    })
+        return archives
+
+    def get_stats(self) -> Dict:
+        return {
+            'retention_days': self.retention_days,
+            'archive_dir': self.archive_dir,
+            'runs': self.runs,
+            'last_run': self.last_run,
+            'last_result': self.last_result,
+            'archives': self.list_archives()
+        }
+
+
+def read_archive(path: str) -> Iterator[Dict]:
+    """Iterate the rows of an archive file"""
+    with gzip.open(path, 'rt', encoding='utf-8') as archive:
+        for line in archive:
+            yield json.loads(line)
+
+
+# Global retention manager instance
+retention_manager = RetentionManager(os.getenv("ARCHIVE_DIR", "archive"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive expired visits/api_usage months")
+    parser.add_argument('--dry-run', action='store_true', help="Only report the partitions that would roll over")
+    parser.add_argument('--list', action='store_true', help="List existing archive files")
+    args = parser.parse_args()
+
+    if args.list:
+        for archive in retention_manager.list_archives():
+            print(f"{archive['table']:<12}{archive['file']:<56}{archive['bytes']:>12}")
+        return
+
+    from main import app, db, Visit, APIUsage
+    with app.app_context():
+        result = retention_manager.run(db.engine, [Visit.__table__, APIUsage.__table__], dry_run=args.dry_run)
+    if 'skipped' in result:
+        print(result['skipped'], file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+Ganesh AI - Metric Rollups
+Hourly, daily, monthly and all-time counters kept up to date as events are
+written, so dashboards read a few rows instead of aggregating history
+
+Each rollup row is ``(period, bucket, metric) -> (value, count)``: ``value``
+sums an amount (revenue, earnings) and ``count`` counts events. Increments
+for one flush are merged in a ``RollupBatch`` and applied with a single
+``INSERT ... ON CONFLICT DO UPDATE`` that adds to the stored totals, so
+concurrent writers never overwrite each other.
+"""
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy import and_, or_, select, update, insert
+
+PERIODS = ('hour', 'day', 'month', 'all')
+
+# Bucket of the single row per metric in the 'all' period
+ALL_TIME = datetime(1970, 1, 1)
+
+
+def bucket_start(period: str, when: datetime) -> datetime:
+    """Start of the ``period`` bucket containing ``when``"""
+    if period == 'hour':
+        return when.replace(minute=0, second=0, microsecond=0)
+    if period == 'day':
+        return when.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == 'month':
+        return when.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    if period == 'all':
+        return ALL_TIME
+    raise ValueError(f"Unknown rollup period: {period}")
+
+
+class RollupBatch:
+    """Increments collected before they are written"""
+
+    __slots__ = ('_deltas',)
+
+    def __init__(self):
+        self._deltas: Dict[Tuple[str, datetime, str], List] = {}
+
+    def add(self, metric: str, when: datetime, value: float = 0.0, count: int = 1,
+            periods: Sequence[str] = PERIODS):
+        for period in periods:
+            key = (period, bucket_start(period, when), metric)
+            delta = self._deltas.get(key)
+            if delta is None:
+                self._deltas[key] = [value, count]
+            else:
+                delta[0] += value
+                delta[1] += count
+
+    def __bool__(self):
+        return bool(self._deltas)
+
+    def __len__(self):
+        return len(self._deltas)
+
+    def totals(self, period: str = 'all') -> Dict[str, Tuple[float, int]]:
+        """``{metric: (value, count)}`` increments for ``period``, summed over its buckets"""
+        totals = {}
+        for (row_period, _, metric), (value, count) in self._deltas.items():
+            if row_period == period:
+                previous = totals.get(metric, (0.0, 0))
+                totals[metric] = (previous[0] + value, previous[1] + count)
+        return totals
+
+    def rows(self) -> List[Dict]:
+        """Non-empty deltas in key order, so concurrent upserts lock rows in the same order"""
+        return [
+            {'period': period, 'bucket': bucket, 'metric': metric, 'value': value, 'count': count}
+            for (period, bucket, metric), (value, count) in sorted(self._deltas.items())
+            if value or count
+        ]
+
+
+def upsert_rollups(connection, table, batch: RollupBatch):
+    """Add ``batch`` to the stored totals in ``table``"""
+    rows = batch.rows()
+    if not rows:
+        return
+
+    dialect = connection.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        statement = dialect_insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.period, table.c.bucket, table.c.metric],
+            set_={
+                'value': table.c.value + statement.excluded.value,
+                'count': table.c.count + statement.excluded.count
+            }
+        )
+        connection.execute(statement, rows)
+        return
+
+    # Other backends: update in place, insert the buckets that did not exist yet
+    for row in rows:
+        result = connection.execute(
+            update(table)
+            .where(table.c.period == row['period'], table.c.bucket == row['bucket'],
+                   table.c.metric == row['metric'])
+            .values(value=table.c.value + row['value'], count=table.c.count + row['count'])
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(table), row)
+
+
+def read_rollups(connection, table, buckets: Iterable[Tuple[str, datetime]],
+                 metrics: Sequence[str]) -> Dict[Tuple[str, str], Tuple[float, int]]:
+    """``{(period, metric): (value, count)}`` for the given ``(period, bucket)`` pairs.
+
+    One primary-key lookup per bucket and metric; missing rows read as zero.
+    """
+    buckets = list(buckets)
+    result = {(period, metric): (0.0, 0) for period, _ in buckets for metric in metrics}
+    rows = connection.execute(
+        select(table.c.period, table.c.metric, table.c.value, table.c.count).where(
+            table.c.metric.in_(metrics),
+            or_(*[and_(table.c.period == period, table.c.bucket == bucket) for period, bucket in buckets])
+        )
+    )
+    for period, metric, value, count in rows:
+        result[(period, metric)] = (value or 0.0, count or 0)
+    return result
+
+
+def read_series(connection, table, period: str, start: datetime, end: datetime,
+                metrics: Sequence[str]) -> Dict[str, List[Dict]]:
+    """Per-bucket ``value``/``count`` for ``metrics`` with buckets in ``[start, end)``"""
+    series = {metric: [] for metric in metrics}
+    rows = connection.execute(
+        select(table.c.bucket, table.c.metric, table.c.value, table.c.count).where(
+            table.c.period == period,
+            table.c.bucket >= bucket_start(period, start),
+            table.c.bucket < end,
+            table.c.metric.in_(metrics)
+        ).order_by(table.c.bucket)
+    )
+    for bucket, metric, value, count in rows:
+        series[metric].append({'bucket': bucket.isoformat(), 'value': value or 0.0, 'count': count or 0})
+    return series
@@ -0,0 +1,195 @@
+"""
+Ganesh AI - Slow Query Log
+Records statements slower than a threshold, with call site and query plan
+"""
+
+import os
+import time
+import threading
+import traceback
+from collections import OrderedDict, deque
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import event
+
+from query_profiler import statement_shape
+
+# Frames from these paths are skipped when locating the calling code
+_LIBRARY_MARKERS = (os.sep + 'sqlalchemy' + os.sep, os.sep + 'flask_sqlalchemy' + os.sep,
+                    os.sep + 'site-packages' + os.sep, os.sep + 'lib' + os.sep + 'python')
+_THIS_FILE = os.path.abspath(__file__)
+
+_EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+
+
+def parameters_shape(parameters, executemany: bool = False):
+    """Parameter types only, so values (emails, hashes) never reach the log"""
+    if executemany and parameters:
+        return {'rows': len(parameters), 'row': parameters_shape(parameters[0])}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return None
+
+
+def call_site() -> Optional[str]:
+    """First application frame on the stack, e.g. ``main.py:2244 in api_admin_stats``"""
+    for frame in reversed(traceback.extract_stack()[:-2]):
+        if frame.filename.startswith('<'):
+            # SQLAlchemy's generated functions report "<string>"
+            continue
+        path = os.path.abspath(frame.filename)
+        if path == _THIS_FILE or any(marker in path for marker in _LIBRARY_MARKERS):
+            continue
+        return f"{os.path.basename(path)}:{frame.lineno} in {frame.name}"
+    return None
+
+
+class SlowQueryLog:
+    """Ring buffer of slow statements with their query plans.
+
+    Each distinct statement shape is explained once, on the connection that
+    ran it, through a raw DB-API cursor so the EXPLAIN itself is neither
+    timed nor re-recorded. Plans that scan a whole table are marked
+    ``full_scan``.
+    """
+
+    def __init__(self, threshold_ms: float = 100, size: int = 200, explain: bool = True,
+                 max_plans: int = 500, log: Optional[Callable] = None):
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self.max_plans = max_plans
+        self.log = log or (lambda section, level, message, extra=None: None)
+        self._entries = deque(maxlen=size)
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+        self._installed = set()
+        self.recorded = 0
+
+    def install(self, engine):
+        """Attach the timing hooks to ``engine`` (once per engine)"""
+        if id(engine) in self._installed:
+            return
+        self._installed.add(id(engine))
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context._slow_query_started = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_slow_query_started', None)
+        if started is None:
+            return
+        duration_ms = (time.perf_counter() - started) * 1000
+        if duration_ms < self.threshold_ms:
+            return
+
+        shape = statement_shape(statement)
+        plan = self._plan_for(cursor, conn.dialect.name, shape, statement, parameters, executemany)
+        self._entries.append({
+            'time': time.time(),
+            'duration_ms': round(duration_ms, 2),
+            'statement': shape[:2000],
+            'parameters': parameters_shape(parameters, executemany),
+            'call_site': call_site(),
+            'plan': plan['lines'] if plan else None,
+            'full_scan': plan['full_scan'] if plan else False
+        })
+        self.recorded += 1
+
+    def _plan_for(self, cursor, dialect: str, shape: str, statement: str, parameters, executemany):
+        with self._lock:
+            if shape in self._plans:
+                self._plans.move_to_end(shape)
+                return self._plans[shape]
+        if not self.explain or not shape.upper().startswith(_EXPLAINABLE):
+            return None
+
+        plan = self.explain_statement(cursor.connection, dialect, statement,
+                                      parameters[0] if executemany and parameters else parameters)
+        with self._lock:
+            self._plans[shape] = plan
+            if len(self._plans) > self.max_plans:
+                self._plans.popitem(last=False)
+        if plan and plan['full_scan']:
+            self.log("database", "WARNING", "Slow query scans a full table",
+                     {'statement': shape[:200], 'plan': plan['lines']})
+        return plan
+
+    @staticmethod
+    def explain_statement(dbapi_connection, dialect: str, statement: str, parameters) -> Optional[Dict]:
+        """Plan for ``statement`` as ``{'lines': [...], 'full_scan': bool}``"""
+        if dialect == 'sqlite':
+            prefix = 'EXPLAIN QUERY PLAN '
+        elif dialect == 'postgresql':
+            prefix = 'EXPLAIN '
+        else:
+            return None
+
+        # The EXPLAIN runs inside the caller's transaction; on PostgreSQL a failure
+        # would abort it, so it is fenced off with a savepoint
+        savepoint = dialect == 'postgresql' and not getattr(dbapi_connection, 'autocommit', False)
+        explain_cursor = dbapi_connection.cursor()
+        try:
+            if savepoint:
+                explain_cursor.execute("SAVEPOINT slow_query_explain")
+            try:
+                explain_cursor.execute(prefix + statement, parameters or ())
+                rows = explain_cursor.fetchall()
+            except Exception as e:
+                if savepoint:
+                    explain_cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+                return {'lines': [f"EXPLAIN failed: {e}"], 'full_scan': False}
+            if savepoint:
+                explain_cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+        finally:
+            explain_cursor.close()
+
+        if dialect == 'sqlite':
+            # (id, parent, notused, detail): indent each step under its parent
+            depth = {0: -1}
+            lines = []
+            for node_id, parent, _, detail in rows:
+                depth[node_id] = depth.get(parent, -1) + 1
+                lines.append('  ' * depth[node_id] + detail)
+            full_scan = any(
+                detail.startswith('SCAN ') and ' USING ' not in detail and detail != 'SCAN CONSTANT ROW'
+                for _, _, _, detail in rows
+            )
+        else:
+            lines = [row[0] for row in rows]
+            full_scan = any('Seq Scan' in line for line in lines)
+        return {'lines': lines, 'full_scan': full_scan}
+
+    def get_entries(self, limit: int = 100, full_scan_only: bool = False) -> List[Dict]:
+        """Most recent slow statements first"""
+        entries = list(self._entries)
+        entries.reverse()
+        if full_scan_only:
+            entries = [entry for entry in entries if entry['full_scan']]
+        return entries[:limit]
+
+    def get_stats(self) -> Dict:
+        entries = list(self._entries)
+        return {
+            'threshold_ms': self.threshold_ms,
+            'recorded': self.recorded,
+            'buffered': len(entries),
+            'full_scans': sum(1 for entry in entries if entry['full_scan']),
+            'distinct_statements': len({entry['statement'] for entry in entries})
+        }
+
+    def clear(self):
+        self._entries.clear()
+        with self._lock:
+            self._plans.clear()
+
+
+# Global slow query log instance
+slow_query_log = SlowQueryLog(
+    threshold_ms=float(os.getenv("SLOW_QUERY_MS", "100")),
+    size=int(os.getenv("SLOW_QUERY_LOG_SIZE", "200")),
+    explain=os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() == "true"
+)
@@ -0,0 +1,187 @@
+"""
+Ganesh AI - Stats Cache
+Process-wide TTL cache for expensive dashboard figures, with
+stale-while-revalidate and single-flight recomputation, and a once-a-day
+holder for nightly reports
+"""
+
+import os
+import time
+import threading
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class _Entry:
+    __slots__ = ('value', 'computed_at', 'expires_at', 'compute_ms', 'lock')
+
+    def __init__(self):
+        self.value = None
+        self.computed_at = None
+        self.expires_at = 0.0
+        self.compute_ms = None
+        self.lock = threading.Lock()
+
+
+class StatsCache:
+    """Named values recomputed at most once per ``ttl`` seconds.
+
+    A fresh value is returned as is. Once it expires (or is invalidated),
+    the first caller recomputes it while concurrent callers keep getting
+    the previous value, for up to ``max_stale`` seconds past expiry. After
+    that, or before the first computation, callers wait for the one
+    computation in progress instead of starting their own. If a
+    recomputation fails while a previous value can still be served, that
+    value is returned and the failure logged.
+    """
+
+    def __init__(self, ttl: float = 30, max_stale: float = 300, log: Optional[Callable] = None):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.log = log or (lambda section, level, message, extra=None: None)
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.computations = 0
+        self.invalidations = 0
+
+    def _entry(self, name: str) -> _Entry:
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                entry = self._entries[name] = _Entry()
+            return entry
+
+    def get(self, name: str, compute: Callable[[], Any]) -> Tuple[Any, Dict]:
+        """``(value, info)`` where ``info`` describes how fresh the value is"""
+        entry = self._entry(name)
+        now = time.time()
+        if entry.computed_at is not None and now < entry.expires_at:
+            self.hits += 1
+            return entry.value, self._info(entry, now, stale=False)
+
+        can_serve_stale = entry.computed_at is not None and now < entry.expires_at + self.max_stale
+        if can_serve_stale and not entry.lock.acquire(blocking=False):
+            # Someone else is already recomputing
+            self.stale_hits += 1
+            return entry.value, self._info(entry, now, stale=True)
+        if not can_serve_stale:
+            entry.lock.acquire()
+
+        try:
+            now = time.time()
+            if entry.computed_at is not None and now < entry.expires_at:
+                # Computed by the caller we waited for
+                self.hits += 1
+                return entry.value, self._info(entry, now, stale=False)
+            started = time.perf_counter()
+            try:
+                value = compute()
+            except Exception as e:
+                if not can_serve_stale:
+                    raise
+                self.log("cache", "ERROR", f"Recomputing {name} failed, serving the previous value: {e}")
+                self.stale_hits += 1
+                return entry.value, self._info(entry, now, stale=True)
+            entry.compute_ms = round((time.perf_counter() - started) * 1000, 2)
+            entry.value = value
+            entry.computed_at = time.time()
+            entry.expires_at = entry.computed_at + self.ttl
+            self.computations += 1
+            return value, self._info(entry, entry.computed_at, stale=False)
+        finally:
+            entry.lock.release()
+
+    @staticmethod
+    def _info(entry: _Entry, now: float, stale: bool) -> Dict:
+        return {
+            'age_seconds': round(now - entry.computed_at, 2),
+            'compute_ms': entry.compute_ms,
+            'stale': stale
+        }
+
+    def invalidate(self, name: Optional[str] = None):
+        """Expire ``name`` (or every entry); the old value is still served while recomputing"""
+        with self._lock:
+            if name is None:
+                entries = list(self._entries.values())
+            else:
+                entries = [self._entries[name]] if name in self._entries else []
+        now = time.time()
+        for entry in entries:
+            # Expire now, so the stale window starts from the invalidation
+            entry.expires_at = min(entry.expires_at, now)
+        self.invalidations += 1
+
+    def get_stats(self) -> Dict:
+        now = time.time()
+        with self._lock:
+            entries = dict(self._entries)
+        return {
+            'ttl_seconds': self.ttl,
+            'max_stale_seconds': self.max_stale,
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'computations': self.computations,
+            'invalidations': self.invalidations,
+            'entries': {
+                name: {
+                    'age_seconds': round(now - entry.computed_at, 2) if entry.computed_at else None,
+                    'compute_ms': entry.compute_ms,
+                    'expired': now >= entry.expires_at
+                }
+                for name, entry in entries.items()
+            }
+        }
+
+
+class DailyValue:
+    """A report computed at most once per UTC day.
+
+    ``get(compute)`` calls ``compute(today)`` for the first request of the
+    day (or on ``refresh``); concurrent callers wait for that one
+    computation. If it fails, the previous day's value is served and the
+    error logged.
+    """
+
+    def __init__(self, name: str, log: Optional[Callable] = None):
+        self.name = name
+        self.log = log or (lambda section, level, message, extra=None: None)
+        self._lock = threading.Lock()
+        self._value = None
+        self._day: Optional[date] = None
+        self.computed_at = None
+        self.compute_ms = None
+
+    def get(self, compute: Callable[[date], Any], refresh: bool = False) -> Tuple[Any, Dict]:
+        """``(value, info)`` for the current UTC day"""
+        today = datetime.utcnow().date()
+        with self._lock:
+            if refresh or self._day != today:
+                started = time.perf_counter()
+                try:
+                    value = compute(today)
+                except Exception as e:
+                    if self._day is None:
+                        raise
+                    self.log("cache", "ERROR", f"Recomputing {self.name} failed, serving the one from {self._day}: {e}")
+                else:
+                    self._value, self._day = value, today
+                    self.computed_at = datetime.utcnow().isoformat()
+                    self.compute_ms = round((time.perf_counter() - started) * 1000, 2)
+            return self._value, self.get_stats()
+
+    def get_stats(self) -> Dict:
+        return {
+            'day': self._day.isoformat() if self._day else None,
+            'computed_at': self.computed_at,
+            'compute_ms': self.compute_ms
+        }
+
+
+# Global stats cache instance
+stats_cache = StatsCache(
+    ttl=float(os.getenv("STATS_CACHE_TTL", "30")),
+    max_stale=float(os.getenv("STATS_CACHE_MAX_STALE", "300"))
+)
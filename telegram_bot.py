@@ -23,7 +23,8 @@ except ImportError:
     print("⚠️ Telegram bot dependencies not available. Bot will be disabled.")
 
 # Database imports
-from main import User, db, app, log, TELEGRAM_TOKEN, APP_NAME, DOMAIN, BUSINESS_NAME
+from main import User, db, app, log, TELEGRAM_TOKEN, APP_NAME, DOMAIN, BUSINESS_NAME, user_by_telegram_id
+from presence import presence
 
 class GaneshAIBot:
     """Complete Telegram Bot System for Ganesh AI"""
@@ -147,7 +148,7 @@ class GaneshAIBot:
             username = telegram_user.username or f"user_{user_id}"
             first_name = telegram_user.first_name or "User"
             
-            user = User.query.filter_by(telegram_id=user_id).first()
+            user = user_by_telegram_id(user_id)
             
             if not user:
                 # Create new user
@@ -167,6 +168,8 @@ class GaneshAIBot:
                 
                 log("telegram", "INFO", f"New user created: {username} (ID: {user_id})")
             
+            # Any message or command counts as being online
+            presence.touch(user.id)
             return user
     
     async def cmd_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
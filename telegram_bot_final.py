@@ -11,10 +11,11 @@ import time
 import random
 import logging
 import asyncio
-import sqlite3
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 
+from bot_store import BotStore
+
 # Bot configuration
 BOT_TOKEN = os.getenv('TELEGRAM_TOKEN', '')
 BOT_USERNAME = 'GaneshAIWorkingBot'
@@ -23,10 +24,25 @@ WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
 # Database file
 DB_FILE = 'telegram_bot_final.db'
 
+# Statements used on every message; kept as constants so each connection's
+# statement cache compiles them once
+SELECT_USER_SQL = 'SELECT * FROM bot_users WHERE user_id = ?'
+INSERT_USER_SQL = '''
+    INSERT OR IGNORE INTO bot_users (user_id, username, first_name, last_name, wallet, total_earned)
+    VALUES (?, ?, ?, ?, 10.0, 10.0)
+'''
+TOUCH_USER_SQL = 'UPDATE bot_users SET last_active = ? WHERE user_id = ?'
+ADD_EARNINGS_SQL = '''
+    UPDATE bot_users
+    SET wallet = wallet + ?, total_earned = total_earned + ?, messages_count = messages_count + 1
+    WHERE user_id = ?
+'''
+INSERT_CHAT_SQL = 'INSERT INTO chat_history (user_id, message, response) VALUES (?, ?, ?)'
+
 class TelegramBotFinal:
     """Complete working Telegram bot system"""
     
-    def __init__(self):
+    def __init__(self, db_file=DB_FILE):
         self.token = BOT_TOKEN
         self.is_running = False
         self.users = {}  # In-memory user storage
@@ -40,6 +56,7 @@ class TelegramBotFinal:
         self.logger = logging.getLogger(__name__)
         
         # Initialize database
+        self.store = BotStore(db_file)
         self.init_database()
         
         # AI responses for instant replies
@@ -66,11 +83,8 @@ class TelegramBotFinal:
     def init_database(self):
         """Initialize SQLite database for bot users"""
         try:
-            conn = sqlite3.connect(DB_FILE)
-            cursor = conn.cursor()
-            
             # Create users table
-            cursor.execute('''
+            self.store.execute('''
                 CREATE TABLE IF NOT EXISTS bot_users (
                     user_id TEXT PRIMARY KEY,
                     username TEXT,
@@ -87,7 +101,7 @@ class TelegramBotFinal:
             ''')
             
             # Create chat history table
-            cursor.execute('''
+            self.store.execute('''
                 CREATE TABLE IF NOT EXISTS chat_history (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     user_id TEXT,
@@ -98,8 +112,6 @@ class TelegramBotFinal:
                 )
             ''')
             
-            conn.commit()
-            conn.close()
             self.logger.info("✅ Database initialized successfully")
             
         except Exception as e:
@@ -113,32 +125,20 @@ class TelegramBotFinal:
             first_name = user_data.first_name or ""
             last_name = user_data.last_name or ""
             
-            conn = sqlite3.connect(DB_FILE)
-            cursor = conn.cursor()
-            
             # Check if user exists
-            cursor.execute('SELECT * FROM bot_users WHERE user_id = ?', (user_id,))
-            user = cursor.fetchone()
+            user = self.store.query_one(SELECT_USER_SQL, (user_id,))
             
             if not user:
                 # Create new user with welcome bonus
-                cursor.execute('''
-                    INSERT INTO bot_users (user_id, username, first_name, last_name, wallet, total_earned)
-                    VALUES (?, ?, ?, ?, 10.0, 10.0)
-                ''', (user_id, username, first_name, last_name))
-                
-                conn.commit()
+                self.store.execute(INSERT_USER_SQL, (user_id, username, first_name, last_name))
                 self.logger.info(f"✅ New user created: {username} (ID: {user_id})")
                 
                 # Return new user data
                 user = (user_id, username, first_name, last_name, 10.0, 10.0, 0, 0, False, datetime.now(), datetime.now())
             else:
-                # Update last active
-                cursor.execute('UPDATE bot_users SET last_active = ? WHERE user_id = ?', 
-                             (datetime.now(), user_id))
-                conn.commit()
+                # Update last active (committed with the next write)
+                self.store.execute(TOUCH_USER_SQL, (datetime.now(), user_id), wait=False)
             
-            conn.close()
             return user
             
         except Exception as e:
@@ -148,17 +148,7 @@ class TelegramBotFinal:
     def add_earnings(self, user_id, amount, description=""):
         """Add earnings to user"""
         try:
-            conn = sqlite3.connect(DB_FILE)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                UPDATE bot_users 
-                SET wallet = wallet + ?, total_earned = total_earned + ?, messages_count = messages_count + 1
-                WHERE user_id = ?
-            ''', (amount, amount, user_id))
-            
-            conn.commit()
-            conn.close()
+            self.store.execute(ADD_EARNINGS_SQL, (amount, amount, user_id))
             
             self.logger.info(f"💰 Added ₹{amount} to user {user_id}")
             return True
@@ -170,13 +160,7 @@ class TelegramBotFinal:
     def get_user_stats(self, user_id):
         """Get user statistics"""
         try:
-            conn = sqlite3.connect(DB_FILE)
-            cursor = conn.cursor()
-            
-            cursor.execute('SELECT * FROM bot_users WHERE user_id = ?', (user_id,))
-            user = cursor.fetchone()
-            
-            conn.close()
+            user = self.store.query_one(SELECT_USER_SQL, (user_id,))
             
             if user:
                 return {
@@ -195,18 +179,9 @@ class TelegramBotFinal:
             return None
     
     def save_chat(self, user_id, message, response):
-        """Save chat to history"""
+        """Queue chat for history (committed with the next write)"""
         try:
-            conn = sqlite3.connect(DB_FILE)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO chat_history (user_id, message, response)
-                VALUES (?, ?, ?)
-            ''', (user_id, message, response))
-            
-            conn.commit()
-            conn.close()
+            self.store.execute(INSERT_CHAT_SQL, (user_id, message, response), wait=False)
             
         except Exception as e:
             self.logger.error(f"❌ Chat save error: {e}")
@@ -502,11 +477,9 @@ Keep chatting to improve your stats! 🚀
             # Generate AI response
             response = self.generate_response(message, user)
             
-            # Add earnings
-            self.add_earnings(user_id, 0.05, "Message response")
-            
-            # Save chat history
+            # Save chat history, then add earnings: both land in one commit
             self.save_chat(user_id, message, response)
+            self.add_earnings(user_id, 0.05, "Message response")
             
             # Get updated stats
             stats = self.get_user_stats(user_id)
@@ -0,0 +1,332 @@
+"""
+Ganesh AI - Time-Series Store
+Minute-resolution metric series held in NumPy ring buffers, for charting
+arbitrary ranges without GROUP BY scans
+
+Every metric has a ``value`` (summed amount) and a ``count`` (events) per
+minute, like the rollup tables. The arrays cover the last
+``capacity_minutes``; older minutes are overwritten as time advances.
+The store is per process and is saved to an ``.npz`` file periodically,
+so a restart picks up where the last save left off. With several worker
+processes only the one holding ``<file>.lock`` saves; the file then holds
+that worker's events, and every worker loads it on restart.
+"""
+
+import os
+import time
+import atexit
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, single worker assumed
+    fcntl = None
+
+EPOCH = datetime(1970, 1, 1)
+AGGREGATES = ('sum', 'mean', 'max')
+FIELDS = ('value', 'count')
+
+
+def minute_of(when: datetime) -> int:
+    """Minutes since the epoch of a naive UTC datetime"""
+    return int((when - EPOCH).total_seconds() // 60)
+
+
+def claim_file(path: str):
+    """Handle holding an exclusive lock on ``<path>.lock``, or None if another process holds it.
+
+    The lock lasts until the handle is closed (or the process exits), so
+    exactly one worker keeps writing ``path`` while the others leave it alone.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    handle = open(f"{path}.lock", 'w')
+    if fcntl is None:
+        return handle
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+
+def minutes_of(timestamps: Iterable[datetime]) -> np.ndarray:
+    return np.array(list(timestamps), dtype='datetime64[m]').astype(np.int64)
+
+
+def _clear(values: np.ndarray, counts: np.ndarray, head: Optional[int], new_head: int, capacity: int):
+    """Zero the slots of the minutes in ``(head, new_head]`` before they are reused"""
+    if head is None or new_head - head >= capacity:
+        values[:] = 0
+        counts[:] = 0
+    elif new_head > head:
+        slots = np.arange(head + 1, new_head + 1) % capacity
+        values[:, slots] = 0
+        counts[:, slots] = 0
+
+
+class TimeSeriesStore:
+    """Per-metric ring buffers indexed by ``minute % capacity``.
+
+    ``head`` is the latest minute written; a slot holds data only for
+    minutes in ``(head - capacity, head]``, everything else reads as zero.
+    Appends are O(1) under a lock and range queries slice the ring and
+    resample with one reshape.
+    """
+
+    def __init__(self, capacity_minutes: int = 90 * 1440, path: Optional[str] = None,
+                 log: Optional[Callable] = None):
+        self.capacity = capacity_minutes
+        self.path = path
+        self.log = log or (lambda section, level, message, extra=None: None)
+        self._rows: Dict[str, int] = {}
+        self._values = np.zeros((0, capacity_minutes))
+        self._counts = np.zeros((0, capacity_minutes), dtype=np.int64)
+        self._head: Optional[int] = None
+        self._lock = threading.Lock()
+        # While the history loads, live events from before this point are held back,
+        # along with whatever the ring held when loading started
+        self._cutoff: Optional[datetime] = None
+        self._held: List[Tuple[str, datetime, float, int]] = []
+        self._held_ring = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._writer = None
+        self.last_saved = None
+        self.loaded_from = None
+
+    # ---- writes -----------------------------------------------------
+
+    def _row(self, metric: str) -> int:
+        row = self._rows.get(metric)
+        if row is None:
+            row = self._rows[metric] = len(self._rows)
+            self._values = np.vstack([self._values, np.zeros((1, self.capacity))])
+            self._counts = np.vstack([self._counts, np.zeros((1, self.capacity), dtype=np.int64)])
+        return row
+
+    def _advance(self, minute: int):
+        if self._head is None or minute > self._head:
+            _clear(self._values, self._counts, self._head, minute, self.capacity)
+            self._head = minute
+
+    def _add(self, metric: str, minute: int, value: float, count: int):
+        row = self._row(metric)
+        self._advance(minute)
+        if minute <= self._head - self.capacity:
+            return
+        slot = minute % self.capacity
+        self._values[row, slot] += value
+        self._counts[row, slot] += count
+
+    def add(self, metric: str, when: datetime, value: float = 0.0, count: int = 1):
+        self.add_many([(metric, when, value, count)])
+
+    def add_many(self, events: Iterable[Tuple[str, datetime, float, int]]):
+        """Append ``(metric, when, value, count)`` events under one lock"""
+        with self._lock:
+            for metric, when, value, count in events:
+                if self._cutoff is not None and when < self._cutoff:
+                    self._held.append((metric, when, value, count))
+                else:
+                    self._add(metric, minute_of(when), value, count)
+
+    def _hold(self, cutoff: datetime):
+        """Start a load: set the ring's events aside and hold back live ones from before ``cutoff``"""
+        with self._lock:
+            self._held_ring = (sorted(self._rows, key=self._rows.get), self._values, self._counts, self._head)
+            self._rows = {}
+            self._values = np.zeros((0, self.capacity))
+            self._counts = np.zeros((0, self.capacity), dtype=np.int64)
+            self._head = None
+            self._cutoff = cutoff
+
+    def _release_held(self, keep: bool):
+        """End the load: restore the held events, or drop them when a backfill already counted them"""
+        if keep:
+            self.merge(*self._held_ring)
+        with self._lock:
+            if keep:
+                for metric, when, value, count in self._held:
+                    self._add(metric, minute_of(when), value, count)
+            self._held = []
+            self._held_ring = None
+            self._cutoff = None
+
+    def add_arrays(self, metric: str, minutes: np.ndarray, values: np.ndarray, counts: np.ndarray):
+        """Vectorized append of many events (``minutes`` from ``minutes_of``)"""
+        if not len(minutes):
+            return
+        with self._lock:
+            row = self._row(metric)
+            self._advance(int(minutes.max()))
+            keep = minutes > self._head - self.capacity
+            slots = minutes[keep] % self.capacity
+            np.add.at(self._values[row], slots, values[keep])
+            np.add.at(self._counts[row], slots, counts[keep])
+
+    def add_columns(self, metric: str, timestamps: List[datetime], amounts: Optional[List] = None):
+        """Append one event per timestamp, with optional amounts (``None`` counts as 0)"""
+        minutes = minutes_of(timestamps)
+        values = (np.array([amount or 0.0 for amount in amounts], dtype=float) if amounts is not None
+                  else np.zeros(len(minutes)))
+        self.add_arrays(metric, minutes, values, np.ones(len(minutes), dtype=np.int64))
+
+    def merge(self, names: List[str], values: np.ndarray, counts: np.ndarray, head: Optional[int]):
+        """Add another ring with the same capacity (a saved file or a backfill) into this one"""
+        if head is None:
+            return
+        values, counts = values.copy(), counts.copy()
+        with self._lock:
+            target = max(head, self._head if self._head is not None else head)
+            # Once both rings end at the same minute, equal slots hold equal minutes
+            _clear(values, counts, head, target, self.capacity)
+            self._advance(target)
+            for index, name in enumerate(names):
+                row = self._row(name)
+                self._values[row] += values[index]
+                self._counts[row] += counts[index]
+
+    # ---- reads ------------------------------------------------------
+
+    def query(self, metric: str, start: datetime, end: datetime, step_minutes: int = 60,
+              field: str = 'value', aggregate: str = 'sum') -> np.ndarray:
+        """One point per ``step_minutes`` bucket of ``[start, end)``.
+
+        ``sum`` totals each bucket, ``mean`` averages its minutes and
+        ``max`` is its busiest minute.
+        """
+        if field not in FIELDS:
+            raise ValueError(f"Unknown field: {field}")
+        if aggregate not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate: {aggregate}")
+        start_minute, end_minute = minute_of(start), minute_of(end)
+        buckets = max(0, -(-(end_minute - start_minute) // step_minutes))
+        series = np.zeros(buckets * step_minutes)
+
+        with self._lock:
+            row = self._rows.get(metric)
+            if row is not None and self._head is not None:
+                low = max(start_minute, self._head - self.capacity + 1)
+                high = min(end_minute, self._head + 1)
+                if low < high:
+                    source = self._values if field == 'value' else self._counts
+                    series[low - start_minute:high - start_minute] = source[row, np.arange(low, high) % self.capacity]
+
+        series = series.reshape(buckets, step_minutes)
+        if aggregate == 'sum':
+            return series.sum(axis=1)
+        if aggregate == 'mean':
+            return series.mean(axis=1)
+        return series.max(axis=1)
+
+    def metrics(self) -> List[str]:
+        return sorted(self._rows)
+
+    # ---- persistence ------------------------------------------------
+
+    def save(self, path: Optional[str] = None):
+        """Write the arrays atomically (temp file, then rename)"""
+        path = path or self.path
+        with self._lock:
+            if self._head is None:
+                return
+            names = sorted(self._rows, key=self._rows.get)
+            values, counts, head = self._values.copy(), self._counts.copy(), self._head
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as handle:
+            np.savez_compressed(handle, names=np.array(names), values=values, counts=counts,
+                                head=np.int64(head), capacity=np.int64(self.capacity))
+        os.replace(tmp_path, path)
+        self.last_saved = datetime.utcnow().isoformat()
+
+    def load(self, path: Optional[str] = None) -> bool:
+        """Merge a saved file into the store; False if missing or incompatible"""
+        path = path or self.path
+        if not path or not os.path.exists(path):
+            return False
+        with np.load(path) as saved:
+            if int(saved['capacity']) != self.capacity:
+                self.log("timeseries", "WARNING", f"Ignoring {path}: saved with a different capacity")
+                return False
+            self.merge([str(name) for name in saved['names']], saved['values'], saved['counts'],
+                       int(saved['head']))
+        self.loaded_from = path
+        return True
+
+    def start(self, backfill: Callable[['TimeSeriesStore', datetime], None], save_seconds: float):
+        """Load the saved file (or ``backfill`` from the database), then save periodically.
+
+        ``backfill(store, cutoff)`` reads the rows created before ``cutoff``.
+        Events recorded before the cutoff, live or already in the ring, are
+        held until the load ends and kept only if it came from the saved
+        file, so no event counts twice.
+        """
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            cutoff = datetime.utcnow()
+            self._hold(cutoff)
+            # Workers share the file, so only the one holding its lock saves it
+            self._writer = claim_file(self.path) if self.path else None
+            if self.path and self._writer is None:
+                self.log("timeseries", "INFO", f"Another worker saves {self.path}; loading it only")
+
+            def loop():
+                backfilled = False
+                try:
+                    if not self.load():
+                        # Built separately and merged, so live events after the cutoff are kept
+                        history = TimeSeriesStore(self.capacity)
+                        backfill(history, cutoff)
+                        with history._lock:
+                            names = sorted(history._rows, key=history._rows.get)
+                        self.merge(names, history._values, history._counts, history._head)
+                        self.loaded_from = 'database'
+                        backfilled = True
+                except Exception as e:
+                    self.log("timeseries", "ERROR", f"Loading time series failed: {e}")
+                self._release_held(keep=not backfilled)
+                while self._writer and save_seconds > 0:
+                    time.sleep(save_seconds)
+                    try:
+                        self.save()
+                    except Exception as e:
+                        self.log("timeseries", "ERROR", f"Saving time series failed: {e}")
+
+            if self._writer:
+                atexit.register(self.save)
+            self._thread = threading.Thread(target=loop, name="timeseries", daemon=True)
+            self._thread.start()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            head = self._head
+            metrics = len(self._rows)
+            nbytes = self._values.nbytes + self._counts.nbytes
+        return {
+            'metrics': self.metrics(),
+            'capacity_days': round(self.capacity / 1440, 1),
+            'latest_minute': (EPOCH + timedelta(minutes=head)).isoformat() if head is not None else None,
+            'memory_mb': round(nbytes / 1e6, 1),
+            'series': metrics,
+            'path': self.path,
+            'saving': self._writer is not None,
+            'loaded_from': self.loaded_from,
+            'last_saved': self.last_saved
+        }
+
+
+# Global time-series store instance
+time_series = TimeSeriesStore(
+    capacity_minutes=int(os.getenv("TIMESERIES_DAYS", "90")) * 1440,
+    path=os.getenv("TIMESERIES_FILE", "timeseries.npz")
+)
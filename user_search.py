@@ -0,0 +1,164 @@
+"""
+Ganesh AI - User Search
+Indexed prefix and substring search over usernames, emails, referral codes
+and Telegram ids for the admin panel
+
+Prefix matches are range scans on expression indexes over ``lower(column)``
+(``text_pattern_ops`` on PostgreSQL, where ``LIKE 'abc%'`` is the indexable
+form). Substring matches of three or more characters go through a trigram
+index: an FTS5 ``trigram`` table kept in sync by triggers on SQLite, and
+``pg_trgm`` GIN indexes on PostgreSQL. Shorter substrings, and databases
+without either extension, fall back to scanning with ``LIKE``; the scan
+still stops as soon as a page is filled.
+"""
+
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import and_, func, literal_column, or_, select, table, text, union
+
+MATCH_MODES = ('prefix', 'contains')
+
+# Searched columns; telegram ids are digits, so they are matched as stored
+SEARCH_COLUMNS = ('username', 'email', 'referral_code', 'telegram_id')
+LOWERED_COLUMNS = ('username', 'email', 'referral_code')
+
+# Shortest substring a trigram index can answer
+MIN_TRIGRAM_LENGTH = 3
+
+# Sorts after every character, so ``[term, term + PREFIX_END)`` spans all strings starting with ``term``
+PREFIX_END = '\U0010ffff'
+
+FTS_TABLE = 'users_search'
+
+
+def _sqlite_statements(fts: bool) -> List[str]:
+    statements = [
+        f"CREATE INDEX IF NOT EXISTS ix_users_{name}_lower ON users (lower({name}))"
+        for name in LOWERED_COLUMNS
+    ]
+    if not fts:
+        return statements
+    columns = ', '.join(SEARCH_COLUMNS)
+    new_values = ', '.join(f"new.{name}" for name in SEARCH_COLUMNS)
+    old_values = ', '.join(f"old.{name}" for name in SEARCH_COLUMNS)
+    insert_new = f"INSERT INTO {FTS_TABLE} (rowid, {columns}) VALUES (new.id, {new_values});"
+    delete_old = (f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {columns}) "
+                  f"VALUES ('delete', old.id, {old_values});")
+    return statements + [
+        # External content: the text lives in users, the table only holds the trigram index
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"{columns}, content='users', content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON users BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON users BEGIN {delete_old} END",
+        # Only fires when a searched column is written, not on every visit or chat counter update
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF {columns} ON users "
+        f"BEGIN {delete_old} {insert_new} END",
+        f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')"
+    ]
+
+
+def _sqlite_has_trigram(connection) -> bool:
+    """FTS5 with the trigram tokenizer needs SQLite 3.34+ built with FTS5"""
+    try:
+        with connection.begin_nested():
+            connection.execute(text("CREATE VIRTUAL TABLE temp.trigram_probe USING fts5(value, tokenize='trigram')"))
+            connection.execute(text("DROP TABLE temp.trigram_probe"))
+        return True
+    except Exception:
+        return False
+
+
+def _postgres_has_trigram(connection) -> bool:
+    try:
+        with connection.begin_nested():
+            connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        return True
+    except Exception:
+        return False
+
+
+def create_search_indexes(connection, log: Optional[Callable] = None) -> Dict:
+    """Create the prefix and trigram indexes for the current backend; returns what was created"""
+    log = log or (lambda section, level, message, extra=None: None)
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        trigram = _sqlite_has_trigram(connection)
+        for statement in _sqlite_statements(trigram):
+            connection.execute(text(statement))
+    elif dialect == 'postgresql':
+        trigram = _postgres_has_trigram(connection)
+        for name in LOWERED_COLUMNS:
+            connection.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_users_{name}_lower ON users (lower({name}) text_pattern_ops)"
+            ))
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_users_telegram_id_pattern ON users (telegram_id text_pattern_ops)"
+        ))
+        if trigram:
+            for name in SEARCH_COLUMNS:
+                expression = f"lower({name})" if name in LOWERED_COLUMNS else name
+                connection.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_users_{name}_trgm ON users USING gin ({expression} gin_trgm_ops)"
+                ))
+    else:
+        log("database", "WARNING", f"No search indexes for {dialect}; admin user search will scan")
+        return {'dialect': dialect, 'trigram': False}
+
+    if not trigram:
+        log("database", "WARNING", "Trigram index unavailable; substring user search will scan")
+    return {'dialect': dialect, 'trigram': trigram}
+
+
+class UserSearch:
+    """Builds the ``WHERE`` clause for a search term against the users table.
+
+    Whether the SQLite trigram table exists is checked once per engine,
+    so a database that was never migrated still gets (scanning) results.
+    """
+
+    def __init__(self):
+        self._fts: Dict[str, bool] = {}
+
+    def _has_fts(self, connection) -> bool:
+        key = str(connection.engine.url)
+        if key not in self._fts:
+            self._fts[key] = connection.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {'name': FTS_TABLE}
+            ).first() is not None
+        return self._fts[key]
+
+    def condition(self, connection, model, term: str, mode: str = 'prefix'):
+        """Clause matching users whose searched columns start with (or contain) ``term``"""
+        if mode not in MATCH_MODES:
+            raise ValueError(f"Unknown match mode: {mode}")
+        term = term.strip().lower()
+        if not term:
+            raise ValueError("Search term is empty")
+        dialect = connection.dialect.name
+        columns = {
+            name: func.lower(getattr(model, name)) if name in LOWERED_COLUMNS else getattr(model, name)
+            for name in SEARCH_COLUMNS
+        }
+
+        if mode == 'prefix':
+            if dialect == 'postgresql':
+                matches = [column.startswith(term, autoescape=True) for column in columns.values()]
+            else:
+                # SQLite only uses an index for LIKE on a plain column, so prefixes are ranges
+                matches = [and_(column >= term, column < term + PREFIX_END) for column in columns.values()]
+            # One index range per column; as a plain OR, a paginated query (ORDER BY id LIMIT n)
+            # is planned as a walk in id order that filters every row
+            return model.id.in_(union(*(select(model.id).where(match) for match in matches)))
+
+        if dialect == 'sqlite' and len(term) >= MIN_TRIGRAM_LENGTH and self._has_fts(connection):
+            search = table(FTS_TABLE)
+            phrase = '"' + term.replace('"', '""') + '"'
+            return model.id.in_(
+                select(literal_column('rowid')).select_from(search).where(literal_column(FTS_TABLE).match(phrase))
+            )
+        return or_(*(column.contains(term, autoescape=True) for column in columns.values()))
+
+
+# Global user search instance
+user_search = UserSearch()